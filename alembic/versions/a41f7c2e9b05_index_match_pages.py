@@ -0,0 +1,34 @@
+"""index match pages
+
+Revision ID: a41f7c2e9b05
+Revises: f3b8d1c4a927
+Create Date: 2026-10-19 01:04:51.227380
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f7c2e9b05'
+down_revision = 'f3b8d1c4a927'
+branch_labels = None
+depends_on = None
+
+
+# built concurrently and safe to repeat, like e5a9c3d7f210
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_matches_tournament_id_round_id '
+            'ON matches (tournament_id, round, id)'
+        )
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_matches_tournament_id_round')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_matches_tournament_id_round '
+            'ON matches (tournament_id, round)'
+        )
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_matches_tournament_id_round_id')
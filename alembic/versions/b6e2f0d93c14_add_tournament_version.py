@@ -0,0 +1,28 @@
+"""add tournament version
+
+Revision ID: b6e2f0d93c14
+Revises: a41f7c2e9b05
+Create Date: 2026-10-19 09:41:18.502713
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e2f0d93c14'
+down_revision = 'a41f7c2e9b05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'tournaments', sa.Column('version', sa.Integer(), nullable=False, server_default='0')
+    )
+    # like the round state, the application sets it from here on
+    op.alter_column('tournaments', 'version', server_default=None)
+
+
+def downgrade():
+    op.drop_column('tournaments', 'version')
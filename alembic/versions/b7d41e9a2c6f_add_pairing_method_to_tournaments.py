@@ -0,0 +1,24 @@
+"""add pairing method to tournaments
+
+Revision ID: b7d41e9a2c6f
+Revises: 81045209b5e2
+Create Date: 2026-10-18 09:12:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d41e9a2c6f'
+down_revision = '81045209b5e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tournaments', sa.Column('pairing_method', sa.String(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('tournaments', 'pairing_method')
@@ -0,0 +1,25 @@
+"""backfill pairing method
+
+Revision ID: c9a3e5f17d42
+Revises: b6e2f0d93c14
+Create Date: 2026-10-19 11:20:07.918344
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a3e5f17d42'
+down_revision = 'b6e2f0d93c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # rows from before b7d41e9a2c6f were left NULL, they have always been paired greedily
+    op.execute("UPDATE tournaments SET pairing_method = 'greedy' WHERE pairing_method IS NULL")
+
+
+def downgrade():
+    # the backfilled rows can't be told apart from ones set to greedy, leave them
+    pass
@@ -0,0 +1,75 @@
+"""add standings table
+
+Revision ID: d2e8f4a61b37
+Revises: b7d41e9a2c6f
+Create Date: 2026-10-18 14:03:47.518220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e8f4a61b37'
+down_revision = 'b7d41e9a2c6f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'standings',
+        sa.Column('competitor_id', sa.Integer(), sa.ForeignKey('competitors.id'), primary_key=True),
+        sa.Column('tournament_id', sa.Integer(), sa.ForeignKey('tournaments.id'), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('wins', sa.Integer(), nullable=False),
+        sa.Column('losses', sa.Integer(), nullable=False),
+        sa.Column('buchholz', sa.Integer(), nullable=False),
+        sa.Column('sonneborn_berger', sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        'ix_standings_tournament_id_rank', 'standings', ['tournament_id', 'rank', 'competitor_id']
+    )
+    # backfill from the results already recorded
+    op.execute('''
+        INSERT INTO standings
+            (competitor_id, tournament_id, rank, wins, losses, buchholz, sonneborn_berger)
+        SELECT
+            c.id,
+            c.tournament_id,
+            1,
+            coalesce(c.wins, 0),
+            coalesce(c.losses, 0),
+            coalesce((
+                SELECT sum(coalesce(o.wins, 0))
+                FROM matches m
+                JOIN competitors o ON o.id = CASE WHEN m.winner_id = c.id THEN m.loser_id ELSE m.winner_id END
+                WHERE (m.winner_id = c.id OR m.loser_id = c.id)
+                    AND m.winner_id IS NOT NULL AND m.loser_id IS NOT NULL
+            ), 0),
+            coalesce((
+                SELECT sum(coalesce(o.wins, 0))
+                FROM matches m
+                JOIN competitors o ON o.id = m.loser_id
+                WHERE m.winner_id = c.id
+            ), 0)
+        FROM competitors c
+        WHERE c.tournament_id IS NOT NULL
+    ''')
+    op.execute('''
+        UPDATE standings s
+        SET rank = r.rank
+        FROM (
+            SELECT competitor_id, rank() OVER (
+                PARTITION BY tournament_id
+                ORDER BY wins DESC, buchholz DESC, sonneborn_berger DESC
+            ) AS rank
+            FROM standings
+        ) r
+        WHERE s.competitor_id = r.competitor_id
+    ''')
+
+
+def downgrade():
+    op.drop_index('ix_standings_tournament_id_rank', table_name='standings')
+    op.drop_table('standings')
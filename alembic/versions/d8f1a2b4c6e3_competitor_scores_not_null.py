@@ -0,0 +1,29 @@
+"""competitor scores not null
+
+Revision ID: d8f1a2b4c6e3
+Revises: c9a3e5f17d42
+Create Date: 2026-10-19 14:02:51.337160
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f1a2b4c6e3'
+down_revision = 'c9a3e5f17d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # updates that left out wins or losses stored NULL, standings always counted those as 0
+    op.execute('UPDATE competitors SET wins = 0 WHERE wins IS NULL')
+    op.execute('UPDATE competitors SET losses = 0 WHERE losses IS NULL')
+    op.alter_column('competitors', 'wins', existing_type=sa.Integer(), nullable=False)
+    op.alter_column('competitors', 'losses', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    op.alter_column('competitors', 'losses', existing_type=sa.Integer(), nullable=True)
+    op.alter_column('competitors', 'wins', existing_type=sa.Integer(), nullable=True)
@@ -0,0 +1,55 @@
+"""index hot query paths
+
+Revision ID: e5a9c3d7f210
+Revises: d2e8f4a61b37
+Create Date: 2026-10-18 21:36:05.904113
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3d7f210'
+down_revision = 'd2e8f4a61b37'
+branch_labels = None
+depends_on = None
+
+
+NEW_INDEXES = {
+    'ix_matches_tournament_id_round': 'matches (tournament_id, round)',
+    'ix_matches_competitor_one': 'matches (competitor_one)',
+    'ix_matches_competitor_two': 'matches (competitor_two)',
+    'ix_matches_winner_id': 'matches (winner_id)',
+    'ix_matches_loser_id': 'matches (loser_id)',
+    'ix_competitors_tournament_id_wins': 'competitors (tournament_id, wins DESC, id) INCLUDE (name, losses)',
+    'ix_tournaments_owner_id_name': 'tournaments (owner_id, name)',
+}
+
+# nothing filters on these, and the id ones duplicate the primary keys
+OLD_INDEXES = {
+    'ix_tournaments_description': 'tournaments (description)',
+    'ix_tournaments_name': 'tournaments (name)',
+    'ix_competitors_name': 'competitors (name)',
+    'ix_users_id': 'users (id)',
+    'ix_tournaments_id': 'tournaments (id)',
+    'ix_competitors_id': 'competitors (id)',
+    'ix_matches_id': 'matches (id)',
+}
+
+
+# CONCURRENTLY doesn't block writes while the index builds but can't run in a
+# transaction. IF [NOT] EXISTS lets a run that failed halfway be repeated.
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, definition in NEW_INDEXES.items():
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
+        for name in OLD_INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, definition in OLD_INDEXES.items():
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
+        for name in NEW_INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
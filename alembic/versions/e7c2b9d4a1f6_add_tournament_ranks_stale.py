@@ -0,0 +1,28 @@
+"""add tournament ranks stale
+
+Revision ID: e7c2b9d4a1f6
+Revises: d8f1a2b4c6e3
+Create Date: 2026-10-20 10:17:42.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c2b9d4a1f6'
+down_revision = 'd8f1a2b4c6e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # results so far re-ranked in their own transaction, so no ranks are stale yet
+    op.add_column(
+        'tournaments', sa.Column('ranks_stale', sa.Boolean(), nullable=False, server_default=sa.false())
+    )
+    op.alter_column('tournaments', 'ranks_stale', server_default=None)
+
+
+def downgrade():
+    op.drop_column('tournaments', 'ranks_stale')
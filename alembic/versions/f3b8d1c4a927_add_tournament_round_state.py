@@ -0,0 +1,53 @@
+"""add tournament round state
+
+Revision ID: f3b8d1c4a927
+Revises: e5a9c3d7f210
+Create Date: 2026-10-18 23:12:40.316845
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d1c4a927'
+down_revision = 'e5a9c3d7f210'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tournaments', sa.Column('current_round', sa.Integer(), nullable=True))
+    op.add_column(
+        'tournaments', sa.Column('matches_pending', sa.Integer(), nullable=False, server_default='0')
+    )
+    op.add_column(
+        'tournaments', sa.Column('matches_completed', sa.Integer(), nullable=False, server_default='0')
+    )
+    # backfill from the matches already played, byes count as completed
+    op.execute('''
+        UPDATE tournaments t
+        SET
+            current_round = m.current_round,
+            matches_pending = m.matches_pending,
+            matches_completed = m.matches_completed
+        FROM (
+            SELECT
+                tournament_id,
+                max(round) AS current_round,
+                count(*) FILTER (WHERE winner_id IS NULL AND competitor_two IS NOT NULL) AS matches_pending,
+                count(*) FILTER (WHERE winner_id IS NOT NULL OR competitor_two IS NULL) AS matches_completed
+            FROM matches
+            GROUP BY tournament_id
+        ) m
+        WHERE t.id = m.tournament_id
+    ''')
+    # the application sets these, the defaults were only there to fill existing rows
+    op.alter_column('tournaments', 'matches_pending', server_default=None)
+    op.alter_column('tournaments', 'matches_completed', server_default=None)
+
+
+def downgrade():
+    op.drop_column('tournaments', 'matches_completed')
+    op.drop_column('tournaments', 'matches_pending')
+    op.drop_column('tournaments', 'current_round')
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from .routes import competitors, matches, tournaments, users
+from .routes import competitors, matches, standings, tournaments, users
 
 api_router = APIRouter()
 api_router.include_router(
@@ -13,6 +13,11 @@ api_router.include_router(
     prefix='/swiss-tournament',
     tags=['swiss-api']
 )
+api_router.include_router(
+    standings.router,
+    prefix='/swiss-tournament',
+    tags=['swiss-api']
+)
 api_router.include_router(
     tournaments.router,
     prefix='/swiss-tournament',
@@ -1,64 +1,99 @@
-from fastapi import Depends, APIRouter, HTTPException, status
+from fastapi import Depends, APIRouter, HTTPException, Request, Response, status
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-import app.crud as crud
+import app.async_crud as async_crud
 import app.schemas as schemas
 import app.models as models
-from app.database import get_db
+from app.coalescing import shared_response
+from app.database import get_async_db
+from app.etags import not_modified
+from app.pagination import Page, Pagination, paginate
+from app.serialization import rows_response, rows_stream
 
 router = APIRouter()
 
 
 @router.get('/competitors', response_model=List[schemas.Competitor])
-def get_competitors(
-    tournament_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(crud.get_current_user)
+async def get_competitors(
+    request: Request,
+    response: Response,
+    page: Page = Depends(Pagination(key_size=2)),
+    db: AsyncSession = Depends(get_async_db),
+    tournament: models.Tournament = Depends(async_crud.get_current_tournament)
 ):
-    tournament = crud.get_tournament_by_id(db=db, tournament_id=tournament_id)
-
-    if not tournament or tournament.owner_id != current_user.id:
-        raise HTTPException(status_code=404, detail='Not found.')
-
-    return crud.get_tournament_competitors(db=db, tournament_id=tournament_id)
+    cached = not_modified(request, response, tournament.id, tournament.version)
+    if cached:
+        return cached
+
+    async def build():
+        page_response = Response()
+        competitors = await async_crud.get_tournament_competitors(
+            db=db, tournament_id=tournament.id, limit=page.limit + 1, after=page.after
+        )
+        competitors = paginate(
+            competitors, page, page_response, key=lambda competitor: (competitor.wins, competitor.id)
+        )
+        return rows_response(competitors, schemas.Competitor, page_response)
+
+    return await shared_response(request, response, (tournament.id, tournament.version), build)
+
+
+@router.get('/competitors/export')
+async def export_competitors(
+    format: schemas.ExportFormat = schemas.ExportFormat.ndjson,
+    db: AsyncSession = Depends(get_async_db),
+    tournament: models.Tournament = Depends(async_crud.get_current_tournament)
+):
+    # every competitor, streamed off a server side cursor rather than read into memory
+    return rows_stream(
+        async_crud.stream_tournament_competitors(db=db, tournament_id=tournament.id), schemas.Competitor, format
+    )
 
 
 @router.post('/competitors', response_model=schemas.Competitor, status_code=status.HTTP_201_CREATED)
-def create_competitor(
+async def create_competitor(
     competitor: schemas.CompetitorCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(crud.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(async_crud.get_current_user)
 ):
-    tournament = crud.get_tournament_by_id(db=db, tournament_id=competitor.tournament_id)
+    tournament = await async_crud.get_own_tournament(
+        db=db, tournament_id=competitor.tournament_id, owner_id=current_user.id
+    )
 
-    if not tournament or tournament.owner_id != current_user.id:
+    if not tournament:
         raise HTTPException(status_code=404, detail='Not found.')
         
-    return crud.create_competitor(db=db, name=competitor.name, tournament_id=competitor.tournament_id)
+    return await async_crud.create_competitor(db=db, name=competitor.name, tournament_id=competitor.tournament_id)
 
 
 @router.put('/competitors', response_model=schemas.Competitor)
-def update_competitor(
+async def update_competitor(
     competitor: schemas.CompetitorUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(crud.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(async_crud.get_current_user)
 ):
-    tournament = crud.get_tournament_by_id(db=db, tournament_id=competitor.tournament_id)
+    tournament = await async_crud.get_own_tournament(
+        db=db, tournament_id=competitor.tournament_id, owner_id=current_user.id
+    )
 
-    if not tournament or tournament.owner_id != current_user.id:
+    if not tournament:
         raise HTTPException(status_code=404, detail='Not found.')
 
-    competitor_exists = crud.get_competitor(db=db, competitor_id=competitor.id)
+    competitor_exists = await async_crud.get_competitor(db=db, competitor_id=competitor.id)
 
-    if not competitor_exists:
+    if not competitor_exists or competitor_exists.tournament_id != tournament.id:
         raise HTTPException(status_code=404, detail='Not found.')
 
-    return crud.update_competitor(
+    updated = await async_crud.update_competitor(
         db=db,
         competitor_id=competitor.id,
         competitor_name=competitor.name,
         wins=competitor.wins,
         losses=competitor.losses
     )
+
+    if not updated:
+        raise HTTPException(status_code=404, detail='Not found.')
+    return updated
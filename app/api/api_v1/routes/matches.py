@@ -1,73 +1,144 @@
-from fastapi import Depends, APIRouter, HTTPException, status
+from time import perf_counter
 
+from fastapi import Depends, APIRouter, HTTPException, Request, Response, status
+
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
+from app.batch import pair_tournaments
+import app.async_crud as async_crud
 import app.crud as crud
 import app.schemas as schemas
 import app.models as models
-from app.database import get_db
+from app.coalescing import shared_response
+from app.database import get_async_db, get_db, record_write
+from app.etags import not_modified
+from app.pagination import Page, Pagination, paginate
+from app.serialization import rows_response, rows_stream
 
 router = APIRouter()
 
 
 @router.get('/matches', response_model=List[schemas.Match])
-def get_matches(
-    tournament_id: int,
+async def get_matches(
+    request: Request,
+    response: Response,
     round:int = None,
+    page: Page = Depends(Pagination(key_size=2)),
+    db: AsyncSession = Depends(get_async_db),
+    tournament: models.Tournament = Depends(async_crud.get_current_tournament)
+):
+    cached = not_modified(request, response, tournament.id, tournament.version)
+    if cached:
+        return cached
+
+    async def build():
+        page_response = Response()
+        matches = await async_crud.get_matches(
+            db=db, tournament_id=tournament.id, round=round, limit=page.limit + 1, after=page.after
+        )
+        matches = paginate(matches, page, page_response, key=lambda match: (match.round, match.id))
+        return rows_response(matches, schemas.Match, page_response)
+
+    # every client asks for the new round at once when it's posted, they share one response
+    return await shared_response(request, response, (tournament.id, tournament.version), build)
+
+
+@router.get('/matches/export')
+async def export_matches(
+    round: int = None,
+    format: schemas.ExportFormat = schemas.ExportFormat.ndjson,
+    db: AsyncSession = Depends(get_async_db),
+    tournament: models.Tournament = Depends(async_crud.get_current_tournament)
+):
+    # every match, streamed off a server side cursor rather than read into memory
+    return rows_stream(
+        async_crud.stream_matches(db=db, tournament_id=tournament.id, round=round), schemas.Match, format
+    )
+
+
+@router.get('/matches/match_competitors', response_model=List[schemas.Match], dependencies=[Depends(record_write)])
+def match_competitors(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(crud.get_current_user)
+    tournament: models.Tournament = Depends(crud.get_current_tournament)
 ):
-    tournament = crud.get_tournament_by_id(db=db, tournament_id=tournament_id)
+    round = crud.get_next_round(db=db, tournament_id=tournament.id)
 
-    if not tournament or tournament.owner_id != current_user.id:
-        raise HTTPException(status_code=404, detail='Not found.')
+    return crud.get_round(
+        db=db,
+        tournament_id=tournament.id,
+        round=round,
+        method=tournament.pairing_method
+    )
 
-    return crud.get_matches(db=db, tournament_id=tournament_id, round=round)
 
+@router.get('/matches/preview', response_model=schemas.RoundPreview)
+def preview_round(
+    db: Session = Depends(get_db),
+    tournament: models.Tournament = Depends(crud.get_current_tournament)
+):
+    return crud.preview_round(db=db, tournament_id=tournament.id, method=tournament.pairing_method)
 
-@router.get('/matches/match_competitors', response_model=List[schemas.Match])
-def match_competitors(
-    tournament_id: int,
+
+@router.post('/matches/preview', response_model=List[schemas.Match], status_code=status.HTTP_201_CREATED)
+def commit_round_preview(
+    preview: schemas.RoundPreviewCommit,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(crud.get_current_user)
 ):
-    tournament = crud.get_tournament_by_id(db=db, tournament_id=tournament_id)
+    tournament = crud.get_own_tournament(db=db, tournament_id=preview.tournament_id, owner_id=current_user.id)
 
-    if not tournament or tournament.owner_id != current_user.id:
+    if not tournament:
         raise HTTPException(status_code=404, detail='Not found.')
 
-    competitors = crud.get_tournament_competitors(db=db, tournament_id=tournament_id)
+    matches = crud.commit_round_preview(
+        db=db,
+        tournament_id=tournament.id,
+        version=preview.version,
+        method=tournament.pairing_method
+    )
 
-    round = crud.get_current_round(db=db, tournament_id=tournament_id)
-    matches = crud.get_matches(db=db, tournament_id=tournament_id, round=round)
-    # if it's not the very fist round where there are no matches yet, thus no round to increment
-    if (len(matches) > 0):
-        round += 1
+    if matches is None:
+        raise HTTPException(status_code=409, detail='Preview is out of date.')
+    return matches
 
-    return crud.get_round(
-        db=db, tournament_id=tournament_id, competitors=competitors, round=round
-    )
+
+@router.post('/matches/batch_round', response_model=schemas.BatchRound)
+def batch_round(
+    batch: schemas.BatchRoundCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(crud.get_current_user)
+):
+    start = perf_counter()
+    results = pair_tournaments(db=db, tournament_ids=batch.tournament_ids, owner_id=current_user.id)
+    return {'seconds': perf_counter() - start, 'results': results}
 
 
 @router.post('/matches', response_model=schemas.Match, status_code=status.HTTP_201_CREATED)
-def create_match(
+async def create_match(
     match: schemas.MatchCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(crud.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(async_crud.get_current_user)
 ):
-    tournament = crud.get_tournament_by_id(db=db, tournament_id=match.tournament_id)
+    tournament = await async_crud.get_own_tournament(
+        db=db, tournament_id=match.tournament_id, owner_id=current_user.id
+    )
 
-    if not tournament or tournament.owner_id != current_user.id:
+    if not tournament:
         raise HTTPException(status_code=404, detail='Not found.')
 
-    if not match.competitor_one or not crud.get_competitor(db=db, competitor_id=match.competitor_one):
+    if not match.competitor_one or not match.competitor_two:
         raise HTTPException(status_code=404, detail='Not found.')
 
-    if not match.competitor_two or not crud.get_competitor(db=db, competitor_id=match.competitor_two):
+    found = await async_crud.get_tournament_competitor_ids(
+        db=db, tournament_id=tournament.id, competitor_ids=[match.competitor_one, match.competitor_two]
+    )
+
+    if len(found) != len({match.competitor_one, match.competitor_two}):
         raise HTTPException(status_code=404, detail='Not found.')
-        
-    return crud.create_match(
+
+    return await async_crud.create_match(
         db=db,
         tournament_id=tournament.id,
         competitor_one=match.competitor_one,
@@ -75,25 +146,110 @@ def create_match(
     )
 
 
+@router.post('/matches/round', response_model=List[schemas.Match], status_code=status.HTTP_201_CREATED)
+async def create_round(
+    round: schemas.RoundCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(async_crud.get_current_user)
+):
+    tournament = await async_crud.get_own_tournament(
+        db=db, tournament_id=round.tournament_id, owner_id=current_user.id
+    )
+
+    if not tournament:
+        raise HTTPException(status_code=404, detail='Not found.')
+
+    competitor_ids = [
+        competitor_id
+        for match in round.matches
+        for competitor_id in (match.competitor_one, match.competitor_two)
+        if competitor_id is not None
+    ]
+
+    if len(set(competitor_ids)) != len(competitor_ids):
+        raise HTTPException(status_code=400, detail='Competitor matched more than once in round.')
+
+    found = await async_crud.get_tournament_competitor_ids(
+        db=db, tournament_id=tournament.id, competitor_ids=competitor_ids
+    )
+
+    if len(found) != len(competitor_ids):
+        raise HTTPException(status_code=404, detail='Not found.')
+
+    return await async_crud.create_round(
+        db=db,
+        tournament_id=tournament.id,
+        round=round.round,
+        pairings=[(match.competitor_one, match.competitor_two) for match in round.matches]
+    )
+
+
 @router.put('/matches', response_model=schemas.Match)
-def update_match(
+async def update_match(
     match: schemas.MatchUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(crud.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(async_crud.get_current_user)
 ):
-    tournament = crud.get_tournament_by_id(db=db, tournament_id=match.tournament_id)
+    tournament = await async_crud.get_own_tournament(
+        db=db, tournament_id=match.tournament_id, owner_id=current_user.id
+    )
 
-    if not tournament or tournament.owner_id != current_user.id:
+    if not tournament:
         raise HTTPException(status_code=404, detail='Not found.')
 
-    match_exists = crud.get_match_by_id(db=db, tournament_id=match.tournament_id, match_id=match.id)
+    match_exists = await async_crud.get_match_for_update(db=db, tournament_id=tournament.id, match_id=match.id)
 
     if not match_exists:
         raise HTTPException(status_code=404, detail='Not found.')
 
-    return crud.update_match(
+    if match.winner_id and match_exists.competitor_two is None:
+        raise HTTPException(status_code=400, detail='Match is a bye.')
+
+    if match.winner_id and match.winner_id not in (match_exists.competitor_one, match_exists.competitor_two):
+        raise HTTPException(status_code=400, detail='Winner is not in this match.')
+
+    return await async_crud.update_match(
         db=db,
-        tournament_id=match.tournament_id,
+        tournament_id=tournament.id,
         match_id=match.id,
-        winner_id=match.winner_id
+        winner_id=match.winner_id,
+        match=match_exists
+    )
+
+
+@router.delete('/matches/result', response_model=schemas.Match)
+async def reverse_match_result(
+    match_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    tournament: models.Tournament = Depends(async_crud.get_current_tournament)
+):
+    match = await async_crud.reverse_match_result(db=db, tournament_id=tournament.id, match_id=match_id)
+
+    if not match:
+        raise HTTPException(status_code=404, detail='Not found.')
+
+    return match
+
+
+@router.put('/matches/results', response_model=List[schemas.MatchResultStatus])
+async def update_match_results(
+    results: schemas.MatchResultsUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(async_crud.get_current_user)
+):
+    tournament = await async_crud.get_own_tournament(
+        db=db, tournament_id=results.tournament_id, owner_id=current_user.id
+    )
+
+    if not tournament:
+        raise HTTPException(status_code=404, detail='Not found.')
+
+    statuses = await async_crud.update_match_results(
+        db=db,
+        tournament_id=tournament.id,
+        results=[(result.match_id, result.winner_id) for result in results.results]
     )
+    return [
+        {'match_id': result.match_id, 'winner_id': result.winner_id, 'status': code, 'detail': detail}
+        for result, (code, detail) in zip(results.results, statuses)
+    ]
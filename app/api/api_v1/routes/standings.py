@@ -0,0 +1,53 @@
+from fastapi import Depends, APIRouter, Request, Response
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import List
+
+import app.async_crud as async_crud
+import app.crud as crud
+import app.schemas as schemas
+import app.models as models
+from app.coalescing import shared_response
+from app.database import get_async_db, get_db
+from app.etags import not_modified
+from app.pagination import Page, Pagination, paginate
+from app.serialization import rows_response
+
+router = APIRouter()
+
+
+@router.get('/standings', response_model=List[schemas.Standing])
+async def get_standings(
+    request: Request,
+    response: Response,
+    page: Page = Depends(Pagination(key_size=2)),
+    db: AsyncSession = Depends(get_async_db),
+    tournament: models.Tournament = Depends(async_crud.get_current_tournament)
+):
+    cached = not_modified(request, response, tournament.id, tournament.version)
+    if cached:
+        return cached
+
+    async def build():
+        page_response = Response()
+        standings = await async_crud.get_standings(
+            db=db, tournament_id=tournament.id, limit=page.limit + 1, after=page.after
+        )
+        standings = paginate(
+            standings, page, page_response, key=lambda standing: (standing.rank, standing.competitor_id)
+        )
+        return rows_response(standings, schemas.Standing, page_response)
+
+    return await shared_response(request, response, (tournament.id, tournament.version), build)
+
+
+@router.get('/standings/tiebreaks', response_model=List[schemas.Tiebreak])
+def get_tiebreaks(
+    response: Response,
+    page: Page = Depends(Pagination()),
+    db: Session = Depends(get_db),
+    tournament: models.Tournament = Depends(crud.get_current_tournament)
+):
+    tiebreaks = crud.get_tiebreaks(db=db, tournament_id=tournament.id, limit=page.limit + 1, after=page.after)
+    return paginate(tiebreaks, page, response, key=lambda tiebreak: (tiebreak['rank'],))
@@ -1,32 +1,47 @@
-from fastapi import Depends, APIRouter, HTTPException, status
+from fastapi import Depends, APIRouter, HTTPException, Request, Response, status
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-import app.crud as crud
+import app.async_crud as async_crud
 import app.schemas as schemas
 import app.models as models
-from app.database import get_db
+from app.database import get_async_db
+from app.etags import not_modified
+from app.pagination import Page, Pagination, paginate
+from app.serialization import rows_response
 
 
 router = APIRouter()
 
 
 @router.get('/tournaments', response_model=List[schemas.Tournament])
-def get_tournaments(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(crud.get_current_user)
+async def get_tournaments(
+    request: Request,
+    response: Response,
+    page: Page = Depends(Pagination()),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(async_crud.get_current_user)
 ):
-    return crud.get_tournaments_by_owner_id(db=db, owner_id=current_user.id)
+    version = await async_crud.get_tournaments_version(db=db, owner_id=current_user.id)
+    cached = not_modified(request, response, current_user.id, *version)
+    if cached:
+        return cached
+
+    tournaments = await async_crud.get_tournaments_by_owner_id(
+        db=db, owner_id=current_user.id, limit=page.limit + 1, after=page.after
+    )
+    tournaments = paginate(tournaments, page, response, key=lambda tournament: (tournament.id,))
+    return rows_response(tournaments, schemas.Tournament, response)
 
 
 @router.post('/tournaments', response_model=schemas.Tournament, status_code=status.HTTP_201_CREATED)
-def create_own_tournament(
+async def create_own_tournament(
     tournament: schemas.TournamentCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(crud.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(async_crud.get_current_user)
 ):
-    tournament_exists = crud.get_own_tournament_by_name(
+    tournament_exists = await async_crud.get_own_tournament_by_name(
         db=db,
         owner_id=current_user.id,
         name=tournament.name
@@ -34,31 +49,35 @@ def create_own_tournament(
 
     if tournament_exists:
         raise HTTPException(status_code=400, detail='Tournament name already exists.')
-    return crud.create_own_tournament(
+    return await async_crud.create_own_tournament(
         db=db,
         owner_id=current_user.id,
         name=tournament.name,
-        description=tournament.description
+        description=tournament.description,
+        pairing_method=tournament.pairing_method.value
     )
 
 
 @router.put('/tournaments', response_model=schemas.Tournament)
-def update_tournament(
+async def update_tournament(
     tournament: schemas.TournamentUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(crud.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(async_crud.get_current_user)
 ):
-    db_tournament = crud.get_tournament_by_id(db=db, tournament_id=tournament.id)
+    db_tournament = await async_crud.get_own_tournament(
+        db=db, tournament_id=tournament.id, owner_id=current_user.id
+    )
 
-    if not db_tournament or db_tournament.owner_id != current_user.id:
+    if not db_tournament:
         raise HTTPException(status_code=404, detail='Not found.')
 
-    return crud.update_tournament(
+    return await async_crud.update_tournament(
         db=db,
         id=tournament.id,
         name=tournament.name,
         description=tournament.description,
         in_progress=tournament.in_progress,
         in_progress_round=tournament.in_progress_round,
-        complete=tournament.complete
+        complete=tournament.complete,
+        pairing_method=tournament.pairing_method.value if tournament.pairing_method else None
     )
@@ -3,13 +3,13 @@ from datetime import timedelta
 from fastapi import Depends, APIRouter, HTTPException, status, Form
 from fastapi.security import OAuth2PasswordRequestForm
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-import app.crud as crud
+import app.async_crud as async_crud
 import app.models as models
 import app.schemas as schemas
 from app.config import settings
-from app.database import get_db
+from app.database import get_async_db, mark_writer
 from app.dependencies import create_access_token
 
 
@@ -19,9 +19,9 @@ router = APIRouter()
 @router.post('/token')
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+    user = await async_crud.authenticate_user(db, form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(
@@ -29,24 +29,28 @@ async def login_for_access_token(
             detail='Incorrect username or password',
             headers={'WWW-Authenticate': 'Bearer'}
         )
+    # a new user's first reads must not reach a replica that hasn't seen them yet
+    mark_writer(user.username)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={'sub': user.username}, expires_delta=access_token_expires
+        data={'sub': user.username, 'uid': user.id, 'active': user.is_active},
+        expires_delta=access_token_expires
     )
 
     return {'access_token': access_token, 'token_type': 'bearer'}
 
 
 @router.post('/users', response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def create_user(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db=db, username=username)
+async def create_user(username: str = Form(...), password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    db_user = await async_crud.get_user_by_username(db=db, username=username)
     if db_user:
         raise HTTPException(status_code=400, detail='Username already registered')
-    return crud.create_user(db=db, username=username, password=password)
+    return await async_crud.create_user(db=db, username=username, password=password)
 
 
 @router.get('/users/me', response_model=schemas.User)
 async def read_users_me(
-    current_user: models.User = Depends(crud.get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(async_crud.get_current_active_user)
 ):
-    return current_user
+    return await async_crud.get_user(db=db, user_id=current_user.id)
@@ -0,0 +1,348 @@
+"""
+Async equivalents of the crud functions behind the API routes.
+
+Reads are issued straight on the AsyncSession. Writes that also maintain
+standings and opponent history run the sync crud function through
+AsyncSession.run_sync, so that logic has one implementation and its queries
+are still awaited rather than blocking the event loop.
+
+The list queries are built by the *_query functions, so tests can check
+their plans against the indexes meant for them.
+"""
+import asyncio
+
+from fastapi import Depends, HTTPException
+
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import settings
+from app.database import get_async_db
+from app.dependencies import Principal, oauth2_scheme
+from app.serialization import schema_columns
+import app.crud as crud
+import app.models as models
+import app.read_cache as read_cache
+import app.schemas as schemas
+
+
+# USER
+async def get_user(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(models.User)
+        .options(selectinload(models.User.tournaments))
+        .where(models.User.id == user_id)
+    )
+    return result.scalars().first()
+
+
+async def get_user_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
+
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user_by_username(db=db, username=username)
+
+    if not user:
+        return False
+
+    verified = await asyncio.get_running_loop().run_in_executor(
+        crud.password_hashing, crud.verify_password, password, user.hashed_password
+    )
+    if not verified:
+        return False
+
+    return user
+
+
+async def create_user(db: AsyncSession, username: str, password: str):
+    hashed_password = await asyncio.get_running_loop().run_in_executor(
+        crud.password_hashing, crud.get_password_hash, password
+    )
+    db_user = models.User(username=username, hashed_password=hashed_password)
+    db.add(db_user)
+    await db.commit()
+    return await get_user(db=db, user_id=db_user.id)
+
+
+async def get_principal(db: AsyncSession, username: str):
+    # a cache hit doesn't need the session at all
+    principal = crud.principals.get(username)
+    if principal is None:
+        principal = await db.run_sync(crud.get_principal, username=username)
+    return principal
+
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme)
+):
+    username, principal = crud.read_access_token(token)
+
+    if principal is None:
+        principal = await get_principal(db=db, username=username)
+
+    if principal is None:
+        raise crud.credentials_exception()
+    return principal
+
+
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)):
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail='Not found.')
+    return current_user
+
+
+# TOURNAMENT
+def tournaments_query(owner_id: int, limit: int = 100, after: tuple = None):
+    # list queries return plain rows of their response schema's columns, see app.serialization
+    query = (
+        select(*schema_columns(schemas.Tournament, models.Tournament))
+        .where(models.Tournament.owner_id == owner_id)
+    )
+    if after:
+        query = query.where(models.Tournament.id > after[0])
+    return query.order_by(models.Tournament.id).limit(limit)
+
+
+async def get_tournaments_by_owner_id(db: AsyncSession, owner_id: int, limit: int = 100, after: tuple = None):
+    result = await db.execute(tournaments_query(owner_id=owner_id, limit=limit, after=after))
+    return result.all()
+
+
+async def get_tournaments_version(db: AsyncSession, owner_id: int):
+    # versions only go up and tournaments are never deleted, so the count and
+    # the sum of versions change with every write to any of the owner's tournaments
+    result = await db.execute(
+        select(func.count(models.Tournament.id), func.coalesce(func.sum(models.Tournament.version), 0))
+        .where(models.Tournament.owner_id == owner_id)
+    )
+    return tuple(result.one())
+
+
+def own_tournament_by_name_query(owner_id: int, name: str):
+    return select(models.Tournament).where(models.Tournament.owner_id == owner_id, models.Tournament.name == name)
+
+
+async def get_own_tournament_by_name(db: AsyncSession, owner_id: int, name: str):
+    result = await db.execute(own_tournament_by_name_query(owner_id=owner_id, name=name))
+    return result.scalars().first()
+
+
+async def get_tournament_by_id(db: AsyncSession, tournament_id: int):
+    # a plain row of the tournament's columns, so it can be cached, see app.read_cache
+    async def load():
+        result = await db.execute(
+            select(models.Tournament.__table__).where(models.Tournament.id == tournament_id)
+        )
+        return result.first()
+
+    # the version tags what the replica returns, it must not be ahead of the replica
+    if read_cache.from_replica(db):
+        return await load()
+    return await read_cache.get_or_load(db, ('tournament', tournament_id), (), load)
+
+
+async def get_own_tournament(db: AsyncSession, tournament_id: int, owner_id: int):
+    tournament = await get_tournament_by_id(db=db, tournament_id=tournament_id)
+    if tournament is None or tournament.owner_id != owner_id:
+        return None
+    return tournament
+
+
+async def get_current_tournament(
+    tournament_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    tournament = await get_own_tournament(db=db, tournament_id=tournament_id, owner_id=current_user.id)
+    if not tournament:
+        raise HTTPException(status_code=404, detail='Not found.')
+    return tournament
+
+
+async def create_own_tournament(
+    db: AsyncSession,
+    owner_id: int,
+    name: str,
+    description: str,
+    pairing_method: str = 'greedy'
+):
+    return await db.run_sync(
+        crud.create_own_tournament,
+        owner_id=owner_id,
+        name=name,
+        description=description,
+        pairing_method=pairing_method
+    )
+
+
+async def update_tournament(
+    db: AsyncSession,
+    id: int,
+    name: str,
+    description: str,
+    in_progress: int,
+    in_progress_round: int,
+    complete: bool,
+    pairing_method: str = None
+):
+    return await db.run_sync(
+        crud.update_tournament,
+        id=id,
+        name=name,
+        description=description,
+        in_progress=in_progress,
+        in_progress_round=in_progress_round,
+        complete=complete,
+        pairing_method=pairing_method
+    )
+
+
+# COMPETITOR
+def tournament_competitors_query(tournament_id: int, limit: int = None, after: tuple = None):
+    query = (
+        select(*schema_columns(schemas.Competitor, models.Competitor))
+        .where(models.Competitor.tournament_id == tournament_id)
+    )
+    if after:
+        wins, competitor_id = after
+        # wins <= bounds the index scan, the rest only steps over ties already seen
+        query = query.where(
+            models.Competitor.wins <= wins,
+            or_(models.Competitor.wins < wins, models.Competitor.id > competitor_id)
+        )
+    return query.order_by(models.Competitor.wins.desc(), models.Competitor.id).limit(limit)
+
+
+async def get_tournament_competitors(db: AsyncSession, tournament_id: int, limit: int = 100, after: tuple = None):
+    async def load():
+        result = await db.execute(tournament_competitors_query(tournament_id=tournament_id, limit=limit, after=after))
+        return result.all()
+
+    return await read_cache.get_or_load(db, ('competitors', tournament_id), (limit, after), load)
+
+
+async def stream_tournament_competitors(db: AsyncSession, tournament_id: int):
+    # every competitor in list order, EXPORT_CHUNK_SIZE rows at a time off a server side cursor
+    result = await db.stream(tournament_competitors_query(tournament_id=tournament_id))
+    async for rows in result.partitions(settings.EXPORT_CHUNK_SIZE):
+        yield rows
+
+
+async def get_competitor(db: AsyncSession, competitor_id: int):
+    return await db.get(models.Competitor, competitor_id)
+
+
+async def get_tournament_competitor_ids(db: AsyncSession, tournament_id: int, competitor_ids: list):
+    result = await db.execute(
+        select(models.Competitor.id)
+        .where(models.Competitor.tournament_id == tournament_id, models.Competitor.id.in_(competitor_ids))
+    )
+    return set(result.scalars().all())
+
+
+async def create_competitor(db: AsyncSession, name: str, tournament_id: int):
+    return await db.run_sync(crud.create_competitor, name=name, tournament_id=tournament_id)
+
+
+async def update_competitor(db: AsyncSession, competitor_id: int, competitor_name: str, wins: int, losses: int):
+    return await db.run_sync(
+        crud.update_competitor,
+        competitor_id=competitor_id,
+        competitor_name=competitor_name,
+        wins=wins,
+        losses=losses
+    )
+
+
+# Match
+def matches_query(tournament_id: int, round: int, limit: int = None, after: tuple = None):
+    query = select(*schema_columns(schemas.Match, models.Match)).where(models.Match.tournament_id == tournament_id)
+    if round:
+        query = query.where(models.Match.round == round)
+    if after:
+        query = query.where(tuple_(models.Match.round, models.Match.id) > tuple_(*after))
+    return query.order_by(models.Match.round, models.Match.id).limit(limit)
+
+
+async def get_matches(db: AsyncSession, tournament_id: int, round: int, limit: int = 100, after: tuple = None):
+    async def load():
+        result = await db.execute(matches_query(tournament_id=tournament_id, round=round, limit=limit, after=after))
+        return result.all()
+
+    # round 0 reads every round
+    return await read_cache.get_or_load(db, ('matches', tournament_id, round or None), (limit, after), load)
+
+
+async def stream_matches(db: AsyncSession, tournament_id: int, round: int):
+    result = await db.stream(matches_query(tournament_id=tournament_id, round=round))
+    async for rows in result.partitions(settings.EXPORT_CHUNK_SIZE):
+        yield rows
+
+
+async def create_match(db: AsyncSession, tournament_id: int, competitor_one: int, competitor_two: int):
+    return await db.run_sync(
+        crud.create_match,
+        tournament_id=tournament_id,
+        competitor_one=competitor_one,
+        competitor_two=competitor_two
+    )
+
+
+async def create_round(db: AsyncSession, tournament_id: int, round: int, pairings: list):
+    return await db.run_sync(crud.create_round, tournament_id=tournament_id, round=round, pairings=pairings)
+
+
+async def get_match_for_update(db: AsyncSession, tournament_id: int, match_id: int):
+    return await db.run_sync(crud.get_match_for_update, tournament_id=tournament_id, match_id=match_id)
+
+
+async def update_match(
+    db: AsyncSession,
+    tournament_id: int,
+    match_id: int,
+    winner_id: int,
+    match: models.Match = None
+):
+    return await db.run_sync(
+        crud.update_match, tournament_id=tournament_id, match_id=match_id, winner_id=winner_id, match=match
+    )
+
+
+async def reverse_match_result(db: AsyncSession, tournament_id: int, match_id: int):
+    return await db.run_sync(crud.reverse_match_result, tournament_id=tournament_id, match_id=match_id)
+
+
+async def update_match_results(db: AsyncSession, tournament_id: int, results: list):
+    return await db.run_sync(crud.update_match_results, tournament_id=tournament_id, results=results)
+
+
+# STANDINGS
+def standings_query(tournament_id: int, limit: int = None, after: tuple = None):
+    query = (
+        select(
+            models.Standing.rank,
+            models.Standing.competitor_id,
+            models.Competitor.name,
+            models.Standing.wins,
+            models.Standing.losses,
+            models.Standing.buchholz,
+            models.Standing.sonneborn_berger
+        )
+        .join(models.Competitor, models.Competitor.id == models.Standing.competitor_id)
+        .where(models.Standing.tournament_id == tournament_id)
+    )
+    if after:
+        query = query.where(tuple_(models.Standing.rank, models.Standing.competitor_id) > tuple_(*after))
+    return query.order_by(models.Standing.rank, models.Standing.competitor_id).limit(limit)
+
+
+async def get_standings(db: AsyncSession, tournament_id: int, limit: int = 100, after: tuple = None):
+    async def load():
+        result = await db.execute(standings_query(tournament_id=tournament_id, limit=limit, after=after))
+        return result.all()
+
+    return await read_cache.get_or_load(db, ('standings', tournament_id), (limit, after), load)
@@ -0,0 +1,206 @@
+"""
+Pair the next round for many tournaments at once.
+
+Tournament state is loaded in a few queries for the whole batch, each round
+is paired in a process pool and every round is written back in a single
+transaction. If that fails the rounds are written one tournament at a time,
+so only the tournaments whose round can't be written report an error. From
+the command line:
+
+    python -m app.batch 12 13 14 --workers 4
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from threading import Lock
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+import app.crud as crud
+import app.history as history
+import app.models as models
+import app.pairing as pairing
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = Lock()
+
+
+def get_executor(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    # one pool for the life of the process, created on first use. Spawn rather
+    # than fork, the parent is a threaded server holding db connections.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers or settings.BATCH_PAIRING_WORKERS,
+                mp_context=get_context('spawn')
+            )
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor):
+    # a worker died, the next batch starts a new pool
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _write_rounds(db: Session, rounds: list, results: Dict[int, dict]):
+    try:
+        crud.create_rounds(db=db, rounds=rounds)
+        return
+    except Exception:
+        db.rollback()
+    for tid, round, pairings in rounds:
+        try:
+            crud.create_rounds(db=db, rounds=[(tid, round, pairings)])
+        except Exception as e:
+            db.rollback()
+            results[tid].update(round=None, matches=0, error=str(e) or e.__class__.__name__)
+
+
+def _load_histories(db: Session, match_counts: Dict[int, int]):
+    # match_counts maps tournament ids to their committed match count, one query
+    # reloads every history that isn't loaded or is missing some of them
+    loaded = {}
+    for tid, match_count in match_counts.items():
+        tournament_history = history.get(tid)
+        if tournament_history is not None and tournament_history.match_count == match_count:
+            loaded[tid] = tournament_history
+    missing = [tid for tid in match_counts if tid not in loaded]
+    if missing:
+        rows = {tid: [] for tid in missing}
+        for tournament_id, *match in (
+            db.query(
+                models.Match.tournament_id,
+                models.Match.id,
+                models.Match.competitor_one,
+                models.Match.competitor_two
+            )
+            .filter(models.Match.tournament_id.in_(missing))
+            .all()
+        ):
+            rows[tournament_id].append(match)
+        for tournament_id, matches in rows.items():
+            loaded[tournament_id] = history.load(tournament_id, matches)
+    return loaded
+
+
+def pair_tournaments(
+    db: Session,
+    tournament_ids: List[int],
+    owner_id: Optional[int] = None,
+    max_workers: Optional[int] = None
+):
+    """
+    Pair and write the next round of every tournament in tournament_ids.
+
+    Returns one result per tournament with the round number, the number of
+    matches created, the pairing time in seconds and an error message if
+    that tournament could not be paired. A failure in one tournament does
+    not stop the others.
+    """
+    results = {
+        tid: {'tournament_id': tid, 'round': None, 'matches': 0, 'seconds': 0.0, 'error': None}
+        for tid in dict.fromkeys(tournament_ids)
+    }
+
+    query = db.query(models.Tournament).filter(models.Tournament.id.in_(list(results)))
+    if owner_id is not None:
+        query = query.filter(models.Tournament.owner_id == owner_id)
+    tournaments = {tournament.id: tournament for tournament in query.all()}
+    for tid, result in results.items():
+        if tid not in tournaments:
+            result['error'] = 'Not found.'
+    if not tournaments:
+        return list(results.values())
+
+    standings = {tid: [] for tid in tournaments}
+    for tournament_id, competitor_id, wins in (
+        db.query(models.Competitor.tournament_id, models.Competitor.id, models.Competitor.wins)
+        .filter(models.Competitor.tournament_id.in_(list(tournaments)))
+        .order_by(models.Competitor.tournament_id, models.Competitor.wins.desc(), models.Competitor.id)
+        .all()
+    ):
+        standings[tournament_id].append((competitor_id, wins))
+
+    # the first round is 0, after that it's one past the highest round played
+    next_rounds = {
+        tid: 0 if tournament.current_round is None else tournament.current_round + 1
+        for tid, tournament in tournaments.items()
+    }
+
+    histories = _load_histories(db, {
+        tid: tournament.matches_pending + tournament.matches_completed
+        for tid, tournament in tournaments.items()
+    })
+
+    rounds = []
+    executor = get_executor(max_workers)
+    futures = {
+        tid: executor.submit(
+            pairing.pair_round_timed,
+            tournament.pairing_method,
+            standings[tid],
+            histories[tid].opponents,
+            histories[tid].byes,
+            next_rounds[tid] == 0
+        )
+        for tid, tournament in tournaments.items()
+    }
+    for tid, future in futures.items():
+        try:
+            pairings, seconds = future.result()
+        except BrokenProcessPool as e:
+            _discard_executor(executor)
+            results[tid]['error'] = str(e) or e.__class__.__name__
+            continue
+        except Exception as e:
+            results[tid]['error'] = str(e) or e.__class__.__name__
+            continue
+        results[tid].update(round=next_rounds[tid], matches=len(pairings), seconds=seconds)
+        rounds.append((tid, next_rounds[tid], pairings))
+
+    if rounds:
+        _write_rounds(db=db, rounds=rounds, results=results)
+    return list(results.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pair the next round for many tournaments at once.')
+    parser.add_argument('tournament_ids', metavar='tournament_id', type=int, nargs='+')
+    parser.add_argument('--workers', type=int, default=None, help='pairing processes, defaults to one per cpu')
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        start = perf_counter()
+        results = pair_tournaments(db=db, tournament_ids=args.tournament_ids, max_workers=args.workers)
+        elapsed = perf_counter() - start
+    finally:
+        db.close()
+
+    failed = 0
+    for result in results:
+        if result['error']:
+            failed += 1
+            print(f"{result['tournament_id']:>10}  FAILED  {result['error']}")
+        else:
+            print(
+                f"{result['tournament_id']:>10}  round {result['round']:<4} "
+                f"{result['matches']:>6} matches  {result['seconds'] * 1000:8.1f} ms"
+            )
+    print(f'{len(results) - failed} paired, {failed} failed in {elapsed:.2f}s')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
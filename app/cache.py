@@ -0,0 +1,104 @@
+"""
+Small caches.
+
+LRUCache lives in the process. RedisCache has the same get, set and pop but
+keeps its entries in Redis, so every worker and host sees the same ones.
+"""
+from collections import OrderedDict
+import pickle
+from threading import Lock
+from time import monotonic
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Thread safe least recently used cache.
+
+    Holds at most maxsize entries. With ttl set, entries older than ttl
+    seconds are treated as missing.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires is not None and expires <= monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        expires = monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None:
+            return default
+        value, expires = item
+        if expires is not None and expires <= monotonic():
+            return default
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Cache kept in Redis, values are pickled.
+
+    Needs the redis package unless a client is passed in. Keys are repr'd
+    under prefix, so tuples of ids work as they do with LRUCache. With ttl
+    set, Redis expires entries after ttl seconds.
+    """
+
+    def __init__(self, url: Optional[str] = None, ttl: Optional[float] = None, client=None, prefix: str = 'swiss:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key: Hashable) -> str:
+        return f'{self.prefix}{key!r}'
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self.client.get(self._key(key))
+        if value is None:
+            return default
+        return pickle.loads(value)
+
+    def set(self, key: Hashable, value: Any):
+        px = int(self.ttl * 1000) if self.ttl is not None else None
+        self.client.set(self._key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), px=px)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        key = self._key(key)
+        value = self.client.get(key)
+        self.client.delete(key)
+        return default if value is None else pickle.loads(value)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=f'{self.prefix}*'):
+            self.client.delete(key)
@@ -0,0 +1,94 @@
+"""
+Single-flight coalescing for hot identical reads.
+
+When a round is posted every client asks for the same page of matches at
+once. Requests for the same path and query string of the same version of a
+tournament get identical bodies, so the first one builds the response and
+the others that arrive while it is being built wait for it and send copies
+of its bytes, instead of each running the query and serializing the rows.
+
+Nothing is kept once the response is built, app.read_cache does the caching.
+Coalescing is per process and per event loop.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+from fastapi import Request, Response
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time, concurrent callers with the same key
+    share its result or exception.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        future = self._futures.get(key)
+        if future is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            # the request running it was cancelled rather than this one, run it again
+            return await self.do(key, fn)
+
+        self.calls += 1
+        future = asyncio.get_running_loop().create_future()
+        self._futures[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # retrieved here so asyncio doesn't log it when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._futures[key]
+
+
+in_flight = SingleFlight()
+
+
+async def shared_response(
+    request: Request,
+    response: Response,
+    state: tuple,
+    build: Callable[[], Awaitable[Response]]
+) -> Response:
+    """
+    Return a copy of the response build() makes, shared with every request
+    for the same path and query string with the same state while it runs.
+
+    state identifies the version of the data, like (tournament.id,
+    tournament.version). Headers set on response, like the ETag, are added
+    to the copy.
+    """
+    built = await in_flight.do((request.url.path, request.url.query, state), build)
+    copy = Response(status_code=built.status_code)
+    copy.body = built.body
+    copy.raw_headers = [*built.raw_headers, *response.raw_headers]
+    return copy
+
+
+def metrics() -> str:
+    return '\n'.join([
+        '# HELP swiss_coalesced_calls_total Responses built for coalesced reads.',
+        '# TYPE swiss_coalesced_calls_total counter',
+        f'swiss_coalesced_calls_total {in_flight.calls}',
+        '# HELP swiss_coalesced_shared_total Requests answered with a response another request built.',
+        '# TYPE swiss_coalesced_shared_total counter',
+        f'swiss_coalesced_shared_total {in_flight.shared}',
+    ]) + '\n'
@@ -1,5 +1,7 @@
+import os
+
 from pydantic import BaseSettings, PostgresDsn, validator
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -17,6 +19,54 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
     SQLALCHEMY_DATABASE_URI: Optional[PostgresDsn] = None
+    # read only replica the async GET routes read from, they use the primary when unset
+    SQLALCHEMY_REPLICA_URI: Optional[PostgresDsn] = None
+    # seconds a user's reads stay on the primary after they write, so they see their own writes.
+    # Writers are remembered where READ_CACHE_BACKEND keeps the cache, with 'redis' every worker
+    # knows about them, otherwise only the worker that took the write does.
+    REPLICA_STICKY_SECONDS: float = 5
+
+    # per engine, the sync and async engines each get their own pool
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # seconds to wait for a connection before giving up
+    DB_POOL_TIMEOUT: float = 30
+    # seconds before a connection is replaced, -1 keeps them forever
+    DB_POOL_RECYCLE: int = 1800
+    # test connections on checkout so ones dropped by a failover are replaced
+    DB_POOL_PRE_PING: bool = True
+
+    # verified tokens and the users they belong to are cached for AUTH_CACHE_TTL seconds, users
+    # in Redis with READ_CACHE_BACKEND=redis, otherwise per process, where deactivating a user
+    # only takes effect on the other processes once their entry runs out
+    AUTH_CACHE_SIZE: int = 4096
+    AUTH_CACHE_TTL: float = 60
+    # trust the user id and active flag signed into the token instead of looking the
+    # user up, a deactivated user keeps access until their token expires
+    AUTH_STATELESS: bool = False
+
+    # threads hashing and verifying passwords, defaults to one per cpu
+    PASSWORD_HASH_WORKERS: int = os.cpu_count() or 1
+
+    # rows per page of a list endpoint, unless the caller asks for up to MAX_PAGE_SIZE
+    PAGE_SIZE: int = 100
+    MAX_PAGE_SIZE: int = 1000
+    # rows fetched from the server side cursor at a time by the streaming exports
+    EXPORT_CHUNK_SIZE: int = 1000
+
+    # read-through cache for tournaments, competitors, matches and standings, see
+    # app.read_cache. Off by default. 'redis' shares it at READ_CACHE_URL between
+    # every worker and needs the redis package. 'memory' keeps it in each process,
+    # only safe with a single worker: other workers serve a write's old rows until
+    # READ_CACHE_TTL runs out, even to the user who wrote, so with more than one
+    # worker use 'redis' or leave it off.
+    READ_CACHE_BACKEND: Literal['memory', 'redis', 'none'] = 'none'
+    READ_CACHE_URL: Optional[str] = None
+    READ_CACHE_SIZE: int = 4096
+    READ_CACHE_TTL: float = 10
+
+    # processes used to pair tournaments in batch, defaults to one per cpu
+    BATCH_PAIRING_WORKERS: Optional[int] = None
 
     @validator('SQLALCHEMY_DATABASE_URI', pre=True)
     def assemble_db_connection(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
@@ -1,17 +1,36 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 
 from jose import JWTError, jwt
+import numpy as np
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+
+from sqlalchemy import bindparam, func, insert, or_, select, union_all, update
+from sqlalchemy.orm import Session, aliased
 
 from app.database import get_db
-from app.dependencies import TokenData, oauth2_scheme
+from app.dependencies import Principal, TokenData, oauth2_scheme
 from app.config import settings
+from app.cache import LRUCache, RedisCache
+import app.history as history
 import app.models as models
-import app.schemas as schemas
+import app.pairing as pairing
+import app.read_cache as read_cache
+import app.tiebreaks as tiebreaks
 
 
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+# bcrypt is CPU bound, a dedicated pool keeps logins off the event loop without
+# letting a burst of them take every thread in the request threadpool
+password_hashing = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hashing'
+)
+
+MATCH_INSERT_BATCH_SIZE = 10000
 
 
 # USER
@@ -23,91 +42,154 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db=db, username=username)
+def get_user(db: Session, user_id: int):
+    return db.query(models.User).filter(models.User.id == user_id).first()
 
-    if not user:
-        return False
 
-    if not verify_password(password, user.hashed_password):
-        return False
+def create_principal_cache():
+    # kept with the read cache, so with Redis a deactivation drops the user on every worker.
+    # Otherwise other workers keep serving a deactivated user for up to AUTH_CACHE_TTL seconds.
+    if settings.READ_CACHE_BACKEND == 'redis':
+        return RedisCache(settings.READ_CACHE_URL, ttl=settings.AUTH_CACHE_TTL, prefix='swiss-principals:')
+    return LRUCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
 
-    return user
 
+# token -> verified claims and username -> Principal, so most requests skip both
+# the signature check and the user query. Claims are kept until the token expires
+# or for AUTH_CACHE_TTL seconds, whichever comes first.
+verified_tokens = LRUCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+principals = create_principal_cache()
 
-def get_user(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
 
+def decode_access_token(token: str):
+    claims = verified_tokens.get(token)
+    if claims is not None and claims.get('exp', float('inf')) > time():
+        return claims
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    verified_tokens.set(token, claims)
+    return claims
 
-async def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-):
-    credentials_exception = HTTPException(
+
+def get_principal(db: Session, username: str):
+    principal = principals.get(username)
+    if principal is None:
+        user = get_user_by_username(db=db, username=username)
+        if user is None:
+            return
+        principal = Principal.from_orm(user)
+        principals.set(username, principal)
+    return principal
+
+
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail='Invalid authentication credentials',
         headers={'WWW-Authenticate': 'Bearer'},
     )
-       
+
+
+def read_access_token(token: str):
+    # the token's username, and its Principal when AUTH_STATELESS lets the token
+    # stand in for the user lookup. Shared by the sync and async get_current_user.
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_access_token(token)
         username: str = payload.get('sub')
 
         if username is None:
-            raise credentials_exception
+            raise credentials_exception()
         token_data = TokenData(username=username)
     except JWTError:
-        raise credentials_exception
+        raise credentials_exception()
+
+    if settings.AUTH_STATELESS and 'uid' in payload:
+        return token_data.username, Principal(
+            id=payload['uid'], username=token_data.username, is_active=payload.get('active', True)
+        )
+    return token_data.username, None
 
-    user = get_user_by_username(db=db, username=token_data.username)
 
-    if user is None:
-        raise credentials_exception
-    return user
+async def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme)
+):
+    username, principal = read_access_token(token)
 
+    # only a cache miss needs the database, and that runs off the event loop
+    if principal is None:
+        principal = principals.get(username)
+    if principal is None:
+        principal = await run_in_threadpool(get_principal, db=db, username=username)
 
-async def get_current_active_user(current_user: schemas.User = Depends(get_current_user)):
-    if not current_user.is_active:
-        raise HTTPException(status_code=400, detail='Not found.')
-    return current_user
+    if principal is None:
+        raise credentials_exception()
+    return principal
 
 
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
-
-
-def create_user(db: Session, username: str, password: str):
-    hashed_password = get_password_hash(password)
-    db_user = models.User(username=username, hashed_password=hashed_password)
-    db.add(db_user)
+def set_user_active(db: Session, user_id: int, is_active: bool):
+    user = get_user(db=db, user_id=user_id)
+    if not user:
+        return
+    user.is_active = is_active
+    db.add(user)
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    db.refresh(user)
+    # cached principals must not outlive a deactivation
+    principals.pop(user.username)
+    return user
 
 
 # TOURNAMENT
-def get_tournaments(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Tournament).offset(skip).limit(limit).all()
-
-
 def get_tournament_by_id(db: Session, tournament_id: int):
-    return db.query(models.Tournament).filter(models.Tournament.id == tournament_id).first()
-
-
-def get_tournaments_by_owner_id(db: Session, owner_id: int):
-    return db.query(models.Tournament).filter(models.Tournament.owner_id == owner_id).all()
+    # Session.get skips the query when the tournament is already in the session
+    return db.get(models.Tournament, tournament_id)
+
+
+def get_own_tournament(db: Session, tournament_id: int, owner_id: int):
+    # one owner-filtered query, remembered for the rest of the session so later
+    # lookups in the same request are free
+    own_tournaments = db.info.setdefault('own_tournaments', {})
+    tournament = own_tournaments.get((tournament_id, owner_id))
+    if tournament is None:
+        tournament = (
+            db.query(models.Tournament)
+            .filter(models.Tournament.id == tournament_id, models.Tournament.owner_id == owner_id)
+            .first()
+        )
+        if tournament is not None:
+            own_tournaments[(tournament_id, owner_id)] = tournament
+    return tournament
 
 
-def get_own_tournament_by_name(db: Session, owner_id: int, name: str):
-    return db.query(models.Tournament).filter(models.Tournament.owner_id == owner_id).filter(models.Tournament.name == name).first()
+def get_current_tournament(
+    tournament_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # route dependency for a tournament_id query parameter, 404 unless the current user owns it
+    tournament = get_own_tournament(db=db, tournament_id=tournament_id, owner_id=current_user.id)
+    if not tournament:
+        raise HTTPException(status_code=404, detail='Not found.')
+    return tournament
 
 
-def create_own_tournament(db: Session, owner_id: int, name: str, description: str):
-    db_tournament = models.Tournament(name=name, description=description, owner_id=owner_id)
+def create_own_tournament(
+    db: Session,
+    owner_id: int,
+    name: str,
+    description: str,
+    pairing_method: str = 'greedy'
+):
+    db_tournament = models.Tournament(
+        name=name,
+        description=description,
+        owner_id=owner_id,
+        pairing_method=pairing_method
+    )
     db.add(db_tournament)
     db.commit()
     db.refresh(db_tournament)
@@ -115,7 +197,7 @@ def create_own_tournament(db: Session, owner_id: int, name: str, description: st
 
 
 def update_tournament(db=Session, id=int, name=str, description=str,
-        in_progress=int, in_progress_round=int, complete=bool):
+        in_progress=int, in_progress_round=int, complete=bool, pairing_method=None):
     tournament = get_tournament_by_id(db=db, tournament_id=id)
     tournament.id = id
     tournament.name = name
@@ -123,7 +205,11 @@ def update_tournament(db=Session, id=int, name=str, description=str,
     tournament.in_progress = in_progress
     tournament.in_progress_round = in_progress_round
     tournament.complete = complete
-    
+    if pairing_method is not None:
+        tournament.pairing_method = pairing_method
+    tournament.version = models.Tournament.version + 1
+    read_cache.invalidate_on_commit(db=db, tournament_id=id)
+
     db.add(tournament)
     db.commit()
     db.refresh(tournament)
@@ -131,24 +217,17 @@ def update_tournament(db=Session, id=int, name=str, description=str,
 
 
 # COMPETITOR
-def get_tournament_competitors(db: Session, tournament_id: int, skip: int = 0):
-    return (
-        db.query(models.Competitor)
-        .filter(models.Competitor.tournament_id == tournament_id)
-        .order_by(models.Competitor.wins.desc())
-        .offset(skip)
-        .limit(100)
-        .all()
-    )
-
-
 def get_competitor(db: Session, competitor_id: int):
-    return db.query(models.Competitor).filter(models.Competitor.id == competitor_id).first()
+    return db.get(models.Competitor, competitor_id)
 
 
 def create_competitor(db: Session, name: str, tournament_id: int):
     db_competitor = models.Competitor(name=name, tournament_id=tournament_id, wins=0, losses=0)
     db.add(db_competitor)
+    db.flush()
+    create_standing(db=db, competitor_id=db_competitor.id, tournament_id=tournament_id)
+    bump_tournament_version(db=db, tournament_id=tournament_id)
+    read_cache.invalidate_on_commit(db=db, tournament_id=tournament_id, competitors=True)
     db.commit()
     db.refresh(db_competitor)
     return db_competitor
@@ -162,53 +241,39 @@ def update_competitor(
     losses: int
 ):
     competitor = get_competitor(db=db, competitor_id=competitor_id)
+    if not competitor:
+        return
+    lock_tournament_results(db=db, tournament_id=competitor.tournament_id)
+    db.refresh(competitor)
+    # left out wins or losses count as 0, as they do in the standings
+    wins_change = (wins or 0) - competitor.wins
     competitor.name = competitor_name
-    competitor.wins = wins
-    competitor.losses = losses
+    competitor.wins = wins or 0
+    competitor.losses = losses or 0
     db.add(competitor)
+    db.flush()
+    if wins_change:
+        shift_standing_score(db=db, competitor_id=competitor_id, change=wins_change)
+    db.execute(
+        update(models.Standing)
+        .where(models.Standing.competitor_id == competitor_id)
+        .values(losses=losses or 0)
+        .execution_options(synchronize_session=False)
+    )
+    rank_standings(db=db, tournament_id=competitor.tournament_id)
+    bump_tournament_version(db=db, tournament_id=competitor.tournament_id, ranks_stale=False)
+    read_cache.invalidate_on_commit(db=db, tournament_id=competitor.tournament_id, competitors=True)
     db.commit()
     db.refresh(competitor)
     return competitor
 
 
 # Match
-def get_matches(db: Session, tournament_id: int, round: int):
-    if (round):
-        return (
-            db.query(models.Match)
-            .filter(
-                # using "==" instead of "is" to work with sqlalchemy
-                models.Match.tournament_id == tournament_id,
-                models.Match.round == round
-            )
-            .all()
-        )
-    else:
-        return (
-            db.query(models.Match)
-            .filter(
-                # using "==" instead of "is" to work with sqlalchemy
-                models.Match.tournament_id == tournament_id,
-            )
-            .all()
-        )
-
-
-def get_match_by_id(db: Session, tournament_id: int, match_id: int):
-    return (
-        db.query(models.Match)
-        .filter(
-            models.Match.tournament_id == tournament_id,
-            models.Match.id == match_id
-        )
-        .first()
-    )
-
-#TODO: remove tournament id
 def get_matches_by_competitor(db: Session, tournament_id: int, competitor_id: int):
     return (
         db.query(models.Match)
         .filter(
+            models.Match.tournament_id == tournament_id,
             (models.Match.competitor_one == competitor_id) |
             (models.Match.competitor_two == competitor_id)
         )
@@ -216,6 +281,28 @@ def get_matches_by_competitor(db: Session, tournament_id: int, competitor_id: in
     )
 
 
+def get_match_count(db: Session, tournament_id: int):
+    # committed matches, byes included, read from the round state on the tournament row
+    return (
+        db.query(models.Tournament.matches_pending + models.Tournament.matches_completed)
+        .filter(models.Tournament.id == tournament_id)
+        .scalar()
+    )
+
+
+def get_opponent_history(db: Session, tournament_id: int):
+    # reloaded when another worker has written matches this process hasn't seen
+    tournament_history = history.get(tournament_id)
+    if tournament_history is None or tournament_history.match_count != get_match_count(db, tournament_id):
+        matches = (
+            db.query(models.Match.id, models.Match.competitor_one, models.Match.competitor_two)
+            .filter(models.Match.tournament_id == tournament_id)
+            .all()
+        )
+        tournament_history = history.load(tournament_id, matches)
+    return tournament_history
+
+
 def create_match(
     db: Session,
     tournament_id: int,
@@ -230,112 +317,625 @@ def create_match(
         round=round
     )
     db.add(db_match)
+    add_round_matches(
+        db=db,
+        rounds=[(tournament_id, round, 0 if competitor_two is None else 1, 1 if competitor_two is None else 0)]
+    )
     db.commit()
     db.refresh(db_match)
+    history.record_matches(tournament_id, [(db_match.id, competitor_one, competitor_two)])
     return db_match
     
 
-def update_match(db: Session, tournament_id: int, match_id: int, winner_id: int):
-    match = get_match_by_id(db=db, tournament_id=tournament_id, match_id=match_id)
-    if not match:
+def create_round(db: Session, tournament_id: int, round: int, pairings: list):
+    # pairings are (competitor_one, competitor_two) tuples, competitor_two is None for a bye.
+    # One multi-row INSERT ... RETURNING and one commit for the whole round, the
+    # returned rows can be used directly as a List[schemas.Match] response.
+    return create_rounds(db=db, rounds=[(tournament_id, round, pairings)])
+
+
+def create_rounds(db: Session, rounds: list):
+    # rounds are (tournament_id, round, pairings) tuples, all written in one transaction
+    values = [
+        {
+            'tournament_id': tournament_id,
+            'competitor_one': competitor_one,
+            'competitor_two': competitor_two,
+            'round': round,
+        }
+        for tournament_id, round, pairings in rounds
+        for competitor_one, competitor_two in pairings
+    ]
+    add_round_matches(db=db, rounds=[
+        (
+            tournament_id,
+            round,
+            sum(1 for _, competitor_two in pairings if competitor_two is not None),
+            sum(1 for _, competitor_two in pairings if competitor_two is None)
+        )
+        for tournament_id, round, pairings in rounds
+        if pairings
+    ])
+    matches = []
+    # postgres caps a statement at 65535 bind parameters, four per match
+    for start in range(0, len(values), MATCH_INSERT_BATCH_SIZE):
+        matches += db.execute(
+            insert(models.Match)
+            .values(values[start:start + MATCH_INSERT_BATCH_SIZE])
+            .returning(*models.Match.__table__.columns)
+        ).all()
+    db.commit()
+    inserted = {}
+    for m in matches:
+        inserted.setdefault(m.tournament_id, []).append((m.id, m.competitor_one, m.competitor_two))
+    for tournament_id, tournament_matches in inserted.items():
+        history.record_matches(tournament_id, tournament_matches)
+    return matches
+
+
+def add_round_matches(db: Session, rounds: list):
+    # rounds are (tournament_id, round, pending, completed) tuples of new matches,
+    # byes have no result to wait for and count as completed. Tournaments are
+    # updated in id order so concurrent batches lock their rows in the same order.
+    if not rounds:
         return
-    if winner_id:
-        competitor_one = get_competitor(db=db, competitor_id=match.competitor_one)
-        competitor_two = get_competitor(db=db, competitor_id=match.competitor_two)
+    for tournament_id, round, _, _ in rounds:
+        read_cache.invalidate_on_commit(db=db, tournament_id=tournament_id, rounds=[round])
+    tournaments = models.Tournament.__table__
+    db.execute(
+        tournaments.update()
+        .where(tournaments.c.id == bindparam('b_tournament_id'))
+        .values(
+            current_round=func.greatest(tournaments.c.current_round, bindparam('b_round')),
+            matches_pending=tournaments.c.matches_pending + bindparam('pending'),
+            matches_completed=tournaments.c.matches_completed + bindparam('completed'),
+            version=tournaments.c.version + 1
+        ),
+        [
+            {'b_tournament_id': tournament_id, 'b_round': round, 'pending': pending, 'completed': completed}
+            for tournament_id, round, pending, completed in sorted(rounds)
+        ]
+    )
+
+
+def bump_tournament_version(db: Session, tournament_id: int, completed: int = 0, ranks_stale: bool = None):
+    # every write to a tournament's data bumps its version, see app.etags. completed
+    # moves that many matches from pending to completed, negative to move them back.
+    # ranks_stale marks whether the standings still need rank_stale_standings.
+    values = {'version': models.Tournament.version + 1}
+    if ranks_stale is not None:
+        values['ranks_stale'] = ranks_stale
+    if completed:
+        values.update(
+            matches_pending=models.Tournament.matches_pending - completed,
+            matches_completed=models.Tournament.matches_completed + completed
+        )
+    db.execute(
+        update(models.Tournament)
+        .where(models.Tournament.id == tournament_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
 
-        if winner_id == competitor_one.id:
-            winner = competitor_one
-            loser = competitor_two
 
-        if winner_id == competitor_two.id:
-            winner = competitor_two
-            loser = competitor_one
+def lock_tournament_results(db: Session, tournament_id: int):
+    # result entry for a tournament is serialized on its row, so concurrent reports
+    # can't interleave their standings updates or deadlock on each other's rows.
+    # NO KEY UPDATE still lets matches and competitors referencing it be inserted.
+    db.query(models.Tournament.id).filter(
+        models.Tournament.id == tournament_id
+    ).with_for_update(key_share=True).scalar()
 
-        wins = winner.wins + 1
-        losses = loser.losses + 1
 
-        update_competitor(
-            db=db,
-            competitor_id=winner.id,
-            competitor_name=winner.name,
-            wins=wins,
-            losses=winner.losses
+def _increment_results(db: Session, winner_id: int, loser_id: int, change: int):
+    db.execute(
+        update(models.Competitor)
+        .where(models.Competitor.id == winner_id)
+        .values(wins=models.Competitor.wins + change)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(models.Competitor)
+        .where(models.Competitor.id == loser_id)
+        .values(losses=models.Competitor.losses + change)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _record_result(db: Session, match: models.Match, winner_id: int):
+    loser_id = match.competitor_two if winner_id == match.competitor_one else match.competitor_one
+    match.winner_id = winner_id
+    match.loser_id = loser_id
+    db.add(match)
+    db.flush()
+    _increment_results(db=db, winner_id=winner_id, loser_id=loser_id, change=1)
+    record_standing_result(db=db, winner_id=winner_id, loser_id=loser_id)
+
+
+def _reverse_result(db: Session, match: models.Match):
+    remove_standing_result(db=db, winner_id=match.winner_id, loser_id=match.loser_id)
+    _increment_results(db=db, winner_id=match.winner_id, loser_id=match.loser_id, change=-1)
+    match.winner_id = None
+    match.loser_id = None
+    db.add(match)
+    db.flush()
+
+
+def get_match_for_update(db: Session, tournament_id: int, match_id: int):
+    lock_tournament_results(db=db, tournament_id=tournament_id)
+    return (
+        db.query(models.Match)
+        .filter(models.Match.tournament_id == tournament_id, models.Match.id == match_id)
+        .populate_existing()
+        .first()
+    )
+
+
+def update_match(
+    db: Session,
+    tournament_id: int,
+    match_id: int,
+    winner_id: int,
+    match: models.Match = None
+):
+    # wins and losses are incremented in the database under the tournament lock,
+    # reporting a different winner corrects the earlier result. A match already
+    # loaded with get_match_for_update can be passed in to skip fetching it again.
+    # The result commits before the standings are re-ranked, see rank_stale_standings.
+    if match is None:
+        match = get_match_for_update(db=db, tournament_id=tournament_id, match_id=match_id)
+    if not match:
+        return
+    if winner_id and winner_id != match.winner_id:
+        bump_tournament_version(
+            db=db, tournament_id=tournament_id, completed=int(match.winner_id is None), ranks_stale=True
         )
-        update_competitor(
-            db=db,
-            competitor_id=loser.id,
-            competitor_name=loser.name,
-            wins=loser.wins,
-            losses=losses)
-        match.winner_id = winner.id
-        match.loser_id = loser.id
-        db.add(match)
+        read_cache.invalidate_on_commit(db=db, tournament_id=tournament_id, rounds=[match.round], competitors=True)
+        if match.winner_id is not None:
+            _reverse_result(db=db, match=match)
+        _record_result(db=db, match=match, winner_id=winner_id)
         db.commit()
+        rank_stale_standings(db=db, tournament_id=tournament_id)
         db.refresh(match)
+    else:
+        # nothing to write, this just releases the tournament lock
+        db.commit()
     return match
 
 
-def get_current_round(db: Session, tournament_id: int):
-    max_round_match = (
-        db.query(models.Match)
-        .filter(
-            models.Match.tournament_id == tournament_id,
+def reverse_match_result(db: Session, tournament_id: int, match_id: int):
+    match = get_match_for_update(db=db, tournament_id=tournament_id, match_id=match_id)
+    if not match or match.winner_id is None:
+        db.commit()
+        return match
+    _reverse_result(db=db, match=match)
+    bump_tournament_version(db=db, tournament_id=tournament_id, completed=-1, ranks_stale=True)
+    read_cache.invalidate_on_commit(db=db, tournament_id=tournament_id, rounds=[match.round], competitors=True)
+    db.commit()
+    rank_stale_standings(db=db, tournament_id=tournament_id)
+    db.refresh(match)
+    return match
+
+
+def update_match_results(db: Session, tournament_id: int, results: list):
+    # results are (match_id, winner_id) tuples. Every match is checked in one query,
+    # then all valid results are written in one transaction. Returns a
+    # (status code, detail) pair per result, in the order given.
+    lock_tournament_results(db=db, tournament_id=tournament_id)
+    matches = {
+        match.id: match
+        for match in (
+            db.query(
+                models.Match.id,
+                models.Match.competitor_one,
+                models.Match.competitor_two,
+                models.Match.winner_id,
+                models.Match.round
+            )
+            .filter(
+                models.Match.tournament_id == tournament_id,
+                models.Match.id.in_({match_id for match_id, _ in results})
+            )
+            .all()
         )
-        .order_by(models.Match.round.desc())
-        .first()
+    }
+
+    statuses = []
+    updates = []
+    seen = set()
+    for match_id, winner_id in results:
+        match = matches.get(match_id)
+        if not match:
+            statuses.append((404, 'Not found.'))
+        elif match_id in seen:
+            statuses.append((409, 'Match reported more than once.'))
+        elif match.winner_id is not None:
+            statuses.append((409, 'Result already recorded.'))
+        elif match.competitor_two is None:
+            statuses.append((400, 'Match is a bye.'))
+        elif winner_id not in (match.competitor_one, match.competitor_two):
+            statuses.append((400, 'Winner is not in this match.'))
+        else:
+            loser_id = match.competitor_two if winner_id == match.competitor_one else match.competitor_one
+            updates.append({'id': match_id, 'winner_id': winner_id, 'loser_id': loser_id})
+            statuses.append((200, None))
+            seen.add(match_id)
+
+    if updates:
+        db.bulk_update_mappings(models.Match, updates)
+
+        wins = Counter(update['winner_id'] for update in updates)
+        losses = Counter(update['loser_id'] for update in updates)
+        increments = [
+            {'b_competitor_id': competitor_id, 'won': wins[competitor_id], 'lost': losses[competitor_id]}
+            for competitor_id in wins.keys() | losses.keys()
+        ]
+        # incremented in the database, one executemany per table
+        competitors = models.Competitor.__table__
+        db.execute(
+            competitors.update()
+            .where(competitors.c.id == bindparam('b_competitor_id'))
+            .values(wins=competitors.c.wins + bindparam('won'), losses=competitors.c.losses + bindparam('lost')),
+            increments
+        )
+        standings = models.Standing.__table__
+        db.execute(
+            standings.update()
+            .where(standings.c.competitor_id == bindparam('b_competitor_id'))
+            .values(wins=standings.c.wins + bindparam('won'), losses=standings.c.losses + bindparam('lost')),
+            increments
+        )
+        bump_tournament_version(db=db, tournament_id=tournament_id, completed=len(updates), ranks_stale=False)
+        read_cache.invalidate_on_commit(
+            db=db,
+            tournament_id=tournament_id,
+            rounds={matches[update['id']].round for update in updates},
+            competitors=True
+        )
+        refresh_standing_tiebreaks(db=db, tournament_id=tournament_id)
+        rank_standings(db=db, tournament_id=tournament_id)
+        db.commit()
+    else:
+        db.rollback()
+    return statuses
+
+
+def get_next_round(db: Session, tournament_id: int):
+    tournament = get_tournament_by_id(db=db, tournament_id=tournament_id)
+    # the first round is 0, after that it's one past the highest round played
+    if tournament is None or tournament.current_round is None:
+        return 0
+    return tournament.current_round + 1
+
+
+def get_pairing_state_version(db: Session, tournament_id: int, method: str = 'greedy'):
+    # every write pairing depends on bumps the tournament version, so it and the
+    # method identify a preview. A column query, so it's read fresh under the lock.
+    version = (
+        db.query(models.Tournament.version)
+        .filter(models.Tournament.id == tournament_id)
+        .scalar()
+    )
+    return f'{version}-{method}'
+
+
+def pair_next_round(db: Session, tournament_id: int, round: int, method: str = 'greedy'):
+    # standings come from one query, the opponent history is kept in memory
+    standings = (
+        db.query(models.Competitor.id, models.Competitor.wins)
+        .filter(models.Competitor.tournament_id == tournament_id)
+        .order_by(models.Competitor.wins.desc(), models.Competitor.id)
+        .all()
+    )
+    tournament_history = get_opponent_history(db=db, tournament_id=tournament_id)
+    return pairing.pair_round(
+        method=method,
+        standings=standings,
+        opponents=tournament_history.opponents,
+        byes=tournament_history.byes,
+        first_round=round == 0
     )
-    return max_round_match.round if max_round_match else 0
 
 
-def get_round(db: Session, tournament_id: int, competitors: list, round: int):
-    # track each player that has been matched for this round so they are not matched again
-    matched_players_for_round = []
-    for competitor in competitors:
-        if competitor.id not in matched_players_for_round:
-            matched_players_for_round.append(competitor.id)
-            other_comps_ids = [
-                c.id for c in db.query(models.Competitor).filter(
-                    (models.Competitor.id != competitor.id),
-                    (models.Competitor.tournament_id == tournament_id)
+def get_round(db: Session, tournament_id: int, round: int, method: str = 'greedy'):
+    pairings = pair_next_round(db=db, tournament_id=tournament_id, round=round, method=method)
+    return create_round(db=db, tournament_id=tournament_id, round=round, pairings=pairings)
+
+
+# proposed rounds keyed by (tournament_id, state version), nothing is written until committed.
+# Pairing is deterministic, so a preview is the same on any worker for the same version and
+# this only saves pairing again, commit_round_preview rebuilds one it doesn't have.
+round_previews = LRUCache(maxsize=256)
+
+
+def preview_round(db: Session, tournament_id: int, method: str = 'greedy', version: str = None):
+    if version is None:
+        version = get_pairing_state_version(db=db, tournament_id=tournament_id, method=method)
+    preview = round_previews.get((tournament_id, version))
+    if preview is None:
+        round = get_next_round(db=db, tournament_id=tournament_id)
+        preview = {
+            'tournament_id': tournament_id,
+            'version': version,
+            'round': round,
+            'matches': [
+                {'competitor_one': competitor_one, 'competitor_two': competitor_two}
+                for competitor_one, competitor_two in pair_next_round(
+                    db=db, tournament_id=tournament_id, round=round, method=method
                 )
-                .order_by(models.Competitor.wins.desc())
-                .all()
-            ]
-            matched = None
-            if (round == 0): # This is the first round they haven't played anyone
-                round = 0
-                # match to a competitor that has not been matched in this round already
-                if len(other_comps_ids) > 0:
-                    for c in other_comps_ids:
-                        if c not in matched_players_for_round:
-                            matched = c
-            else:
-                played_ids = []
-                competitor_matches = get_matches_by_competitor(
-                    db=db,
-                    tournament_id=tournament_id,
-                    competitor_id=competitor.id
+            ],
+        }
+        round_previews.set((tournament_id, version), preview)
+    return preview
+
+
+def commit_round_preview(db: Session, tournament_id: int, version: str, method: str = 'greedy'):
+    # the version is checked under the tournament lock and the round written in the
+    # same transaction, so two commits of the same preview can't both write it
+    lock_tournament_results(db=db, tournament_id=tournament_id)
+    if get_pairing_state_version(db=db, tournament_id=tournament_id, method=method) != version:
+        return None
+    preview = preview_round(db=db, tournament_id=tournament_id, method=method, version=version)
+    round_previews.pop((tournament_id, version))
+    return create_round(
+        db=db,
+        tournament_id=tournament_id,
+        round=preview['round'],
+        pairings=[(m['competitor_one'], m['competitor_two']) for m in preview['matches']]
+    )
+
+
+# STANDINGS
+def create_standing(db: Session, competitor_id: int, tournament_id: int):
+    # nobody ranks below a new competitor, they only tie with everyone still on nothing
+    ahead = (
+        db.query(func.count(models.Standing.competitor_id))
+        .filter(
+            models.Standing.tournament_id == tournament_id,
+            or_(
+                models.Standing.wins > 0,
+                models.Standing.buchholz > 0,
+                models.Standing.sonneborn_berger > 0
+            )
+        )
+        .scalar()
+    )
+    db.add(models.Standing(
+        competitor_id=competitor_id,
+        tournament_id=tournament_id,
+        rank=ahead + 1,
+        wins=0,
+        losses=0,
+        buchholz=0,
+        sonneborn_berger=0
+    ))
+
+
+def _update_standings(db: Session, *where, **values):
+    return db.execute(
+        update(models.Standing)
+        .where(*where)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def shift_standing_score(db: Session, competitor_id: int, change: int):
+    # a competitor's wins feed their opponents' Buchholz and the Sonneborn-Berger
+    # of everyone who beat them, so those move by the same amount per game
+    _update_standings(
+        db,
+        models.Standing.competitor_id == competitor_id,
+        wins=models.Standing.wins + change
+    )
+    opponents = union_all(
+        select(models.Match.loser_id.label('competitor_id'))
+        .where(models.Match.winner_id == competitor_id, models.Match.loser_id.isnot(None)),
+        select(models.Match.winner_id.label('competitor_id'))
+        .where(models.Match.loser_id == competitor_id, models.Match.winner_id.isnot(None)),
+    ).subquery()
+    games = (
+        select(opponents.c.competitor_id, func.count().label('games'))
+        .group_by(opponents.c.competitor_id)
+        .subquery()
+    )
+    _update_standings(
+        db,
+        models.Standing.competitor_id == games.c.competitor_id,
+        buchholz=models.Standing.buchholz + change * games.c.games
+    )
+    beaten_by = (
+        select(models.Match.winner_id.label('competitor_id'), func.count().label('games'))
+        .where(models.Match.loser_id == competitor_id, models.Match.winner_id.isnot(None))
+        .group_by(models.Match.winner_id)
+        .subquery()
+    )
+    _update_standings(
+        db,
+        models.Standing.competitor_id == beaten_by.c.competitor_id,
+        sonneborn_berger=models.Standing.sonneborn_berger + change * beaten_by.c.games
+    )
+
+
+def _score(competitor_id: int):
+    return (
+        select(models.Standing.wins)
+        .where(models.Standing.competitor_id == competitor_id)
+        .scalar_subquery()
+    )
+
+
+def _pair_standing_result(db: Session, winner_id: int, loser_id: int, change: int):
+    _update_standings(
+        db,
+        models.Standing.competitor_id == winner_id,
+        buchholz=models.Standing.buchholz + change * _score(loser_id),
+        sonneborn_berger=models.Standing.sonneborn_berger + change * _score(loser_id)
+    )
+    _update_standings(
+        db,
+        models.Standing.competitor_id == loser_id,
+        buchholz=models.Standing.buchholz + change * _score(winner_id),
+        losses=models.Standing.losses + change
+    )
+
+
+def record_standing_result(db: Session, winner_id: int, loser_id: int):
+    # the match must already be flushed with its winner and loser set.
+    # The two become opponents at their scores before this result...
+    _pair_standing_result(db=db, winner_id=winner_id, loser_id=loser_id, change=1)
+    # ...then the winner's extra win reaches all of their opponents, the loser included
+    shift_standing_score(db=db, competitor_id=winner_id, change=1)
+
+
+def remove_standing_result(db: Session, winner_id: int, loser_id: int):
+    # the reverse of record_standing_result, called while the match still holds the result
+    shift_standing_score(db=db, competitor_id=winner_id, change=-1)
+    _pair_standing_result(db=db, winner_id=winner_id, loser_id=loser_id, change=-1)
+
+
+def refresh_standing_tiebreaks(db: Session, tournament_id: int):
+    # recompute Buchholz and Sonneborn-Berger for the whole tournament in one
+    # statement, used when many results land at once
+    completed = (
+        models.Match.tournament_id == tournament_id,
+        models.Match.winner_id.isnot(None),
+        models.Match.loser_id.isnot(None)
+    )
+    opponents = union_all(
+        select(models.Match.winner_id.label('competitor_id'), models.Match.loser_id.label('opponent_id'))
+        .where(*completed),
+        select(models.Match.loser_id.label('competitor_id'), models.Match.winner_id.label('opponent_id'))
+        .where(*completed),
+    ).subquery()
+    opponent = aliased(models.Standing)
+    buchholz = (
+        select(opponents.c.competitor_id, func.sum(opponent.wins).label('buchholz'))
+        .join(opponent, opponent.competitor_id == opponents.c.opponent_id)
+        .group_by(opponents.c.competitor_id)
+        .subquery()
+    )
+    sonneborn_berger = (
+        select(models.Match.winner_id.label('competitor_id'), func.sum(opponent.wins).label('sonneborn_berger'))
+        .join(opponent, opponent.competitor_id == models.Match.loser_id)
+        .where(*completed)
+        .group_by(models.Match.winner_id)
+        .subquery()
+    )
+    totals = (
+        select(
+            models.Standing.competitor_id,
+            func.coalesce(buchholz.c.buchholz, 0).label('buchholz'),
+            func.coalesce(sonneborn_berger.c.sonneborn_berger, 0).label('sonneborn_berger')
+        )
+        .outerjoin(buchholz, buchholz.c.competitor_id == models.Standing.competitor_id)
+        .outerjoin(sonneborn_berger, sonneborn_berger.c.competitor_id == models.Standing.competitor_id)
+        .where(models.Standing.tournament_id == tournament_id)
+        .subquery()
+    )
+    _update_standings(
+        db,
+        models.Standing.competitor_id == totals.c.competitor_id,
+        or_(
+            models.Standing.buchholz.is_distinct_from(totals.c.buchholz),
+            models.Standing.sonneborn_berger.is_distinct_from(totals.c.sonneborn_berger)
+        ),
+        buchholz=totals.c.buchholz,
+        sonneborn_berger=totals.c.sonneborn_berger
+    )
+
+
+def rank_standings(db: Session, tournament_id: int):
+    ranks = (
+        select(
+            models.Standing.competitor_id,
+            func.rank().over(
+                order_by=(
+                    models.Standing.wins.desc(),
+                    models.Standing.buchholz.desc(),
+                    models.Standing.sonneborn_berger.desc()
                 )
-                for match in competitor_matches:
-                    if match.competitor_one == competitor.id and match.competitor_two:
-                        played_ids.append(match.competitor_two)
-                    elif match.competitor_two == competitor.id and match.competitor_one:
-                        played_ids.append(match.competitor_one)
-                    else:
-                        pass
-                available_matches = [c for c in other_comps_ids if c not in played_ids and c not in matched_players_for_round]
-                # take the first available (prev sorted in above query)
-                if len(available_matches) == 0: # they have been matched to everyone
-                    return get_matches(db=db, tournament_id=tournament_id, round=round)
-                matched = available_matches[0]
-            # Outside of if else condition for first round or subsequent rounds
-            # Matches created here
-            matched_players_for_round.append(matched)
-            create_match(
-                db=db,
-                tournament_id=tournament_id,
-                competitor_one=competitor.id,
-                competitor_two=matched,
-                round=round
+            ).label('rank')
+        )
+        .where(models.Standing.tournament_id == tournament_id)
+        .subquery()
+    )
+    # only rows whose rank actually moved are written, returns how many did
+    return _update_standings(
+        db,
+        models.Standing.competitor_id == ranks.c.competitor_id,
+        models.Standing.rank.is_distinct_from(ranks.c.rank),
+        rank=ranks.c.rank
+    )
+
+
+def rank_stale_standings(db: Session, tournament_id: int):
+    # single results commit with the ranks marked stale rather than re-ranking every
+    # standing under the lock. Afterwards each one takes the lock again and re-ranks
+    # only if nobody has since, so results reported together share one re-rank and
+    # the others just see the flag cleared.
+    lock_tournament_results(db=db, tournament_id=tournament_id)
+    stale = (
+        db.query(models.Tournament.ranks_stale)
+        .filter(models.Tournament.id == tournament_id)
+        .populate_existing()
+        .scalar()
+    )
+    if stale:
+        moved = rank_standings(db=db, tournament_id=tournament_id)
+        if moved:
+            bump_tournament_version(db=db, tournament_id=tournament_id, ranks_stale=False)
+            read_cache.invalidate_on_commit(db=db, tournament_id=tournament_id, competitors=True)
+        else:
+            db.execute(
+                update(models.Tournament)
+                .where(models.Tournament.id == tournament_id)
+                .values(ranks_stale=False)
+                .execution_options(synchronize_session=False)
             )
-    return get_matches(db=db, tournament_id=tournament_id, round=round)
+    db.commit()
+    return bool(stale)
+
+
+def get_tiebreaks(db: Session, tournament_id: int, limit: int = 100, after: tuple = None):
+    # array_agg hands back each column as one list, far cheaper than one row per match
+    competitor_ids, names, wins, losses = db.execute(
+        select(
+            func.array_agg(models.Competitor.id),
+            func.array_agg(models.Competitor.name),
+            func.array_agg(func.coalesce(models.Competitor.wins, 0)),
+            func.array_agg(models.Competitor.losses)
+        )
+        .where(models.Competitor.tournament_id == tournament_id)
+    ).one()
+    if not competitor_ids:
+        return []
+    winner_ids, loser_ids = db.execute(
+        select(func.array_agg(models.Match.winner_id), func.array_agg(models.Match.loser_id))
+        .where(
+            models.Match.tournament_id == tournament_id,
+            models.Match.winner_id.isnot(None),
+            models.Match.loser_id.isnot(None)
+        )
+    ).one()
+    scores = np.array(wins, dtype=np.int64)
+    computed = tiebreaks.compute_tiebreaks(
+        competitor_ids=np.array(competitor_ids, dtype=np.int64),
+        scores=scores,
+        winner_ids=np.array(winner_ids or [], dtype=np.int64),
+        loser_ids=np.array(loser_ids or [], dtype=np.int64)
+    )
+    # ranking needs the whole tournament, only the page is built into rows. Ranks
+    # run 1..n without ties so the rank alone is the key
+    start = after[0] if after else 0
+    order = tiebreaks.rank_order(computed, scores)[start:start + limit]
+    columns = {name: values[order].tolist() for name, values in computed.items()}
+    order = order.tolist()
+    columns.update(
+        rank=range(start + 1, start + len(order) + 1),
+        competitor_id=[competitor_ids[i] for i in order],
+        name=[names[i] for i in order],
+        wins=[wins[i] for i in order],
+        losses=[losses[i] for i in order]
+    )
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
@@ -1,18 +1,123 @@
+from typing import Optional
+
+from fastapi import Request
+from jose import JWTError, jwt
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
+from app.cache import LRUCache, RedisCache
 from app.config import settings
+from app.metrics import engines, instrumented_pool
+
+
+pool_options = {
+    'pool_size': settings.DB_POOL_SIZE,
+    'max_overflow': settings.DB_MAX_OVERFLOW,
+    'pool_timeout': settings.DB_POOL_TIMEOUT,
+    'pool_recycle': settings.DB_POOL_RECYCLE,
+    'pool_pre_ping': settings.DB_POOL_PRE_PING,
+}
+
 
+def asyncpg_uri(uri: str) -> str:
+    return uri.replace('postgresql://', 'postgresql+asyncpg://', 1)
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+
+engine = create_engine(
+    settings.SQLALCHEMY_DATABASE_URI, poolclass=instrumented_pool(QueuePool), **pool_options
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# same database through asyncpg, used by the async routes
+async_engine = create_async_engine(
+    asyncpg_uri(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=instrumented_pool(AsyncAdaptedQueuePool),
+    **pool_options
+)
+engines['sync'] = engine
+engines['async'] = async_engine
+
+# GET requests on the async routes read from the replica, see get_async_db
+if settings.SQLALCHEMY_REPLICA_URI:
+    async_replica_engine = create_async_engine(
+        asyncpg_uri(settings.SQLALCHEMY_REPLICA_URI),
+        poolclass=instrumented_pool(AsyncAdaptedQueuePool),
+        # a write routed here by mistake fails loudly instead of waiting on the replica
+        execution_options={'postgresql_readonly': True},
+        **pool_options
+    )
+    engines['async_replica'] = async_replica_engine
+else:
+    async_replica_engine = async_engine
+
+# objects are serialized after the session is done with them, they must not
+# expire on commit or reading them would need another round trip
+AsyncSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=async_engine, class_=AsyncSession
+)
+# marked so app.read_cache doesn't cache what a lagging replica returns
+AsyncReplicaSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=async_replica_engine,
+    class_=AsyncSession,
+    info={'replica': settings.SQLALCHEMY_REPLICA_URI is not None}
+)
 # used in models.py
 Base = declarative_base()
 
 
+READ_METHODS = ('GET', 'HEAD')
+
+def create_recent_writers():
+    # kept with the read cache, in Redis every worker sees a write made on another one
+    if settings.READ_CACHE_BACKEND == 'redis':
+        return RedisCache(settings.READ_CACHE_URL, ttl=settings.REPLICA_STICKY_SECONDS, prefix='swiss-writers:')
+    return LRUCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.REPLICA_STICKY_SECONDS)
+
+
+# usernames that wrote in the last REPLICA_STICKY_SECONDS, their reads go to the primary
+recent_writers = create_recent_writers()
+
+
+def request_username(request: Request) -> Optional[str]:
+    # read without verifying the token, it only picks a database and
+    # authentication still checks it properly
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get('sub')
+    except JWTError:
+        return None
+
+
+def mark_writer(username: Optional[str]):
+    if username:
+        recent_writers.set(username, True)
+
+
+def record_write(request: Request):
+    # route dependency for the rare GET that writes, other methods are recorded by get_async_db
+    mark_writer(request_username(request))
+
+
+def reads_from_replica(request: Request) -> bool:
+    if request.method not in READ_METHODS:
+        return False
+    username = request_username(request)
+    return username is None or recent_writers.get(username) is None
+
+
 # Dependency
-def get_db():
+def get_db(request: Request):
+    # sync routes always use the primary, their writes still count for stickiness
+    if request.method not in READ_METHODS:
+        mark_writer(request_username(request))
     db = SessionLocal()
     try:
         yield db
@@ -21,3 +126,16 @@ def get_db():
         print(e)
     finally:
         db.close()
+
+
+async def get_async_db(request: Request):
+    # reads go to the replica, writes to the primary. A write is recorded before it
+    # runs, so the user's next reads can't reach the replica ahead of it.
+    if reads_from_replica(request):
+        session_maker = AsyncReplicaSessionLocal
+    else:
+        if request.method not in READ_METHODS:
+            mark_writer(request_username(request))
+        session_maker = AsyncSessionLocal
+    async with session_maker() as db:
+        yield db
@@ -23,6 +23,15 @@ class TokenData(BaseModel):
     username: Optional[str] = None
 
 
+class Principal(BaseModel):
+    id: int
+    username: str
+    is_active: bool
+
+    class Config:
+        orm_mode = True
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
 
@@ -0,0 +1,45 @@
+"""
+ETags for the list endpoints.
+
+Every crud write to a tournament, its competitors, matches or results bumps
+tournaments.version, so the tournament's id and version identify the
+content of its lists. Routes build the ETag from those, which they already
+have from the primary key lookup that checks ownership, and answer a
+matching If-None-Match with a 304 before running the list query at all.
+
+    GET /matches?tournament_id=1              200, ETag: "..."
+    GET /matches?tournament_id=1
+        If-None-Match: "..."                  304, no body
+
+The query string is part of the tag, so every page and filter has its own.
+"""
+from hashlib import sha1
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(request: Request, *state) -> str:
+    digest = sha1(repr((request.url.path, request.url.query, state)).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # weak comparison, as If-None-Match calls for
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+def not_modified(request: Request, response: Response, *state) -> Optional[Response]:
+    """
+    Tag response with the ETag for state and return a 304 response if the
+    client already has it, None if the route has to build the body.
+    """
+    etag = make_etag(request, *state)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,84 @@
+"""
+Per-tournament opponent history.
+
+Pairing needs to know who has already played whom. Rather than rebuilding
+that from the matches table on every run, each tournament's history is
+loaded once and kept up to date as crud inserts matches. Matches are never
+deleted, so a history that knows as many matches as the tournament has is
+complete, crud reloads it when the counts differ. At most MAX_TOURNAMENTS
+histories are kept, the least recently used go first.
+"""
+from threading import Lock
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from app.cache import LRUCache
+from app.pairing import build_bye_set, build_opponent_graph
+
+
+MAX_TOURNAMENTS = 1024
+
+
+class OpponentHistory:
+    """
+    Who has played whom in one tournament.
+
+    opponents maps a competitor id to the set of ids they have played, so
+    the rematch check is a single set lookup. Swiss history is sparse, each
+    competitor only ever has one opponent per round, which keeps this far
+    smaller than a dense bitset over the whole field.
+    """
+
+    def __init__(self, matches: Iterable[Tuple[int, int, Optional[int]]] = ()):
+        matches = list(matches)
+        pairs = [(one, two) for _, one, two in matches]
+        self.opponents: Dict[int, Set[int]] = build_opponent_graph(pairs)
+        self.byes: Set[int] = build_bye_set(pairs)
+        # ids rather than a high water mark, ids from concurrent inserts don't commit in order
+        self.match_ids: Set[int] = {match_id for match_id, _, _ in matches}
+
+    @property
+    def match_count(self) -> int:
+        return len(self.match_ids)
+
+    def has_played(self, competitor_one: int, competitor_two: int) -> bool:
+        return competitor_two in self.opponents.get(competitor_one, ())
+
+    def add_match(self, match_id: int, competitor_one: int, competitor_two: Optional[int]):
+        # adding is idempotent so matches seen twice or out of order are fine
+        self.match_ids.add(match_id)
+        if competitor_two is None:
+            self.byes.add(competitor_one)
+            return
+        self.opponents.setdefault(competitor_one, set()).add(competitor_two)
+        self.opponents.setdefault(competitor_two, set()).add(competitor_one)
+
+
+_histories = LRUCache(maxsize=MAX_TOURNAMENTS)
+_lock = Lock()
+
+
+def get(tournament_id: int) -> Optional[OpponentHistory]:
+    return _histories.get(tournament_id)
+
+
+def load(tournament_id: int, matches: Iterable[Tuple[int, int, Optional[int]]]) -> OpponentHistory:
+    """Build a tournament's history from (id, competitor_one, competitor_two) rows."""
+    history = OpponentHistory(matches)
+    with _lock:
+        _histories.set(tournament_id, history)
+    return history
+
+
+def record_matches(tournament_id: int, matches: Iterable[Tuple[int, int, Optional[int]]]):
+    """Add newly inserted matches to a tournament's history if it is loaded."""
+    with _lock:
+        history = _histories.get(tournament_id)
+        if history is None:
+            return
+        for match_id, competitor_one, competitor_two in matches:
+            history.add_match(match_id, competitor_one, competitor_two)
+
+
+def clear():
+    with _lock:
+        _histories.clear()
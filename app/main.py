@@ -1,8 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.config import settings
 from app.api.api_v1.api import api_router
+from app.metrics import pool_metrics
+import app.coalescing as coalescing
+import app.read_cache as read_cache
 
 import os
 
@@ -23,3 +27,8 @@ app.add_middleware(
 @app.get('/')
 def read_root():
     return {'message': 'Hello World'}
+
+
+@app.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    return pool_metrics() + read_cache.metrics() + coalescing.metrics()
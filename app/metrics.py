@@ -0,0 +1,82 @@
+"""
+Connection pool statistics in the Prometheus text format.
+
+Engines are created with a pool class from instrumented_pool, which times
+every checkout. pool_metrics reports those timings along with the pool's
+own size, checked out and overflow counts for every registered engine.
+"""
+from threading import Lock
+from time import perf_counter
+from typing import Dict
+
+from sqlalchemy import exc
+
+
+class PoolStats:
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._lock = Lock()
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+def instrumented_pool(pool_class):
+    """
+    Subclass pool_class so that checkouts are timed into its stats.
+
+    The stats live on the class rather than the instance because SQLAlchemy
+    replaces the pool instance when an engine is disposed.
+    """
+    def connect(self):
+        start = perf_counter()
+        try:
+            connection = pool_class.connect(self)
+        except exc.TimeoutError:
+            self.stats.record(perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(perf_counter() - start)
+        return connection
+
+    return type(f'Instrumented{pool_class.__name__}', (pool_class,), {'stats': PoolStats(), 'connect': connect})
+
+
+# name -> engine, filled in by app.database
+engines: Dict[str, object] = {}
+
+
+def pool_metrics() -> str:
+    lines = []
+
+    def metric(name, kind, help, values):
+        lines.append(f'# HELP swiss_db_pool_{name} {help}')
+        lines.append(f'# TYPE swiss_db_pool_{name} {kind}')
+        for engine_name, value in values:
+            lines.append(f'swiss_db_pool_{name}{{engine="{engine_name}"}} {value}')
+
+    pools = [(name, getattr(engine, 'sync_engine', engine).pool) for name, engine in engines.items()]
+    metric('size', 'gauge', 'Connections kept open in the pool.', [(n, p.size()) for n, p in pools])
+    metric('checked_out', 'gauge', 'Connections currently checked out.', [(n, p.checkedout()) for n, p in pools])
+    metric('overflow', 'gauge', 'Connections open beyond the pool size.', [(n, max(p.overflow(), 0)) for n, p in pools])
+    metric('checked_in', 'gauge', 'Idle connections in the pool.', [(n, p.checkedin()) for n, p in pools])
+    metric('checkouts_total', 'counter', 'Successful checkouts.', [(n, p.stats.checkouts) for n, p in pools])
+    metric('timeouts_total', 'counter', 'Checkouts that timed out.', [(n, p.stats.timeouts) for n, p in pools])
+    metric(
+        'wait_seconds_total', 'counter', 'Time spent getting a connection.',
+        [(n, round(p.stats.wait_seconds, 6)) for n, p in pools]
+    )
+    metric(
+        'wait_seconds_max', 'gauge', 'Longest time spent getting a connection.',
+        [(n, round(p.stats.max_wait_seconds, 6)) for n, p in pools]
+    )
+    return '\n'.join(lines) + '\n'
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, desc
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -8,7 +8,7 @@ class User(Base):
 
     __tablename__ = 'users'
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
@@ -19,14 +19,29 @@ class User(Base):
 class Tournament(Base):
 
     __tablename__ = 'tournaments'
+    __table_args__ = (
+        Index('ix_tournaments_owner_id_name', 'owner_id', 'name'),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    description = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    description = Column(String)
     owner_id = Column(Integer, ForeignKey('users.id'))
     in_progress = Column(Integer)
     in_progress_round = Column(Integer)
+    # round state, kept up to date by crud as matches and results are written.
+    # current_round is the highest round with a match, None before the first one.
+    current_round = Column(Integer)
+    matches_pending = Column(Integer, nullable=False, default=0)
+    matches_completed = Column(Integer, nullable=False, default=0)
+    # bumped by every crud write to the tournament, its competitors, matches or
+    # results, so it identifies a version of everything the read endpoints return
+    version = Column(Integer, nullable=False, default=0)
+    # set by results committed without re-ranking the standings, cleared by the
+    # next re-rank, see crud.rank_stale_standings
+    ranks_stale = Column(Boolean, nullable=False, default=False)
     complete = Column(Boolean)
+    pairing_method = Column(String, default='greedy')
 
     owner = relationship('User', back_populates='tournaments')
     matches = relationship('Match')
@@ -35,22 +50,51 @@ class Tournament(Base):
 class Competitor(Base):
 
     __tablename__ = 'competitors'
-
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    __table_args__ = (
+        # covers get_tournament_competitors, name and losses ride along for index-only scans
+        Index(
+            'ix_competitors_tournament_id_wins',
+            'tournament_id', desc('wins'), 'id',
+            postgresql_include=['name', 'losses']
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
     tournament_id = Column(Integer, ForeignKey('tournaments.id'))
-    wins = Column(Integer)
-    losses = Column(Integer)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
 
 
 class Match(Base):
 
     __tablename__ = 'matches'
+    __table_args__ = (
+        # match pages are read in (round, id) order
+        Index('ix_matches_tournament_id_round_id', 'tournament_id', 'round', 'id'),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     tournament_id = Column(Integer, ForeignKey('tournaments.id'))
-    competitor_one = Column(Integer, ForeignKey('competitors.id'))
-    competitor_two = Column(Integer, ForeignKey('competitors.id'))
+    competitor_one = Column(Integer, ForeignKey('competitors.id'), index=True)
+    competitor_two = Column(Integer, ForeignKey('competitors.id'), index=True)
     round = Column(Integer)
-    winner_id = Column(Integer, ForeignKey('competitors.id'))
-    loser_id = Column(Integer, ForeignKey('competitors.id'))
+    # standings maintenance looks up a competitor's wins and losses
+    winner_id = Column(Integer, ForeignKey('competitors.id'), index=True)
+    loser_id = Column(Integer, ForeignKey('competitors.id'), index=True)
+
+
+class Standing(Base):
+
+    __tablename__ = 'standings'
+    __table_args__ = (
+        Index('ix_standings_tournament_id_rank', 'tournament_id', 'rank', 'competitor_id'),
+    )
+
+    competitor_id = Column(Integer, ForeignKey('competitors.id'), primary_key=True)
+    tournament_id = Column(Integer, ForeignKey('tournaments.id'), nullable=False)
+    rank = Column(Integer, nullable=False, default=1)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    buchholz = Column(Integer, nullable=False, default=0)
+    sonneborn_berger = Column(Integer, nullable=False, default=0)
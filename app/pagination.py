@@ -0,0 +1,76 @@
+"""
+Keyset pagination for the list endpoints.
+
+A page is read with a WHERE on the sort key of the last row the client saw,
+rather than an OFFSET, so a deep page costs the same as the first one. That
+key goes back to the client as an opaque cursor in the X-Next-Cursor header,
+which is only set when there is another page. List bodies stay plain arrays.
+
+    GET /competitors?tournament_id=1&limit=50
+    GET /competitors?tournament_id=1&limit=50&after=<X-Next-Cursor>
+
+Routes read limit + 1 rows and hand them to paginate, the extra row only
+says whether there is a next page.
+"""
+import base64
+import binascii
+import json
+from typing import Callable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, Response
+
+from app.config import settings
+
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class Page:
+
+    def __init__(self, limit: int, after: Optional[Tuple[int, ...]]):
+        self.limit = limit
+        self.after = after
+
+
+class Pagination:
+    """
+    Route dependency for the limit and after query parameters.
+
+    key_size is the number of values in the sort key of the endpoint, a
+    cursor that doesn't have that many is rejected with a 400.
+    """
+
+    def __init__(self, key_size: int = 1):
+        self.key_size = key_size
+
+    def __call__(
+        self,
+        limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+        after: Optional[str] = None
+    ) -> Page:
+        return Page(limit=limit, after=decode_cursor(after, self.key_size) if after else None)
+
+
+def encode_cursor(key: Sequence[int]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, key_size: int) -> Tuple[int, ...]:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        key = None
+    if (
+        not isinstance(key, list)
+        or len(key) != key_size
+        or not all(isinstance(value, int) and not isinstance(value, bool) for value in key)
+    ):
+        raise HTTPException(status_code=400, detail='Invalid cursor.')
+    return tuple(key)
+
+
+def paginate(rows: list, page: Page, response: Response, key: Callable) -> list:
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+    return rows
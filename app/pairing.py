@@ -0,0 +1,303 @@
+"""
+In-memory Swiss pairing.
+
+Everything in here works on plain ids and win counts so a round can be
+computed without touching the database. crud loads the tournament state,
+hands it to these functions and writes the result back.
+"""
+from itertools import groupby
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.matching import max_weight_matching
+
+
+# (competitor_one, competitor_two) where competitor_two is None for a bye
+Pairing = Tuple[int, Optional[int]]
+
+# competitors per maximum weight matching block, keeps each solve well under
+# a second while still giving the matching plenty of room to avoid rematches
+WEIGHTED_BLOCK_SIZE = 100
+
+
+def build_opponent_graph(matches: Iterable[Tuple[int, Optional[int]]]) -> Dict[int, Set[int]]:
+    """Map each competitor id to the set of competitor ids they have played."""
+    opponents: Dict[int, Set[int]] = {}
+    for competitor_one, competitor_two in matches:
+        if competitor_one is None or competitor_two is None:
+            continue
+        opponents.setdefault(competitor_one, set()).add(competitor_two)
+        opponents.setdefault(competitor_two, set()).add(competitor_one)
+    return opponents
+
+
+def pair_greedy(
+    standings: List[Tuple[int, int]],
+    opponents: Dict[int, Set[int]],
+    first_round: bool = False
+) -> List[Pairing]:
+    """
+    Pair each competitor, highest wins first, with the first available
+    opponent below them they have not played yet.
+
+    standings is a list of (competitor_id, wins) already sorted by wins desc.
+    In the first round each competitor instead takes the last one still
+    available and an odd one out gets a bye. In later rounds there are no
+    byes, if a competitor has already played everyone still available the
+    round stops there. Both are the same as the original query based
+    implementation.
+    """
+    ordered = [competitor_id for competitor_id, _ in standings]
+    matched = set()
+    pairings = []
+    for competitor_id in ordered:
+        if competitor_id in matched:
+            continue
+        matched.add(competitor_id)
+        if first_round:
+            opponent = next((c for c in reversed(ordered) if c not in matched), None)
+            matched.add(opponent)
+            pairings.append((competitor_id, opponent))
+            continue
+        played = opponents.get(competitor_id, set())
+        opponent = next((c for c in ordered if c not in matched and c not in played), None)
+        if opponent is None:  # they have been matched to everyone
+            break
+        matched.add(opponent)
+        pairings.append((competitor_id, opponent))
+    return pairings
+
+
+def build_bye_set(matches: Iterable[Tuple[int, Optional[int]]]) -> Set[int]:
+    """Competitor ids that have already been given a bye."""
+    return {
+        competitor_one for competitor_one, competitor_two in matches
+        if competitor_one is not None and competitor_two is None
+    }
+
+
+def pair_weighted(
+    standings: List[Tuple[int, int]],
+    opponents: Dict[int, Set[int]],
+    byes: Set[int],
+    block_size: int = WEIGHTED_BLOCK_SIZE
+) -> List[Pairing]:
+    """
+    Pair the round as a maximum weight matching.
+
+    Rematches are never allowed, pairs with equal wins weigh the most and
+    with an odd field exactly one competitor gets a bye, preferring the
+    lowest ranked competitor that has not had one yet.
+
+    The blossom algorithm is cubic, so the field is solved in blocks of
+    block_size competitors in standings order. Anyone a block can't pair
+    floats down into the next block. If the last block can't be completed
+    it is merged with the blocks above it and solved again, so the round
+    only comes up short when no complete round exists at all.
+    """
+    if not standings:
+        return []
+    wins = dict(standings)
+    # weights must stay positive for every allowed pair, including the bye
+    spread = max(wins.values()) - min(wins.values()) + 2
+    base_weight = spread * spread + 1
+    needs_bye = len(standings) % 2 == 1
+
+    solved = []  # (players, pairings) for each block, in standings order
+    floaters = []
+    for start in range(0, len(standings), block_size):
+        players = floaters + [c for c, _ in standings[start:start + block_size]]
+        is_last = start + block_size >= len(standings)
+        pairings, floaters = _solve_block(
+            players, wins, opponents, byes, base_weight, needs_bye and is_last
+        )
+        solved.append((players, pairings))
+
+    # widen the last block upwards until everyone is paired
+    while floaters and len(solved) > 1:
+        players, _ = solved.pop()
+        above, _ = solved.pop()
+        players = above + [c for c in players if c not in above]
+        pairings, floaters = _solve_block(
+            players, wins, opponents, byes, base_weight, needs_bye
+        )
+        solved.append((players, pairings))
+
+    rank = {competitor_id: index for index, (competitor_id, _) in enumerate(standings)}
+    return sorted(
+        (pair for _, pairings in solved for pair in pairings),
+        key=lambda pair: rank[pair[0]]
+    )
+
+
+def _solve_block(players, wins, opponents, byes, base_weight, with_bye):
+    """Pair one block, returning its pairings and the players left over."""
+    edges = []
+    for i, competitor_id in enumerate(players):
+        played = opponents.get(competitor_id, set())
+        for j in range(i + 1, len(players)):
+            if players[j] in played:
+                continue
+            difference = wins[competitor_id] - wins[players[j]]
+            edges.append((i, j, base_weight - difference * difference))
+
+    bye = len(players)
+    mate = _match_with_bye(edges, players, wins, byes, base_weight, with_bye, repeat_bye=False)
+    if with_bye and -1 in mate[:len(players)]:
+        # only a second bye for somebody completes the round, better than leaving a player out
+        mate = _match_with_bye(edges, players, wins, byes, base_weight, with_bye, repeat_bye=True)
+
+    pairings = []
+    leftover = []
+    for i, competitor_id in enumerate(players):
+        if mate[i] == bye:
+            pairings.append((competitor_id, None))
+        elif mate[i] == -1:
+            leftover.append(competitor_id)
+        elif mate[i] > i:
+            pairings.append((competitor_id, players[mate[i]]))
+    return pairings, leftover
+
+
+def _match_with_bye(edges, players, wins, byes, base_weight, with_bye, repeat_bye):
+    bye = len(players)
+    edges = list(edges)
+    if with_bye:
+        # the bye plays like a competitor one win below the lowest in the field
+        bye_wins = min(wins.values()) - 1
+        eligible = [
+            i for i, c in enumerate(players) if repeat_bye or c not in byes
+        ] or range(len(players))
+        for i in eligible:
+            difference = wins[players[i]] - bye_wins
+            edges.append((i, bye, base_weight - difference * difference))
+
+    mate = max_weight_matching(edges, max_cardinality=True)
+    return mate + (len(players) + 1 - len(mate)) * [-1]
+
+
+def build_score_brackets(standings: List[Tuple[int, int]]) -> List[List[int]]:
+    """Group competitor ids by win count, highest score bracket first."""
+    return [
+        [competitor_id for competitor_id, _ in bracket]
+        for _, bracket in groupby(standings, key=lambda standing: standing[1])
+    ]
+
+
+def pair_dutch(
+    standings: List[Tuple[int, int]],
+    opponents: Dict[int, Set[int]],
+    byes: Set[int]
+) -> List[Pairing]:
+    """
+    Pair the round bracket by bracket, Dutch system style.
+
+    standings is grouped into score brackets once. Inside a bracket the top
+    half plays the bottom half in order, skipping rematches. An odd
+    competitor out, or anyone a rematch left unpaired, floats down into the
+    next bracket. The bye goes to the lowest ranked competitor in the last
+    bracket that has not had one yet. The work per round is quadratic in
+    the bracket size instead of the whole field. Only when the bottom of
+    the field can't be completed is the round handed to pair_weighted.
+    """
+    if not standings:
+        return []
+    brackets = build_score_brackets(standings)
+    needs_bye = len(standings) % 2 == 1
+
+    pairings = []
+    floaters = []
+    for index, bracket in enumerate(brackets):
+        players = floaters + bracket
+        floaters = []
+        if index == len(brackets) - 1:
+            break
+        if len(players) % 2 == 1:
+            floaters.append(players.pop())
+        bracket_pairings, leftover = _pair_bracket(players, opponents)
+        pairings += bracket_pairings
+        floaters = leftover + floaters
+
+    # the last bracket takes everybody that floated all the way down
+    bye = None
+    if needs_bye:
+        bye = next((c for c in reversed(players) if c not in byes), players[-1])
+        players = [c for c in players if c != bye]
+    bracket_pairings, leftover = _pair_bracket(players, opponents)
+    if leftover:
+        # rematches left the bottom of the field stuck, match it properly
+        wins = dict(standings)
+        spread = max(wins.values()) - min(wins.values()) + 2
+        if bye is not None:
+            players.append(bye)
+        bracket_pairings, leftover = _solve_block(
+            players, wins, opponents, byes, spread * spread + 1, needs_bye
+        )
+        if leftover:
+            # the brackets above have to give way, pair the whole field instead
+            return pair_weighted(standings=standings, opponents=opponents, byes=byes)
+    elif bye is not None:
+        bracket_pairings.append((bye, None))
+    return pairings + bracket_pairings
+
+
+def _pair_bracket(players, opponents):
+    """Pair the top half of a bracket against the bottom half, avoiding rematches."""
+    half = len(players) // 2
+    top, bottom = players[:half], players[half:]
+    paired = set()
+    pairings = []
+    for competitor_id in top:
+        played = opponents.get(competitor_id, set())
+        opponent = next((c for c in bottom if c not in paired and c not in played), None)
+        if opponent is not None:
+            paired.update((competitor_id, opponent))
+            pairings.append((competitor_id, opponent))
+
+    # give whoever is left a second chance against each other before floating
+    leftover = [c for c in players if c not in paired]
+    for competitor_id in list(leftover):
+        if competitor_id in paired:
+            continue
+        played = opponents.get(competitor_id, set())
+        opponent = next(
+            (c for c in leftover if c != competitor_id and c not in paired and c not in played),
+            None
+        )
+        if opponent is not None:
+            paired.update((competitor_id, opponent))
+            pairings.append((competitor_id, opponent))
+    return pairings, [c for c in players if c not in paired]
+
+
+def pair_round(
+    method: str,
+    standings: List[Tuple[int, int]],
+    opponents: Dict[int, Set[int]],
+    byes: Set[int],
+    first_round: bool = False
+) -> List[Pairing]:
+    """Pair a round with the tournament's pairing method."""
+    if method == 'weighted':
+        return pair_weighted(standings=standings, opponents=opponents, byes=byes)
+    if method == 'dutch':
+        return pair_dutch(standings=standings, opponents=opponents, byes=byes)
+    return pair_greedy(standings=standings, opponents=opponents, first_round=first_round)
+
+
+def pair_round_timed(
+    method: str,
+    standings: List[Tuple[int, int]],
+    opponents: Dict[int, Set[int]],
+    byes: Set[int],
+    first_round: bool = False
+) -> Tuple[List[Pairing], float]:
+    """
+    pair_round and the seconds it took. app.batch runs this in worker
+    processes, which only import this module and app.matching.
+    """
+    start = perf_counter()
+    pairings = pair_round(
+        method=method, standings=standings, opponents=opponents, byes=byes, first_round=first_round
+    )
+    return pairings, perf_counter() - start
@@ -0,0 +1,168 @@
+"""
+Read-through cache for the tournament reads behind the GET routes.
+
+A cached read belongs to a scope: a tournament's row, its competitors, its
+standings, or its matches in one round or in all of them. Entries are keyed
+by their scope's current token as well as their arguments (the page), and
+invalidating a scope just drops its token. Every page of it is then out of
+reach at once without having to know which pages were cached, and a read
+that raced the write stores its result under the dropped token, where
+nothing will find it.
+
+crud writes name the scopes they change with invalidate_on_commit, which are
+dropped once the session commits, so a result in round 3 leaves the other
+rounds' matches cached:
+
+    write                      scopes dropped
+    tournament update          tournament
+    competitor create, update  tournament, competitors, standings
+    new matches in round r     tournament, matches in round r, all matches
+    result in round r          all of the above
+
+Only sessions on the primary fill the cache. A replica can lag behind a
+write that has already dropped its scopes, and caching what it returned
+would serve those rows, and the old tournament version the ETags are made
+from, until the next write, even to the user who wrote. Replica sessions
+still answer from entries the primary filled.
+
+The backend is an LRUCache in the process or a RedisCache shared by every
+process, picked with READ_CACHE_BACKEND, and there is none by default. A
+commit only drops scopes in the backend it can reach, so with the in-process
+backend and more than one worker, the other workers keep serving what they
+cached before the write for up to READ_CACHE_TTL seconds, to its writer as
+well. The in-process backend is for a single worker, more than one needs the
+redis backend or none. Hits, misses and invalidations are counted per kind
+of scope and reported by metrics.
+"""
+from threading import Lock
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.cache import LRUCache, RedisCache
+from app.config import settings
+
+
+KINDS = ('tournament', 'competitors', 'standings', 'matches')
+
+_MISSING = object()
+
+
+class CacheStats:
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = Lock()
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def invalidated(self):
+        with self._lock:
+            self.invalidations += 1
+
+
+def create_backend():
+    if settings.READ_CACHE_BACKEND == 'redis':
+        return RedisCache(settings.READ_CACHE_URL, ttl=settings.READ_CACHE_TTL)
+    if settings.READ_CACHE_BACKEND == 'memory':
+        return LRUCache(maxsize=settings.READ_CACHE_SIZE, ttl=settings.READ_CACHE_TTL)
+    return None
+
+
+backend = create_backend()
+stats: Dict[str, CacheStats] = {kind: CacheStats() for kind in KINDS}
+
+
+def _token(scope: Tuple) -> str:
+    token = backend.get(('scope',) + scope)
+    if token is None:
+        token = uuid4().hex
+        backend.set(('scope',) + scope, token)
+    return token
+
+
+def from_replica(db) -> bool:
+    # replica sessions are marked in app.database
+    return db.sync_session.info.get('replica', False)
+
+
+async def get_or_load(db, scope: Tuple, args: Tuple[Hashable, ...], load: Callable[[], Awaitable]):
+    """
+    Return the cached result of a read in scope, or await load() and cache
+    its result if db is on the primary. None results aren't cached.
+    """
+    if backend is None:
+        return await load()
+    key = (scope, _token(scope), args)
+    value = backend.get(key, _MISSING)
+    stats[scope[0]].record(hit=value is not _MISSING)
+    if value is _MISSING:
+        value = await load()
+        if value is not None and not from_replica(db):
+            backend.set(key, value)
+    return value
+
+
+def invalidate(scopes: Iterable[Tuple]):
+    if backend is None:
+        return
+    for scope in scopes:
+        backend.pop(('scope',) + scope)
+        stats[scope[0]].invalidated()
+
+
+def invalidate_on_commit(
+    db: Session,
+    tournament_id: int,
+    rounds: Iterable[Optional[int]] = (),
+    competitors: bool = False
+):
+    """
+    Drop the cached reads of tournament_id once db commits. Competitors also
+    drops its competitors and standings, rounds its matches in those rounds.
+    """
+    scopes = db.info.setdefault('read_cache_scopes', set())
+    scopes.add(('tournament', tournament_id))
+    if competitors:
+        scopes.update({('competitors', tournament_id), ('standings', tournament_id)})
+    for round in rounds:
+        # reads of round 0 are reads of every round, like in get_matches
+        scopes.update({('matches', tournament_id, round or None), ('matches', tournament_id, None)})
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(db: Session):
+    invalidate(db.info.pop('read_cache_scopes', ()))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_rolled_back(db: Session, previous_transaction):
+    db.info.pop('read_cache_scopes', None)
+
+
+def clear():
+    if backend is not None:
+        backend.clear()
+
+
+def metrics() -> str:
+    lines = []
+    for name, help in (
+        ('hits', 'Reads answered from the cache.'),
+        ('misses', 'Reads that went to the database.'),
+        ('invalidations', 'Scopes dropped by writes.'),
+    ):
+        lines.append(f'# HELP swiss_read_cache_{name}_total {help}')
+        lines.append(f'# TYPE swiss_read_cache_{name}_total counter')
+        for kind, kind_stats in stats.items():
+            lines.append(f'swiss_read_cache_{name}_total{{kind="{kind}"}} {getattr(kind_stats, name)}')
+    return '\n'.join(lines) + '\n'
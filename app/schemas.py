@@ -1,7 +1,20 @@
+from enum import Enum
 from typing import List, Optional
 from pydantic import BaseModel
 
 
+class PairingMethod(str, Enum):
+    greedy = 'greedy'
+    weighted = 'weighted'
+    dutch = 'dutch'
+
+
+class ExportFormat(str, Enum):
+    # newline delimited JSON objects, or one JSON array
+    ndjson = 'ndjson'
+    json = 'json'
+
+
 class TournamentBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -10,6 +23,7 @@ class TournamentBase(BaseModel):
 class TournamentCreate(TournamentBase):
     name: str
     description: Optional[str] = None
+    pairing_method: PairingMethod = PairingMethod.greedy
 
 
 class Tournament(TournamentBase):
@@ -19,7 +33,11 @@ class Tournament(TournamentBase):
     owner_id: int
     in_progress: Optional[int] = None
     in_progress_round: Optional[int] = None
+    current_round: Optional[int] = None
+    matches_pending: int = 0
+    matches_completed: int = 0
     complete: Optional[bool] = False
+    pairing_method: Optional[PairingMethod] = PairingMethod.greedy
 
     class Config:
         orm_mode = True
@@ -32,6 +50,8 @@ class TournamentUpdate(TournamentBase):
     in_progress: Optional[int] = None
     in_progress_round: Optional[int] = None
     complete: Optional[bool] = False
+    # left out, the tournament keeps the method it has
+    pairing_method: Optional[PairingMethod] = None
 
 
 class MatchBase(BaseModel):
@@ -71,6 +91,63 @@ class Match(MatchBase):
         orm_mode = True
 
 
+class MatchResult(BaseModel):
+    match_id: int
+    winner_id: int
+
+
+class MatchResultsUpdate(BaseModel):
+    tournament_id: int
+    results: List[MatchResult]
+
+
+class MatchResultStatus(BaseModel):
+    match_id: int
+    winner_id: int
+    status: int
+    detail: Optional[str]
+
+
+class RoundMatch(BaseModel):
+    competitor_one: int
+    competitor_two: Optional[int]
+
+
+class RoundCreate(BaseModel):
+    tournament_id: int
+    round: int
+    matches: List[RoundMatch]
+
+
+class RoundPreview(BaseModel):
+    tournament_id: int
+    round: int
+    version: str
+    matches: List[RoundMatch]
+
+
+class RoundPreviewCommit(BaseModel):
+    tournament_id: int
+    version: str
+
+
+class BatchRoundCreate(BaseModel):
+    tournament_ids: List[int]
+
+
+class BatchRoundResult(BaseModel):
+    tournament_id: int
+    round: Optional[int]
+    matches: int
+    seconds: float
+    error: Optional[str]
+
+
+class BatchRound(BaseModel):
+    seconds: float
+    results: List[BatchRoundResult]
+
+
 class CompetitorBase(BaseModel):
     name: str
     tournament_id: int
@@ -92,13 +169,38 @@ class Competitor(CompetitorBase):
     id: int
     name: str
     tournament_id: int
-    wins: Optional[int]
-    losses: Optional[int]
+    wins: int
+    losses: int
 
     class Config:
         orm_mode = True
 
 
+class Standing(BaseModel):
+    rank: int
+    competitor_id: int
+    name: str
+    wins: int
+    losses: int
+    buchholz: int
+    sonneborn_berger: int
+
+    class Config:
+        orm_mode = True
+
+
+class Tiebreak(BaseModel):
+    rank: int
+    competitor_id: int
+    name: str
+    wins: Optional[int]
+    losses: Optional[int]
+    buchholz: float
+    median_buchholz: float
+    sonneborn_berger: float
+    opponent_win_percentage: float
+
+
 class UserBase(BaseModel):
     username: str
 
@@ -0,0 +1,86 @@
+"""
+Swiss tiebreaks computed over whole arrays of match results.
+
+A tournament's completed matches are loaded as two arrays of winner and
+loser ids, every tiebreak is then a handful of vectorized passes over them
+instead of a query or loop per competitor.
+"""
+from typing import Dict
+
+import numpy as np
+
+
+def compute_tiebreaks(
+    competitor_ids: np.ndarray,
+    scores: np.ndarray,
+    winner_ids: np.ndarray,
+    loser_ids: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Compute Buchholz, median Buchholz, Sonneborn-Berger and opponents' win
+    percentage for every competitor.
+
+    competitor_ids and scores are parallel arrays, scores being each
+    competitor's wins. winner_ids and loser_ids hold one completed match per
+    position. Every returned array lines up with competitor_ids. Opponents'
+    win percentage uses the match records, each opponent's wins over games.
+    """
+    competitor_ids = np.asarray(competitor_ids, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    count = len(competitor_ids)
+
+    # map ids to positions 0..n-1
+    order = np.argsort(competitor_ids)
+    sorted_ids = competitor_ids[order]
+    winners = order[np.searchsorted(sorted_ids, winner_ids)]
+    losers = order[np.searchsorted(sorted_ids, loser_ids)]
+
+    wins = np.bincount(winners, minlength=count)
+    losses = np.bincount(losers, minlength=count)
+    games = wins + losses
+
+    # opponents' scores summed from both sides of every match
+    beaten_scores = np.bincount(winners, weights=scores[losers], minlength=count)
+    buchholz = beaten_scores + np.bincount(losers, weights=scores[winners], minlength=count)
+
+    # median Buchholz drops the best and worst opponent once there are three or more
+    highest = np.full(count, -np.inf)
+    lowest = np.full(count, np.inf)
+    np.maximum.at(highest, winners, scores[losers])
+    np.maximum.at(highest, losers, scores[winners])
+    np.minimum.at(lowest, winners, scores[losers])
+    np.minimum.at(lowest, losers, scores[winners])
+
+    # there are no draws, so Sonneborn-Berger is the scores of opponents beaten
+    sonneborn_berger = beaten_scores
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        median_buchholz = np.where(games >= 3, buchholz - highest - lowest, buchholz)
+        win_percentage = np.where(games > 0, wins / games, 0.0)
+        opponent_win_percentage = np.where(
+            games > 0,
+            (
+                np.bincount(winners, weights=win_percentage[losers], minlength=count) +
+                np.bincount(losers, weights=win_percentage[winners], minlength=count)
+            ) / games,
+            0.0
+        )
+
+    return {
+        'buchholz': buchholz,
+        'median_buchholz': median_buchholz,
+        'sonneborn_berger': sonneborn_berger,
+        'opponent_win_percentage': opponent_win_percentage,
+    }
+
+
+def rank_order(tiebreaks: Dict[str, np.ndarray], scores: np.ndarray) -> np.ndarray:
+    """Positions sorted by score, then each tiebreak, all descending."""
+    # np.lexsort sorts by the last key first
+    return np.lexsort((
+        -tiebreaks['opponent_win_percentage'],
+        -tiebreaks['sonneborn_berger'],
+        -tiebreaks['median_buchholz'],
+        -tiebreaks['buchholz'],
+        -np.asarray(scores, dtype=np.float64),
+    ))
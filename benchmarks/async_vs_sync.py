@@ -0,0 +1,98 @@
+"""
+Compare the sync and async database paths under many concurrent requests.
+
+Seeds a throwaway tournament in the configured database, then reads its
+standings N times concurrently with the same query: on SessionLocal from a
+thread pool the size of the one FastAPI runs sync routes on, and through
+async_crud and AsyncSessionLocal as plain coroutines on one event loop.
+
+    python benchmarks/async_vs_sync.py --competitors 500 --requests 2000 --concurrency 1000
+
+Requests in flight at once are capped by the thread pool on the sync path
+and only by the connection pool on the async path. The read cache is turned
+off, so every request runs the query.
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+from time import perf_counter
+from uuid import uuid4
+
+from app.database import AsyncSessionLocal, SessionLocal, async_engine
+import app.async_crud as async_crud
+import app.crud as crud
+import app.models as models
+import app.read_cache as read_cache
+
+
+def seed(competitors: int) -> int:
+    db = SessionLocal()
+    try:
+        owner = models.User(username=f'bench-{uuid4().hex}', hashed_password='')
+        db.add(owner)
+        db.commit()
+        tournament = crud.create_own_tournament(
+            db=db, owner_id=owner.id, name='benchmark', description=None
+        )
+        for i in range(competitors):
+            crud.create_competitor(db=db, name=f'competitor {i}', tournament_id=tournament.id)
+        return tournament.id
+    finally:
+        db.close()
+
+
+def sync_request(tournament_id: int):
+    db = SessionLocal()
+    try:
+        return db.execute(async_crud.standings_query(tournament_id=tournament_id, limit=100)).all()
+    finally:
+        db.close()
+
+
+def run_sync(tournament_id: int, total: int) -> float:
+    # what starlette's run_in_threadpool gets, the loop's default executor
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as executor:
+        start = perf_counter()
+        list(executor.map(sync_request, [tournament_id] * total))
+        return perf_counter() - start
+
+
+async def async_request(tournament_id: int, limit: asyncio.Semaphore):
+    async with limit:
+        async with AsyncSessionLocal() as db:
+            return await async_crud.get_standings(db=db, tournament_id=tournament_id)
+
+
+async def run_async(tournament_id: int, total: int, concurrency: int) -> float:
+    # asyncpg connections belong to one event loop, so warm up and measure on the same one
+    limit = asyncio.Semaphore(concurrency)
+    await async_request(tournament_id, limit)
+    start = perf_counter()
+    await asyncio.gather(*(async_request(tournament_id, limit) for _ in range(total)))
+    elapsed = perf_counter() - start
+    await async_engine.dispose()
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sync vs async database path throughput.')
+    parser.add_argument('--competitors', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=1000, help='async requests in flight at once')
+    args = parser.parse_args(argv)
+
+    # every request reads the database, not entries the first one cached
+    read_cache.backend = None
+    tournament_id = seed(args.competitors)
+    # warm the pool so the sync run doesn't pay for connecting
+    sync_request(tournament_id)
+
+    sync_seconds = run_sync(tournament_id, args.requests)
+    async_seconds = asyncio.run(run_async(tournament_id, args.requests, args.concurrency))
+    print(f'sync   {args.requests / sync_seconds:8.1f} req/s  {sync_seconds:6.2f}s')
+    print(f'async  {args.requests / async_seconds:8.1f} req/s  {async_seconds:6.2f}s')
+
+
+if __name__ == '__main__':
+    main()
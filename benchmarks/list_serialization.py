@@ -0,0 +1,108 @@
+"""
+Compare the two ways of serving a list endpoint.
+
+Seeds a throwaway tournament with --matches matches in the configured
+database, then builds a GET /matches response for --rows of them over and
+over, both ways:
+
+    pydantic  ORM objects, validated through List[schemas.Match] the way
+              FastAPI does for a response_model, then rendered as JSON
+    orjson    rows of the schema's columns from async_crud.get_matches,
+              rendered by app.serialization.rows_response
+
+    python benchmarks/list_serialization.py --matches 5000 --rows 5000 --repeat 20
+
+Times include the query, so they show what a request spends end to end on
+a read cache miss. The read cache is turned off for the run.
+"""
+import argparse
+import asyncio
+from time import perf_counter
+from typing import List
+from uuid import uuid4
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, SessionLocal, async_engine
+from app.serialization import rows_response
+import app.async_crud as async_crud
+import app.crud as crud
+import app.models as models
+import app.read_cache as read_cache
+import app.schemas as schemas
+
+
+def seed(matches: int) -> int:
+    db = SessionLocal()
+    try:
+        owner = models.User(username=f'bench-{uuid4().hex}', hashed_password='')
+        db.add(owner)
+        db.commit()
+        tournament = crud.create_own_tournament(db=db, owner_id=owner.id, name='benchmark', description=None)
+        competitor_ids = [
+            crud.create_competitor(db=db, name=f'competitor {i}', tournament_id=tournament.id).id
+            for i in range(100)
+        ]
+        pairings = list(zip(competitor_ids[::2], competitor_ids[1::2]))
+        rounds = [(tournament.id, round, pairings) for round in range(-(-matches // len(pairings)))]
+        crud.create_rounds(db=db, rounds=rounds)
+        return tournament.id
+    finally:
+        db.close()
+
+
+async def pydantic_response(tournament_id: int, rows: int, field) -> bytes:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(models.Match)
+            .where(models.Match.tournament_id == tournament_id)
+            .order_by(models.Match.round, models.Match.id)
+            .limit(rows)
+        )
+        content = await serialize_response(field=field, response_content=result.scalars().all())
+    return JSONResponse(content).body
+
+
+async def orjson_response(tournament_id: int, rows: int) -> bytes:
+    async with AsyncSessionLocal() as db:
+        matches = await async_crud.get_matches(db=db, tournament_id=tournament_id, round=None, limit=rows)
+    return rows_response(matches, schemas.Match, Response()).body
+
+
+async def run(tournament_id: int, rows: int, repeat: int):
+    field = create_response_field(name='Response_Get_Matches', type_=List[schemas.Match])
+    paths = {
+        'pydantic': lambda: pydantic_response(tournament_id, rows, field),
+        'orjson': lambda: orjson_response(tournament_id, rows),
+    }
+    bodies = {name: await path() for name, path in paths.items()}
+    assert len(set(bodies.values())) == 1, 'the two paths returned different JSON'
+
+    for name, path in paths.items():
+        start = perf_counter()
+        for _ in range(repeat):
+            await path()
+        elapsed = (perf_counter() - start) / repeat
+        print(f'{name:<9} {elapsed * 1000:8.2f} ms per response  {rows / elapsed:10.0f} rows/s')
+    await async_engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pydantic vs orjson list serialization.')
+    parser.add_argument('--matches', type=int, default=5000)
+    parser.add_argument('--rows', type=int, default=5000, help='rows per response')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    # every request reads the database, not entries the first one cached
+    read_cache.backend = None
+    tournament_id = seed(args.matches)
+    asyncio.run(run(tournament_id, args.rows, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
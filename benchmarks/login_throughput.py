@@ -0,0 +1,105 @@
+"""
+Measure how many logins per second the API sustains under concurrent load.
+
+Starts the app with uvicorn against the configured database, registers a
+throwaway user and posts to /token from many client threads at once:
+
+    python benchmarks/login_throughput.py --requests 200 --concurrency 1 16
+
+With password hashing off the event loop, throughput at higher concurrency
+scales with PASSWORD_HASH_WORKERS (up to the cpu count) instead of staying at
+the serial rate, and a plain GET / timed alongside the logins stays fast.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import statistics
+import subprocess
+import sys
+from threading import Event
+from time import perf_counter, sleep
+from uuid import uuid4
+
+import requests
+
+
+URL_PREFIX = '/api/v1/swiss-tournament'
+
+
+def wait_for_server(base_url: str, timeout: float = 30):
+    deadline = perf_counter() + timeout
+    while perf_counter() < deadline:
+        try:
+            requests.get(base_url, timeout=1)
+            return
+        except requests.ConnectionError:
+            sleep(0.1)
+    raise RuntimeError(f'server at {base_url} did not start')
+
+
+def login(base_url: str, username: str, password: str) -> float:
+    start = perf_counter()
+    response = requests.post(
+        f'{base_url}{URL_PREFIX}/token',
+        data={'username': username, 'password': password}
+    )
+    response.raise_for_status()
+    return perf_counter() - start
+
+
+def probe(base_url: str, done: Event) -> list:
+    # a cheap request timed while logins are in flight, it only stays fast
+    # if hashing isn't holding up the event loop
+    latencies = []
+    while not done.is_set():
+        start = perf_counter()
+        requests.get(base_url)
+        latencies.append(perf_counter() - start)
+    return latencies
+
+
+def run(base_url: str, username: str, password: str, total: int, concurrency: int):
+    done = Event()
+    with ThreadPoolExecutor(max_workers=concurrency + 1) as executor:
+        probes = executor.submit(probe, base_url, done)
+        start = perf_counter()
+        latencies = list(executor.map(lambda _: login(base_url, username, password), range(total)))
+        elapsed = perf_counter() - start
+        done.set()
+        probe_latencies = probes.result()
+    latencies.sort()
+    print(
+        f'concurrency {concurrency:>3}  {total / elapsed:8.1f} logins/s  '
+        f'p50 {statistics.median(latencies) * 1000:7.1f} ms  '
+        f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} ms  '
+        f'GET / p50 {statistics.median(probe_latencies) * 1000:7.1f} ms'
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent login throughput.')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(args.port), '--log-level', 'warning'],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    try:
+        wait_for_server(base_url)
+        username, password = f'bench-{uuid4().hex}@example.com', uuid4().hex
+        requests.post(
+            f'{base_url}{URL_PREFIX}/users', data={'username': username, 'password': password}
+        ).raise_for_status()
+        for concurrency in args.concurrency:
+            run(base_url, username, password, args.requests, concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
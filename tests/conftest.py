@@ -8,7 +8,10 @@ from typing import Dict
 
 from app.config import settings
 import app.crud as crud
-from app.database import Base, get_db
+import app.history as history
+import app.database as database
+import app.read_cache as read_cache
+from app.database import Base, get_async_db, get_db
 from app.main import app
 import app.models as models
 
@@ -76,6 +79,48 @@ def create_test_db():
     drop_database(test_db_url)
 
 
+class AsyncTestSession:
+    """
+    Await-able face on the sync test session, so the async routes run their
+    queries inside the same rolled back transaction as the fixtures.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    async def execute(self, statement, *args, **kwargs):
+        return self.sync_session.execute(statement, *args, **kwargs)
+
+    async def get(self, entity, ident):
+        return self.sync_session.get(entity, ident)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.sync_session, *args, **kwargs)
+
+    async def commit(self):
+        self.sync_session.commit()
+
+    async def refresh(self, instance):
+        self.sync_session.refresh(instance)
+
+    async def stream(self, statement, *args, **kwargs):
+        return AsyncTestResult(self.sync_session.execute(statement, *args, **kwargs))
+
+
+class AsyncTestResult:
+    """Just enough of AsyncResult for the streaming exports."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        for partition in self.result.partitions(size):
+            yield partition
+
+
 @pytest.fixture()
 def client(test_db):
     """Get a TestClient instance that reads/writes to the test database."""
@@ -83,7 +128,17 @@ def client(test_db):
     def get_test_db():
         yield test_db
 
+    async def get_async_test_db():
+        yield AsyncTestSession(test_db)
+
     app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_async_db] = get_async_test_db
+    # rolled back test data must not linger in the in-process caches
+    history.clear()
+    crud.round_previews.clear()
+    crud.principals.clear()
+    database.recent_writers.clear()
+    read_cache.clear()
 
     yield TestClient(app)
 
@@ -133,6 +188,8 @@ def test_competitor_one(test_db, test_tournament) -> models.Competitor:
         losses=0,
     )
     test_db.add(competitor)
+    test_db.flush()
+    crud.create_standing(db=test_db, competitor_id=competitor.id, tournament_id=test_tournament.id)
     test_db.commit()
     yield competitor
 
@@ -147,6 +204,8 @@ def test_competitor_two(test_db, test_tournament) -> models.Competitor:
         losses=0,
     )
     test_db.add(competitor)
+    test_db.flush()
+    crud.create_standing(db=test_db, competitor_id=competitor.id, tournament_id=test_tournament.id)
     test_db.commit()
     yield competitor
 
@@ -163,6 +222,7 @@ def test_match(test_db, test_tournament, test_competitor_one, test_competitor_tw
         loser_id=None,
     )
     test_db.add(match)
+    crud.add_round_matches(db=test_db, rounds=[(test_tournament.id, 0, 1, 0)])
     test_db.commit()
     yield match
     
@@ -0,0 +1,111 @@
+"""
+Test async_crud on a real AsyncSession over asyncpg.
+
+The route tests run async_crud on the sync test session, these run it the
+way the app does, so expire_on_commit, run_sync and server side cursors
+behave as they do in production.
+"""
+import asyncio
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import app.async_crud as async_crud
+from app.database import AsyncSessionLocal, asyncpg_uri
+import app.history as history
+import app.models as models
+import app.read_cache as read_cache
+from tests.conftest import get_test_db_uri
+
+
+def run_in_async_session(test):
+    """Run test(db) on an AsyncSession from the app's sessionmaker, rolled back afterwards."""
+
+    async def run():
+        engine = create_async_engine(asyncpg_uri(get_test_db_uri()))
+        try:
+            async with engine.connect() as connection:
+                trans = await connection.begin()
+                db = AsyncSessionLocal(bind=connection)
+                await db.begin_nested()
+
+                @event.listens_for(db.sync_session, 'after_transaction_end')
+                def restart_savepoint(s, transaction):
+                    if transaction.nested and not transaction._parent.nested:
+                        s.begin_nested()
+
+                try:
+                    await test(db)
+                finally:
+                    await db.close()
+                    await trans.rollback()
+        finally:
+            await engine.dispose()
+
+    history.clear()
+    read_cache.clear()
+    asyncio.run(run())
+
+
+async def create_tournament(db):
+    user = models.User(username='lancelot@email.com', hashed_password='supersecrethash', is_active=True)
+    db.add(user)
+    await db.commit()
+    return await async_crud.create_own_tournament(
+        db=db, owner_id=user.id, name='Joust', description='Camelot'
+    )
+
+
+def test_objects_stay_loaded_after_commit():
+    async def test(db):
+        user = models.User(username='gawain@email.com', hashed_password='supersecrethash', is_active=True)
+        db.add(user)
+        await db.commit()
+        # an expired attribute would need a lazy load, which fails outside run_sync
+        assert user.id is not None
+        assert user.username == 'gawain@email.com'
+
+    run_in_async_session(test)
+
+
+def test_run_sync_writes_and_async_reads():
+    async def test(db):
+        tournament = await create_tournament(db)
+        competitor = await async_crud.create_competitor(db=db, name='Percival', tournament_id=tournament.id)
+        await async_crud.create_competitor(db=db, name='Galahad', tournament_id=tournament.id)
+        updated = await async_crud.update_competitor(
+            db=db, competitor_id=competitor.id, competitor_name='Sir Percival', wins=2, losses=1
+        )
+        assert (updated.name, updated.wins, updated.losses) == ('Sir Percival', 2, 1)
+
+        standings = await async_crud.get_standings(db=db, tournament_id=tournament.id)
+        assert standings[0].competitor_id == competitor.id
+        competitors = await async_crud.get_tournament_competitors(db=db, tournament_id=tournament.id)
+        assert [c.name for c in competitors] == ['Sir Percival', 'Galahad']
+        tournament = await async_crud.get_tournament_by_id(db=db, tournament_id=tournament.id)
+        assert tournament.version == 3
+
+    run_in_async_session(test)
+
+
+def test_exports_stream_from_a_server_side_cursor(monkeypatch):
+    monkeypatch.setattr(async_crud.settings, 'EXPORT_CHUNK_SIZE', 2)
+
+    async def test(db):
+        tournament = await create_tournament(db)
+        for name in ['Bors', 'Gareth', 'Kay', 'Tristan', 'Lamorak']:
+            await async_crud.create_competitor(db=db, name=name, tournament_id=tournament.id)
+        ids = [c.id for c in await async_crud.get_tournament_competitors(db=db, tournament_id=tournament.id)]
+        await async_crud.create_round(
+            db=db, tournament_id=tournament.id, round=0, pairings=[(ids[0], ids[1]), (ids[2], ids[3]), (ids[4], None)]
+        )
+
+        chunks = [rows async for rows in async_crud.stream_tournament_competitors(db=db, tournament_id=tournament.id)]
+        assert [len(rows) for rows in chunks] == [2, 2, 1]
+        assert [row.id for rows in chunks for row in rows] == ids
+        chunks = [rows async for rows in async_crud.stream_matches(db=db, tournament_id=tournament.id, round=0)]
+        assert [(row.competitor_one, row.competitor_two) for rows in chunks for row in rows] == [
+            (ids[0], ids[1]), (ids[2], ids[3]), (ids[4], None)
+        ]
+
+    run_in_async_session(test)
@@ -0,0 +1,64 @@
+"""Test in-process caches."""
+from app.cache import LRUCache, RedisCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_lru_cache_ttl_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('app.cache.monotonic', lambda: now[0])
+    cache = LRUCache(maxsize=2, ttl=10)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    now[0] += 11
+    assert cache.get('a') is None
+
+
+def test_lru_cache_pop():
+    cache = LRUCache()
+    cache.set('a', 1)
+    assert cache.pop('a') == 1
+    assert cache.pop('a') is None
+
+
+class LocalRedis:
+    """Stand-in for a Redis client, the few commands RedisCache uses on a dict."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, px=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if key.startswith(match.rstrip('*'))]
+
+
+def test_redis_cache_round_trips_values():
+    client = LocalRedis()
+    cache = RedisCache(client=client)
+    cache.set(('matches', 1, None), [(1, 'Percival')])
+    assert cache.get(('matches', 1, None)) == [(1, 'Percival')]
+    assert cache.get(('matches', 2, None)) is None
+    assert cache.pop(('matches', 1, None)) == [(1, 'Percival')]
+    assert cache.get(('matches', 1, None), 'missing') == 'missing'
+
+    cache.set('a', 1)
+    client.data['other'] = b'kept'
+    cache.clear()
+    assert list(client.data) == ['other']
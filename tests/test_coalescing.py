@@ -0,0 +1,110 @@
+"""Test single-flight coalescing."""
+import asyncio
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+import pytest
+from starlette.requests import Request
+
+from app.coalescing import SingleFlight, shared_response
+
+
+def counted(result):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return fn, calls
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    fn, calls = counted(['round 3'])
+
+    async def run():
+        return await asyncio.gather(*(flight.do(('matches', 1, 7), fn) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert (flight.calls, flight.shared) == (1, 9)
+
+    # nothing is kept once the call is done
+    asyncio.run(flight.do(('matches', 1, 7), fn))
+    assert len(calls) == 2
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    fn, calls = counted([])
+
+    async def run():
+        await asyncio.gather(flight.do(('matches', 1, 7), fn), flight.do(('matches', 1, 8), fn))
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_exceptions_are_shared():
+    flight = SingleFlight()
+    fn, calls = counted(ValueError('no'))
+
+    async def run():
+        return await asyncio.gather(*(flight.do('key', fn) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_waiters_run_it_again_when_the_first_caller_is_cancelled():
+    flight = SingleFlight()
+    fn, calls = counted('built')
+
+    async def run():
+        first = asyncio.ensure_future(flight.do('key', fn))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do('key', fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == 'built'
+    assert len(calls) == 2
+
+
+def test_shared_response_copies_keep_their_own_headers():
+    def request():
+        return Request({'type': 'http', 'method': 'GET', 'path': '/matches', 'query_string': b'round=2', 'headers': []})
+
+    builds = []
+
+    async def build():
+        builds.append(1)
+        await asyncio.sleep(0.01)
+        page_response = Response()
+        page_response.headers['X-Next-Cursor'] = 'abc'
+        return ORJSONResponse([{'id': 1}], headers=page_response.headers)
+
+    async def run():
+        responses = []
+        for etag in ('"one"', '"two"'):
+            response = Response()
+            response.headers['ETag'] = etag
+            responses.append(shared_response(request(), response, (1, 7), build))
+        return await asyncio.gather(*responses)
+
+    first, second = asyncio.run(run())
+    assert len(builds) == 1
+    assert first is not second
+    assert first.body == second.body == b'[{"id":1}]'
+    assert first.headers['ETag'] == '"one"' and second.headers['ETag'] == '"two"'
+    assert first.headers['X-Next-Cursor'] == second.headers['X-Next-Cursor'] == 'abc'
+    assert first.headers['content-type'] == 'application/json'
@@ -1,4 +1,7 @@
 """Test competitor routes."""
+import json
+
+import app.crud as crud
 
 
 URL_PREFIX = '/api/v1/swiss-tournament'
@@ -96,3 +99,129 @@ def test_update_lose_to_competitor(client, user_token_headers, test_tournament,
     assert response.status_code == 200, response.text
     data = response.json()
     assert data['losses'] == 1
+
+
+def test_update_competitor_from_another_tournament(
+    client, user_token_headers, test_db, test_user, test_competitor_one
+):
+    other = crud.create_own_tournament(db=test_db, owner_id=test_user.id, name='Elsewhere', description=None)
+    response = client.put(
+        f'{URL_PREFIX}/competitors',
+        headers=user_token_headers,
+        json={
+            'id': test_competitor_one.id,
+            'name': 'Mordred',
+            'tournament_id': other.id,
+            'wins': 0,
+            'losses': 0,
+        },
+    )
+    assert response.status_code == 404, response.text
+
+
+def test_update_missing_competitor(test_db):
+    assert crud.update_competitor(db=test_db, competitor_id=6000, competitor_name='Mordred', wins=1, losses=0) is None
+
+
+def test_get_competitors_by_page(client, user_token_headers, test_tournament):
+    ids = []
+    for name, wins in [('Lancelot', 1), ('Gawain', 3), ('Bors', 1), ('Kay', 0), ('Tristan', 1)]:
+        competitor = client.post(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={'name': name, 'tournament_id': test_tournament.id},
+        ).json()
+        client.put(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={**competitor, 'wins': wins, 'losses': 0},
+        )
+        ids.append(competitor['id'])
+
+    pages = []
+    url = f'{URL_PREFIX}/competitors?tournament_id={test_tournament.id}&limit=2'
+    response = client.get(url, headers=user_token_headers)
+    while True:
+        assert response.status_code == 200, response.text
+        pages.append([competitor['id'] for competitor in response.json()])
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        response = client.get(f"{url}&after={response.headers['X-Next-Cursor']}", headers=user_token_headers)
+
+    # wins first, ties in id order, each competitor exactly once
+    assert pages == [[ids[1], ids[0]], [ids[2], ids[4]], [ids[3]]]
+
+
+def test_get_competitors_by_page_after_updates_without_wins(client, user_token_headers, test_tournament):
+    ids = []
+    for name, wins in [('Lancelot', 1), ('Gawain', None), ('Bors', None), ('Kay', 2)]:
+        competitor = client.post(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={'name': name, 'tournament_id': test_tournament.id},
+        ).json()
+        update = {'id': competitor['id'], 'name': name, 'tournament_id': test_tournament.id}
+        if wins is not None:
+            update['wins'] = wins
+        client.put(f'{URL_PREFIX}/competitors', headers=user_token_headers, json=update)
+        ids.append(competitor['id'])
+
+    seen = []
+    url = f'{URL_PREFIX}/competitors?tournament_id={test_tournament.id}&limit=1'
+    response = client.get(url, headers=user_token_headers)
+    while True:
+        assert response.status_code == 200, response.text
+        seen += [competitor['id'] for competitor in response.json()]
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        response = client.get(f"{url}&after={response.headers['X-Next-Cursor']}", headers=user_token_headers)
+
+    # left out wins are stored as 0, so every cursor is valid and no competitor is skipped
+    assert seen == [ids[3], ids[0], ids[1], ids[2]]
+
+
+def test_get_competitors_bad_page(client, user_token_headers, test_tournament):
+    url = f'{URL_PREFIX}/competitors?tournament_id={test_tournament.id}'
+    assert client.get(f'{url}&after=not-a-cursor', headers=user_token_headers).status_code == 400
+    # a tournaments cursor has one value, competitors need two
+    assert client.get(f'{url}&after=WzFd', headers=user_token_headers).status_code == 400
+    assert client.get(f'{url}&limit=0', headers=user_token_headers).status_code == 422
+    assert client.get(f'{url}&limit=100000', headers=user_token_headers).status_code == 422
+
+
+def test_export_competitors(client, user_token_headers, test_tournament, test_competitor_one, test_competitor_two):
+    listed = client.get(
+        f'{URL_PREFIX}/competitors?tournament_id={test_tournament.id}', headers=user_token_headers
+    ).json()
+    response = client.get(
+        f'{URL_PREFIX}/competitors/export?tournament_id={test_tournament.id}', headers=user_token_headers
+    )
+    assert response.status_code == 200, response.text
+    assert [json.loads(line) for line in response.text.splitlines()] == listed
+
+    response = client.get(
+        f'{URL_PREFIX}/competitors/export?tournament_id=2000000', headers=user_token_headers
+    )
+    assert response.status_code == 404, response.text
+
+
+def test_get_competitors_not_modified(client, user_token_headers, test_tournament, test_competitor_one):
+    url = f'{URL_PREFIX}/competitors?tournament_id={test_tournament.id}'
+    etag = client.get(url, headers=user_token_headers).headers['ETag']
+    response = client.get(url, headers={**user_token_headers, 'If-None-Match': f'"other", W/{etag}'})
+    assert response.status_code == 304, response.text
+
+    client.put(
+        f'{URL_PREFIX}/competitors',
+        headers=user_token_headers,
+        json={
+            'id': test_competitor_one.id,
+            'name': 'Mordred',
+            'tournament_id': test_tournament.id,
+            'wins': 0,
+            'losses': 0,
+        },
+    )
+    response = client.get(url, headers={**user_token_headers, 'If-None-Match': etag})
+    assert response.status_code == 200, response.text
+    assert response.json()[0]['name'] == 'Mordred'
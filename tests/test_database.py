@@ -0,0 +1,92 @@
+"""Test read replica routing."""
+import asyncio
+
+from starlette.requests import Request
+
+from app.cache import RedisCache
+from app.config import settings
+import app.database as database
+from app.dependencies import create_access_token
+from tests.test_cache import LocalRedis
+
+
+URL_PREFIX = '/api/v1/swiss-tournament'
+
+
+def make_request(method: str, username: str = None) -> Request:
+    headers = []
+    if username:
+        headers.append((b'authorization', f"Bearer {create_access_token({'sub': username})}".encode()))
+    return Request({'type': 'http', 'method': method, 'path': '/', 'headers': headers})
+
+
+class NamedSessionMaker:
+    # stands in for a sessionmaker, its "session" is the database name
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self.name
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def database_for(request: Request) -> str:
+    async def first_session():
+        sessions = database.get_async_db(request)
+        db = await sessions.__anext__()
+        await sessions.aclose()
+        return db
+    return asyncio.run(first_session())
+
+
+def test_reads_go_to_replica_until_user_writes():
+    database.recent_writers.clear()
+    assert database.reads_from_replica(make_request('GET', 'percival'))
+    assert database.reads_from_replica(make_request('GET'))
+    assert not database.reads_from_replica(make_request('PUT', 'percival'))
+
+    database.mark_writer('percival')
+    assert not database.reads_from_replica(make_request('GET', 'percival'))
+    # only the user who wrote is kept on the primary
+    assert database.reads_from_replica(make_request('GET', 'merlin'))
+    database.recent_writers.clear()
+
+
+def test_stickiness_expires(monkeypatch):
+    monkeypatch.setattr(database.recent_writers, 'ttl', 0)
+    database.mark_writer('percival')
+    assert database.reads_from_replica(make_request('GET', 'percival'))
+
+
+def test_get_async_db_routes_by_method(monkeypatch):
+    database.recent_writers.clear()
+    monkeypatch.setattr(database, 'AsyncReplicaSessionLocal', NamedSessionMaker('replica'))
+    monkeypatch.setattr(database, 'AsyncSessionLocal', NamedSessionMaker('primary'))
+
+    assert database_for(make_request('GET', 'percival')) == 'replica'
+    assert database_for(make_request('POST', 'percival')) == 'primary'
+    # the write above keeps percival's reads on the primary for a while
+    assert database_for(make_request('GET', 'percival')) == 'primary'
+    database.recent_writers.clear()
+
+
+def test_login_sticks_user_to_primary(client, test_user, user_token_headers):
+    assert database.recent_writers.get(test_user.username)
+
+
+def test_writes_on_another_worker_keep_reads_on_primary(monkeypatch):
+    client = LocalRedis()
+    monkeypatch.setattr(settings, 'READ_CACHE_BACKEND', 'redis')
+    monkeypatch.setattr(database, 'RedisCache', lambda url, **kwargs: RedisCache(client=client, **kwargs))
+    writing_worker, reading_worker = database.create_recent_writers(), database.create_recent_writers()
+    monkeypatch.setattr(database, 'recent_writers', writing_worker)
+    database.mark_writer('percival')
+    monkeypatch.setattr(database, 'recent_writers', reading_worker)
+    assert not database.reads_from_replica(make_request('GET', 'percival'))
+    assert database.reads_from_replica(make_request('GET', 'merlin'))
@@ -0,0 +1,55 @@
+"""Test the in-process opponent history."""
+import app.crud as crud
+import app.history as history
+import app.models as models
+from app.history import OpponentHistory
+
+
+def test_history_from_matches():
+    tournament_history = OpponentHistory([(1, 10, 11), (2, 12, None), (3, 10, 12)])
+    assert tournament_history.has_played(10, 11)
+    assert tournament_history.has_played(12, 10)
+    assert not tournament_history.has_played(11, 12)
+    assert tournament_history.byes == {12}
+    assert tournament_history.match_count == 3
+
+
+def test_record_matches_updates_loaded_history():
+    history.clear()
+    history.load(1, [(1, 10, 11)])
+    history.record_matches(1, [(3, 11, 12), (2, 13, None)])
+    tournament_history = history.get(1)
+    assert tournament_history.has_played(12, 11)
+    assert tournament_history.byes == {13}
+    assert tournament_history.match_count == 3
+
+
+def test_record_matches_ignores_unloaded_tournament():
+    history.clear()
+    history.record_matches(2, [(1, 10, 11)])
+    assert history.get(2) is None
+
+
+def test_histories_are_bounded(monkeypatch):
+    monkeypatch.setattr(history, '_histories', history.LRUCache(maxsize=2))
+    for tournament_id in range(3):
+        history.load(tournament_id, [])
+    assert history.get(0) is None
+    assert history.get(2) is not None
+
+
+def test_opponent_history_reloads_missed_matches(test_db, test_tournament, test_competitor_one, test_competitor_two):
+    history.clear()
+    assert crud.get_opponent_history(db=test_db, tournament_id=test_tournament.id).match_count == 0
+    # another worker commits a match this process never records
+    test_db.add(models.Match(
+        tournament_id=test_tournament.id,
+        round=0,
+        competitor_one=test_competitor_one.id,
+        competitor_two=test_competitor_two.id
+    ))
+    crud.add_round_matches(db=test_db, rounds=[(test_tournament.id, 0, 1, 0)])
+    test_db.commit()
+    tournament_history = crud.get_opponent_history(db=test_db, tournament_id=test_tournament.id)
+    assert tournament_history.match_count == 1
+    assert tournament_history.has_played(test_competitor_one.id, test_competitor_two.id)
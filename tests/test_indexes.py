@@ -0,0 +1,161 @@
+"""
+Check the hot queries are planned on the indexes meant for them. List
+queries come from the same builders async_crud runs for the routes.
+"""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, insert
+
+import app.async_crud as async_crud
+import app.crud as crud
+import app.models as models
+
+
+@pytest.fixture()
+def crowded_db(test_db, test_user, test_tournament):
+    """
+    Surround test_tournament with enough tournaments, competitors and matches
+    that the planner statistics look like a database in use.
+    """
+    tournament_ids = [test_tournament.id]
+    for i in range(19):
+        tournament_ids.append(test_db.execute(
+            insert(models.Tournament)
+            .values(name=f'tournament {i}', owner_id=test_user.id)
+            .returning(models.Tournament.id)
+        ).scalar())
+
+    for tournament_id in tournament_ids:
+        competitor_ids = [
+            test_db.execute(
+                insert(models.Competitor)
+                .values(name=f'competitor {i}', tournament_id=tournament_id, wins=i % 5, losses=0)
+                .returning(models.Competitor.id)
+            ).scalar()
+            for i in range(40)
+        ]
+        test_db.execute(insert(models.Match), [
+            {
+                'tournament_id': tournament_id,
+                'competitor_one': competitor_ids[i],
+                'competitor_two': competitor_ids[-i - 1],
+                'round': round,
+            }
+            for round in range(1, 6) for i in range(20)
+        ])
+    test_db.execute('ANALYZE')
+    return test_db
+
+
+@contextmanager
+def captured_statements(db):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+
+def explain(db, query, **planner_settings) -> str:
+    """
+    EXPLAIN a select, or the last statement a callable runs, with enable_*
+    planner settings applied.
+    """
+    with captured_statements(db) as statements:
+        query() if callable(query) else db.execute(query)
+    statement, parameters = statements[-1]
+
+    connection = db.connection()
+    for name, value in planner_settings.items():
+        connection.exec_driver_sql(f"SET LOCAL enable_{name} = {'on' if value else 'off'}")
+    try:
+        return '\n'.join(connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).scalars())
+    finally:
+        for name in planner_settings:
+            connection.exec_driver_sql(f'RESET enable_{name}')
+
+
+def test_matches_by_round_use_index(crowded_db, test_tournament):
+    plan = explain(crowded_db, async_crud.matches_query(tournament_id=test_tournament.id, round=1, limit=100))
+    assert 'ix_matches_tournament_id_round_id' in plan
+
+
+def test_match_pages_read_in_index_order(crowded_db, test_tournament):
+    plan = explain(
+        crowded_db,
+        async_crud.matches_query(tournament_id=test_tournament.id, round=None, limit=10, after=(3, 0)),
+        sort=False
+    )
+    assert 'ix_matches_tournament_id_round_id' in plan
+    assert 'Sort' not in plan
+
+
+def test_matches_by_competitor_use_indexes(crowded_db, test_tournament):
+    competitor = crowded_db.execute(async_crud.tournament_competitors_query(tournament_id=test_tournament.id)).first()
+    plan = explain(
+        crowded_db,
+        lambda: crud.get_matches_by_competitor(
+            db=crowded_db, tournament_id=test_tournament.id, competitor_id=competitor.id
+        )
+    )
+    assert 'ix_matches_competitor_one' in plan
+    assert 'ix_matches_competitor_two' in plan
+
+
+def test_tournament_competitors_read_in_index_order(crowded_db, test_tournament):
+    # with sorting off a plan that still has to sort means the index can't supply the order
+    plan = explain(
+        crowded_db,
+        async_crud.tournament_competitors_query(tournament_id=test_tournament.id, limit=100),
+        sort=False
+    )
+    assert 'ix_competitors_tournament_id_wins' in plan
+    assert 'Sort' not in plan
+
+
+def test_competitor_pages_start_from_cursor(crowded_db, test_tournament):
+    plan = explain(
+        crowded_db,
+        async_crud.tournament_competitors_query(tournament_id=test_tournament.id, limit=10, after=(2, 0)),
+        sort=False
+    )
+    assert 'ix_competitors_tournament_id_wins' in plan
+    assert 'Sort' not in plan
+    # the scan starts at the cursor rather than reading and discarding earlier rows
+    assert 'wins <=' in plan
+
+
+def test_standing_pages_read_in_index_order(crowded_db, test_tournament):
+    plan = explain(
+        crowded_db,
+        async_crud.standings_query(tournament_id=test_tournament.id, limit=10, after=(3, 0)),
+        sort=False
+    )
+    assert 'ix_standings_tournament_id_rank' in plan
+    assert 'Sort' not in plan
+
+
+def test_own_tournament_by_name_uses_index(crowded_db, test_user, test_tournament):
+    # twenty tournaments fit in one page, where a sequential scan is rightly cheaper
+    plan = explain(
+        crowded_db,
+        async_crud.own_tournament_by_name_query(owner_id=test_user.id, name=test_tournament.name),
+        seqscan=False
+    )
+    assert 'ix_tournaments_owner_id_name' in plan
+
+
+def test_unused_indexes_are_gone(test_db):
+    indexes = test_db.connection().exec_driver_sql(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = 'public'"
+    ).scalars().all()
+    for name in ('ix_tournaments_description', 'ix_tournaments_name', 'ix_competitors_name', 'ix_matches_id'):
+        assert name not in indexes
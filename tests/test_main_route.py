@@ -9,3 +9,10 @@ def test_read_main():
     response = client.get('/')
     assert response.status_code == 200
     assert response.json() == {'message': 'Hello World'}
+
+
+def test_read_metrics():
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'swiss_db_pool_checked_out{engine="sync"}' in response.text
+    assert 'swiss_db_pool_wait_seconds_total{engine="async"}' in response.text
@@ -1,4 +1,7 @@
 """Test match routes."""
+import json
+
+import app.crud as crud
 
 
 URL_PREFIX = '/api/v1/swiss-tournament'
@@ -337,3 +340,617 @@ def test_match_competitors_uneven_success(client, user_token_headers, test_tourn
                 competitor_ids.append(match['competitor_two'])
         assert len(set(competitor_ids)) == len(competitor_ids)
         round += 1
+
+
+def test_match_competitors_weighted_pairs_full_rounds(client, user_token_headers):
+    response = client.post(
+        f'{URL_PREFIX}/tournaments',
+        headers=user_token_headers,
+        json={'name': 'Weighted Open', 'pairing_method': 'weighted'},
+    )
+    assert response.status_code == 201, response.text
+    tournament = response.json()
+    assert tournament['pairing_method'] == 'weighted'
+    for name in ['pirates', 'jaguars', 'falcons', 'arrows', 'crushers', 'smashers']:
+        response = client.post(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={'name': name, 'tournament_id': tournament['id']},
+        )
+        assert response.status_code == 201, response.text
+
+    played = set()
+    # six competitors can play a full round robin of five rounds
+    for round in range(5):
+        response = client.get(
+            f'{URL_PREFIX}/matches/match_competitors?tournament_id={tournament["id"]}',
+            headers=user_token_headers
+        )
+        assert response.status_code == 200, response.text
+        data = [match for match in response.json() if match['round'] == round]
+        assert len(data) == 3
+        for match in data:
+            pair = frozenset([match['competitor_one'], match['competitor_two']])
+            assert pair not in played
+            played.add(pair)
+
+
+def test_match_competitors_weighted_after_update_without_wins(client, user_token_headers):
+    response = client.post(
+        f'{URL_PREFIX}/tournaments',
+        headers=user_token_headers,
+        json={'name': 'Weighted Open', 'pairing_method': 'weighted'},
+    )
+    tournament = response.json()
+    ids = []
+    for name in ['pirates', 'jaguars', 'falcons', 'arrows']:
+        response = client.post(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={'name': name, 'tournament_id': tournament['id']},
+        )
+        ids.append(response.json()['id'])
+    response = client.put(
+        f'{URL_PREFIX}/competitors',
+        headers=user_token_headers,
+        json={'id': ids[0], 'name': 'pirates', 'tournament_id': tournament['id']},
+    )
+    assert response.status_code == 200, response.text
+    assert (response.json()['wins'], response.json()['losses']) == (0, 0)
+    response = client.get(
+        f'{URL_PREFIX}/matches/match_competitors?tournament_id={tournament["id"]}',
+        headers=user_token_headers
+    )
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 2
+
+
+def test_match_competitors_dutch(client, user_token_headers):
+    response = client.post(
+        f'{URL_PREFIX}/tournaments',
+        headers=user_token_headers,
+        json={'name': 'Dutch Open', 'pairing_method': 'dutch'},
+    )
+    assert response.status_code == 201, response.text
+    tournament = response.json()
+    for name in ['pirates', 'jaguars', 'falcons', 'crushers', 'smashers']:
+        client.post(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={'name': name, 'tournament_id': tournament['id']},
+        )
+    response = client.get(
+        f'{URL_PREFIX}/matches/match_competitors?tournament_id={tournament["id"]}',
+        headers=user_token_headers
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data) == 3
+    assert len([match for match in data if match['competitor_two'] is None]) == 1
+
+
+def test_create_round_success(
+    client, user_token_headers, test_tournament, test_competitor_one, test_competitor_two
+):
+    json_data = {
+        'tournament_id': test_tournament.id,
+        'round': 3,
+        'matches': [
+            {'competitor_one': test_competitor_one.id, 'competitor_two': None},
+            {'competitor_one': test_competitor_two.id, 'competitor_two': None},
+        ]
+    }
+    response = client.post(
+        f'{URL_PREFIX}/matches/round',
+        headers=user_token_headers,
+        json=json_data
+    )
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert len(data) == 2
+    assert all('id' in match and match['round'] == 3 for match in data)
+    response = client.get(
+        f'{URL_PREFIX}/matches?tournament_id={test_tournament.id}&round=3',
+        headers=user_token_headers
+    )
+    assert len(response.json()) == 2
+    assert _round_state(client, user_token_headers, test_tournament.id) == (3, 0, 2)
+
+    response = client.get(
+        f'{URL_PREFIX}/matches/match_competitors?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    assert {match['round'] for match in response.json()} == {4}
+    assert _round_state(client, user_token_headers, test_tournament.id) == (4, 1, 2)
+
+
+def test_create_round_competitor_twice(
+    client, user_token_headers, test_tournament, test_competitor_one, test_competitor_two
+):
+    json_data = {
+        'tournament_id': test_tournament.id,
+        'round': 1,
+        'matches': [
+            {'competitor_one': test_competitor_one.id, 'competitor_two': test_competitor_two.id},
+            {'competitor_one': test_competitor_two.id, 'competitor_two': None},
+        ]
+    }
+    response = client.post(
+        f'{URL_PREFIX}/matches/round',
+        headers=user_token_headers,
+        json=json_data
+    )
+    assert response.status_code == 400, response.text
+
+
+def test_create_round_competitor_not_found(client, user_token_headers, test_tournament, test_competitor_one):
+    json_data = {
+        'tournament_id': test_tournament.id,
+        'round': 1,
+        'matches': [{'competitor_one': test_competitor_one.id, 'competitor_two': 6000}]
+    }
+    response = client.post(
+        f'{URL_PREFIX}/matches/round',
+        headers=user_token_headers,
+        json=json_data
+    )
+    assert response.status_code == 404, response.text
+    assert response.json() == {'detail': 'Not found.'}
+
+
+def test_preview_round_writes_nothing_until_committed(
+    client, user_token_headers, test_tournament, test_competitor_one, test_competitor_two
+):
+    response = client.get(
+        f'{URL_PREFIX}/matches/preview?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    assert response.status_code == 200, response.text
+    preview = response.json()
+    assert preview['round'] == 0
+    assert preview['matches'] == [
+        {'competitor_one': test_competitor_one.id, 'competitor_two': test_competitor_two.id}
+    ]
+    response = client.get(
+        f'{URL_PREFIX}/matches?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    assert response.json() == []
+
+    response = client.post(
+        f'{URL_PREFIX}/matches/preview',
+        headers=user_token_headers,
+        json={'tournament_id': test_tournament.id, 'version': preview['version']}
+    )
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]['competitor_one'] == test_competitor_one.id
+
+    # the same preview can't be committed twice
+    response = client.post(
+        f'{URL_PREFIX}/matches/preview',
+        headers=user_token_headers,
+        json={'tournament_id': test_tournament.id, 'version': preview['version']}
+    )
+    assert response.status_code == 409, response.text
+
+
+def test_preview_round_committed_on_another_worker(
+    client, user_token_headers, test_tournament, test_competitor_one, test_competitor_two
+):
+    response = client.get(
+        f'{URL_PREFIX}/matches/preview?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    preview = response.json()
+    # the worker committing it never made the preview
+    crud.round_previews.clear()
+    response = client.post(
+        f'{URL_PREFIX}/matches/preview',
+        headers=user_token_headers,
+        json={'tournament_id': test_tournament.id, 'version': preview['version']}
+    )
+    assert response.status_code == 201, response.text
+    assert [
+        {'competitor_one': match['competitor_one'], 'competitor_two': match['competitor_two']}
+        for match in response.json()
+    ] == preview['matches']
+
+
+def test_preview_round_out_of_date(
+    client, user_token_headers, test_tournament, test_competitor_one, test_competitor_two
+):
+    response = client.get(
+        f'{URL_PREFIX}/matches/preview?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    version = response.json()['version']
+    client.post(
+        f'{URL_PREFIX}/competitors',
+        headers=user_token_headers,
+        json={'name': 'Gawain', 'tournament_id': test_tournament.id},
+    )
+    response = client.post(
+        f'{URL_PREFIX}/matches/preview',
+        headers=user_token_headers,
+        json={'tournament_id': test_tournament.id, 'version': version}
+    )
+    assert response.status_code == 409, response.text
+
+
+def test_preview_round_out_of_date_after_a_result(
+    client, user_token_headers, test_tournament, test_match, test_competitor_one, test_competitor_two
+):
+    response = client.get(
+        f'{URL_PREFIX}/matches/preview?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    version = response.json()['version']
+    client.put(
+        f'{URL_PREFIX}/matches',
+        headers=user_token_headers,
+        json={
+            'id': test_match.id,
+            'tournament_id': test_tournament.id,
+            'competitor_one': test_competitor_one.id,
+            'competitor_two': test_competitor_two.id,
+            'round': 0,
+            'winner_id': test_competitor_one.id,
+        }
+    )
+    response = client.post(
+        f'{URL_PREFIX}/matches/preview',
+        headers=user_token_headers,
+        json={'tournament_id': test_tournament.id, 'version': version}
+    )
+    assert response.status_code == 409, response.text
+
+
+def test_batch_round(client, user_token_headers, test_tournament, test_competitor_one, test_competitor_two):
+    response = client.post(
+        f'{URL_PREFIX}/matches/batch_round',
+        headers=user_token_headers,
+        json={'tournament_ids': [test_tournament.id, 6000]}
+    )
+    assert response.status_code == 200, response.text
+    results = {result['tournament_id']: result for result in response.json()['results']}
+    assert results[test_tournament.id]['error'] is None
+    assert results[test_tournament.id]['round'] == 0
+    assert results[test_tournament.id]['matches'] == 1
+    assert results[6000]['error'] == 'Not found.'
+    response = client.get(
+        f'{URL_PREFIX}/matches?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    assert len(response.json()) == 1
+
+
+def test_batch_round_after_updates_without_wins(client, user_token_headers):
+    tournament_ids = []
+    for method in ['dutch', 'weighted']:
+        response = client.post(
+            f'{URL_PREFIX}/tournaments',
+            headers=user_token_headers,
+            json={'name': f'{method} open', 'pairing_method': method},
+        )
+        tournament_id = response.json()['id']
+        tournament_ids.append(tournament_id)
+        for name in ['pirates', 'jaguars', 'falcons']:
+            response = client.post(
+                f'{URL_PREFIX}/competitors',
+                headers=user_token_headers,
+                json={'name': name, 'tournament_id': tournament_id},
+            )
+        client.put(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={'id': response.json()['id'], 'name': 'falcons', 'tournament_id': tournament_id},
+        )
+    response = client.post(
+        f'{URL_PREFIX}/matches/batch_round',
+        headers=user_token_headers,
+        json={'tournament_ids': tournament_ids}
+    )
+    assert response.status_code == 200, response.text
+    for result in response.json()['results']:
+        assert result['error'] is None
+        assert result['matches'] == 2
+
+
+def test_batch_round_reports_failed_writes_per_tournament(
+    client, monkeypatch, user_token_headers, test_tournament, test_competitor_one, test_competitor_two
+):
+    response = client.post(
+        f'{URL_PREFIX}/tournaments',
+        headers=user_token_headers,
+        json={'name': 'Table for Two'}
+    )
+    other_id = response.json()['id']
+    for name in ['Bors', 'Lamorak']:
+        client.post(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={'name': name, 'tournament_id': other_id},
+        )
+    create_rounds = crud.create_rounds
+
+    def failing_create_rounds(db, rounds):
+        if any(tid == other_id for tid, _, _ in rounds):
+            raise ValueError('write failed')
+        return create_rounds(db=db, rounds=rounds)
+
+    monkeypatch.setattr(crud, 'create_rounds', failing_create_rounds)
+    response = client.post(
+        f'{URL_PREFIX}/matches/batch_round',
+        headers=user_token_headers,
+        json={'tournament_ids': [test_tournament.id, other_id]}
+    )
+    assert response.status_code == 200, response.text
+    results = {result['tournament_id']: result for result in response.json()['results']}
+    assert results[test_tournament.id]['error'] is None
+    assert results[test_tournament.id]['matches'] == 1
+    assert results[other_id]['error'] == 'write failed'
+    assert results[other_id]['matches'] == 0
+    for tournament_id, count in [(test_tournament.id, 1), (other_id, 0)]:
+        response = client.get(
+            f'{URL_PREFIX}/matches?tournament_id={tournament_id}',
+            headers=user_token_headers
+        )
+        assert len(response.json()) == count
+
+
+def test_update_match_results(client, user_token_headers, test_tournament):
+    ids = []
+    for name in ['pirates', 'jaguars', 'falcons', 'arrows', 'crushers']:
+        response = client.post(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={'name': name, 'tournament_id': test_tournament.id},
+        )
+        ids.append(response.json()['id'])
+    response = client.post(
+        f'{URL_PREFIX}/matches/round',
+        headers=user_token_headers,
+        json={
+            'tournament_id': test_tournament.id,
+            'round': 0,
+            'matches': [
+                {'competitor_one': ids[0], 'competitor_two': ids[1]},
+                {'competitor_one': ids[2], 'competitor_two': ids[3]},
+                {'competitor_one': ids[4], 'competitor_two': None},
+            ]
+        }
+    )
+    first, second, bye = [match['id'] for match in response.json()]
+
+    response = client.put(
+        f'{URL_PREFIX}/matches/results',
+        headers=user_token_headers,
+        json={
+            'tournament_id': test_tournament.id,
+            'results': [
+                {'match_id': first, 'winner_id': ids[1]},
+                {'match_id': second, 'winner_id': ids[0]},
+                {'match_id': second, 'winner_id': ids[2]},
+                {'match_id': first, 'winner_id': ids[0]},
+                {'match_id': bye, 'winner_id': ids[4]},
+                {'match_id': 6000, 'winner_id': ids[0]},
+            ]
+        }
+    )
+    assert response.status_code == 200, response.text
+    assert [result['status'] for result in response.json()] == [200, 400, 200, 409, 400, 404]
+
+    response = client.get(
+        f'{URL_PREFIX}/matches?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    winners = {match['id']: (match['winner_id'], match['loser_id']) for match in response.json()}
+    assert winners == {first: (ids[1], ids[0]), second: (ids[2], ids[3]), bye: (None, None)}
+
+    response = client.get(
+        f'{URL_PREFIX}/standings?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    standings = {row['competitor_id']: row for row in response.json()}
+    assert standings[ids[1]]['wins'] == 1 and standings[ids[1]]['rank'] == 1
+    assert standings[ids[0]]['losses'] == 1 and standings[ids[0]]['buchholz'] == 1
+    assert standings[ids[0]]['rank'] == 3
+    assert standings[ids[4]]['rank'] == 5
+    assert _round_state(client, user_token_headers, test_tournament.id) == (0, 0, 3)
+
+
+def test_update_match_results_tournament_not_found(client, user_token_headers):
+    response = client.put(
+        f'{URL_PREFIX}/matches/results',
+        headers=user_token_headers,
+        json={'tournament_id': 6000, 'results': [{'match_id': 1, 'winner_id': 1}]}
+    )
+    assert response.status_code == 404, response.text
+
+
+def _report(client, headers, match, competitor_one, competitor_two, winner_id):
+    return client.put(
+        f'{URL_PREFIX}/matches',
+        headers=headers,
+        json={
+            'id': match.id,
+            'tournament_id': match.tournament_id,
+            'competitor_one': competitor_one.id,
+            'competitor_two': competitor_two.id,
+            'round': 0,
+            'winner_id': winner_id,
+        }
+    )
+
+
+def _records(client, headers, tournament_id):
+    response = client.get(
+        f'{URL_PREFIX}/standings?tournament_id={tournament_id}',
+        headers=headers
+    )
+    return {row['competitor_id']: (row['wins'], row['losses'], row['buchholz']) for row in response.json()}
+
+
+def _round_state(client, headers, tournament_id):
+    response = client.get(f'{URL_PREFIX}/tournaments', headers=headers)
+    tournament = next(t for t in response.json() if t['id'] == tournament_id)
+    return tournament['current_round'], tournament['matches_pending'], tournament['matches_completed']
+
+
+def test_update_match_corrects_winner(
+    client, user_token_headers, test_tournament, test_match, test_competitor_one, test_competitor_two
+):
+    for winner in (test_competitor_one, test_competitor_one, test_competitor_two):
+        response = _report(
+            client, user_token_headers, test_match, test_competitor_one, test_competitor_two, winner.id
+        )
+        assert response.status_code == 200, response.text
+    assert response.json()['loser_id'] == test_competitor_one.id
+    assert _round_state(client, user_token_headers, test_tournament.id) == (0, 0, 1)
+    assert _records(client, user_token_headers, test_tournament.id) == {
+        test_competitor_one.id: (0, 1, 1),
+        test_competitor_two.id: (1, 0, 0),
+    }
+    response = client.get(
+        f'{URL_PREFIX}/competitors?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    assert {c['id']: (c['wins'], c['losses']) for c in response.json()} == {
+        test_competitor_one.id: (0, 1),
+        test_competitor_two.id: (1, 0),
+    }
+
+
+def test_update_match_winner_not_in_match(
+    client, user_token_headers, test_match, test_competitor_one, test_competitor_two
+):
+    response = _report(client, user_token_headers, test_match, test_competitor_one, test_competitor_two, 6000)
+    assert response.status_code == 400, response.text
+
+
+def test_reverse_match_result(
+    client, user_token_headers, test_tournament, test_match, test_competitor_one, test_competitor_two
+):
+    _report(client, user_token_headers, test_match, test_competitor_one, test_competitor_two, test_competitor_two.id)
+    response = client.delete(
+        f'{URL_PREFIX}/matches/result?tournament_id={test_tournament.id}&match_id={test_match.id}',
+        headers=user_token_headers
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()['winner_id'] is None
+    assert response.json()['loser_id'] is None
+    assert _round_state(client, user_token_headers, test_tournament.id) == (0, 1, 0)
+    assert _records(client, user_token_headers, test_tournament.id) == {
+        test_competitor_one.id: (0, 0, 0),
+        test_competitor_two.id: (0, 0, 0),
+    }
+
+
+def test_reverse_match_result_not_found(client, user_token_headers, test_tournament):
+    response = client.delete(
+        f'{URL_PREFIX}/matches/result?tournament_id={test_tournament.id}&match_id=6000',
+        headers=user_token_headers
+    )
+    assert response.status_code == 404, response.text
+
+
+def test_get_matches_by_page(client, user_token_headers, test_tournament, test_match):
+    ids = []
+    for name in ['pirates', 'jaguars', 'falcons', 'arrows']:
+        response = client.post(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={'name': name, 'tournament_id': test_tournament.id},
+        )
+        ids.append(response.json()['id'])
+    created = []
+    for round in (2, 1):
+        response = client.post(
+            f'{URL_PREFIX}/matches/round',
+            headers=user_token_headers,
+            json={
+                'tournament_id': test_tournament.id,
+                'round': round,
+                'matches': [
+                    {'competitor_one': ids[0], 'competitor_two': ids[1]},
+                    {'competitor_one': ids[2], 'competitor_two': ids[3]},
+                ]
+            }
+        )
+        created += [(match['round'], match['id']) for match in response.json()]
+
+    seen = []
+    url = f'{URL_PREFIX}/matches?tournament_id={test_tournament.id}&limit=2'
+    response = client.get(url, headers=user_token_headers)
+    while True:
+        assert len(response.json()) <= 2
+        seen += [(match['round'], match['id']) for match in response.json()]
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        response = client.get(f"{url}&after={response.headers['X-Next-Cursor']}", headers=user_token_headers)
+    assert seen == sorted(created + [(0, test_match.id)])
+
+    response = client.get(f'{url}&round=2', headers=user_token_headers)
+    assert [match['round'] for match in response.json()] == [2, 2]
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_export_matches(client, user_token_headers, test_tournament, test_match):
+    for competitor in ['pirates', 'jaguars']:
+        client.post(
+            f'{URL_PREFIX}/competitors',
+            headers=user_token_headers,
+            json={'name': competitor, 'tournament_id': test_tournament.id},
+        )
+    client.get(
+        f'{URL_PREFIX}/matches/match_competitors?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    listed = client.get(f'{URL_PREFIX}/matches?tournament_id={test_tournament.id}', headers=user_token_headers).json()
+    assert len(listed) == 3
+
+    response = client.get(
+        f'{URL_PREFIX}/matches/export?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    assert response.status_code == 200, response.text
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.text.splitlines()] == listed
+
+    response = client.get(
+        f'{URL_PREFIX}/matches/export?tournament_id={test_tournament.id}&format=json',
+        headers=user_token_headers
+    )
+    assert response.json() == listed
+
+    response = client.get(
+        f'{URL_PREFIX}/matches/export?tournament_id={test_tournament.id}&round=6000&format=json',
+        headers=user_token_headers
+    )
+    assert response.json() == []
+
+
+def test_get_matches_not_modified(
+    client, user_token_headers, test_tournament, test_match, test_competitor_one, test_competitor_two
+):
+    url = f'{URL_PREFIX}/matches?tournament_id={test_tournament.id}'
+    response = client.get(url, headers=user_token_headers)
+    etag = response.headers['ETag']
+
+    response = client.get(url, headers={**user_token_headers, 'If-None-Match': etag})
+    assert response.status_code == 304, response.text
+    assert response.content == b''
+    assert response.headers['ETag'] == etag
+
+    # another page of the same list is tagged separately
+    response = client.get(f'{url}&limit=1', headers={**user_token_headers, 'If-None-Match': etag})
+    assert response.status_code == 200, response.text
+    assert response.headers['ETag'] != etag
+
+    _report(client, user_token_headers, test_match, test_competitor_one, test_competitor_two, test_competitor_one.id)
+    response = client.get(url, headers={**user_token_headers, 'If-None-Match': etag})
+    assert response.status_code == 200, response.text
+    assert response.json()[0]['winner_id'] == test_competitor_one.id
+    assert response.headers['ETag'] != etag
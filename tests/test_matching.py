@@ -0,0 +1,22 @@
+"""Test maximum weight matching."""
+from app.matching import max_weight_matching
+
+
+def test_empty_graph():
+    assert max_weight_matching([]) == []
+
+
+def test_prefers_heavier_edge():
+    assert max_weight_matching([(0, 1, 1), (1, 2, 5)]) == [-1, 2, 1]
+
+
+def test_max_cardinality_beats_weight():
+    edges = [(0, 1, 2), (1, 2, 10), (2, 3, 2)]
+    assert max_weight_matching(edges) == [-1, 2, 1, -1]
+    assert max_weight_matching(edges, max_cardinality=True) == [1, 0, 3, 2]
+
+
+def test_odd_cycle_blossom():
+    # a triangle with a tail needs a blossom to find the perfect matching
+    edges = [(0, 1, 8), (0, 2, 9), (1, 2, 10), (2, 3, 7)]
+    assert max_weight_matching(edges, max_cardinality=True) == [1, 0, 3, 2]
@@ -0,0 +1,31 @@
+"""Test connection pool instrumentation."""
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+
+from app.metrics import engines, instrumented_pool, pool_metrics
+from tests.conftest import get_test_db_uri
+
+
+def test_instrumented_pool_records_checkouts_and_timeouts(monkeypatch):
+    engine = create_engine(
+        get_test_db_uri(),
+        poolclass=instrumented_pool(QueuePool),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1
+    )
+    monkeypatch.setitem(engines, 'test', engine)
+    try:
+        connection = engine.connect()
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        stats = engine.pool.stats
+        assert stats.checkouts == 1
+        assert stats.timeouts == 1
+        assert stats.max_wait_seconds >= 0.1
+        assert 'swiss_db_pool_checked_out{engine="test"} 1' in pool_metrics()
+        connection.close()
+        assert 'swiss_db_pool_checked_out{engine="test"} 0' in pool_metrics()
+    finally:
+        engine.dispose()
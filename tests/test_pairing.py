@@ -0,0 +1,108 @@
+"""Test in-memory pairing."""
+from app.pairing import (
+    build_bye_set,
+    build_opponent_graph,
+    build_score_brackets,
+    pair_dutch,
+    pair_greedy,
+    pair_weighted,
+)
+
+
+def test_build_opponent_graph_ignores_byes():
+    opponents = build_opponent_graph([(1, 2), (3, None), (1, 3)])
+    assert opponents == {1: {2, 3}, 2: {1}, 3: {1}}
+
+
+def test_pair_greedy_first_round_pairs_with_last_available():
+    # as the original query based pairing did
+    standings = [(1, 0), (2, 0), (3, 0), (4, 0)]
+    assert pair_greedy(standings, {}, first_round=True) == [(1, 4), (2, 3)]
+
+
+def test_pair_greedy_first_round_uneven_gives_odd_one_out_a_bye():
+    standings = [(1, 0), (2, 0), (3, 0), (4, 0), (5, 0)]
+    assert pair_greedy(standings, {}, first_round=True) == [(1, 5), (2, 4), (3, None)]
+
+
+def test_pair_greedy_later_rounds_have_no_bye():
+    standings = [(1, 1), (2, 1), (3, 0)]
+    opponents = build_opponent_graph([(1, 3), (2, None)])
+    assert pair_greedy(standings, opponents) == [(1, 2)]
+
+
+def test_pair_greedy_avoids_rematches():
+    standings = [(1, 1), (2, 1), (3, 0), (4, 0)]
+    opponents = build_opponent_graph([(1, 2), (3, 4)])
+    assert pair_greedy(standings, opponents) == [(1, 3), (2, 4)]
+
+
+def test_pair_greedy_stops_when_competitor_played_everyone():
+    standings = [(1, 2), (2, 1), (3, 0)]
+    opponents = build_opponent_graph([(1, 2), (1, 3)])
+    assert pair_greedy(standings, opponents) == []
+
+
+def test_pair_weighted_completes_round_greedy_dead_ends_on():
+    standings = [(1, 2), (2, 1), (3, 1), (4, 0)]
+    opponents = build_opponent_graph([(1, 2), (2, 4)])
+    assert pair_greedy(standings, opponents) == [(1, 3)]
+    assert pair_weighted(standings, opponents, set()) == [(1, 4), (2, 3)]
+
+
+def test_pair_weighted_prefers_equal_wins():
+    standings = [(1, 2), (2, 2), (3, 0), (4, 0)]
+    assert pair_weighted(standings, {}, set()) == [(1, 2), (3, 4)]
+
+
+def test_pair_weighted_gives_one_bye_to_lowest_without_a_bye():
+    standings = [(1, 1), (2, 1), (3, 0), (4, 0), (5, 0)]
+    byes = build_bye_set([(5, None)])
+    pairings = pair_weighted(standings, {}, byes)
+    assert [pair for pair in pairings if pair[1] is None] == [(4, None)]
+    assert len(pairings) == 3
+
+
+def test_pair_weighted_repeats_a_bye_rather_than_leave_a_player_out():
+    # 3 is the only one without a bye, but giving it to them leaves 1 and 2 a rematch
+    standings = [(1, 1), (2, 1), (3, 0)]
+    opponents = build_opponent_graph([(1, 2)])
+    pairings = pair_weighted(standings, opponents, {1, 2})
+    assert sorted(c for pair in pairings for c in pair if c is not None) == [1, 2, 3]
+    assert [pair for pair in pairings if pair[1] is None][0][0] in (1, 2)
+
+
+def test_pair_weighted_across_blocks_never_rematches():
+    standings = [(c, 0) for c in range(1, 9)]
+    opponents = build_opponent_graph([(1, 2), (3, 4), (5, 6), (7, 8), (2, 3), (4, 5)])
+    pairings = pair_weighted(standings, opponents, set(), block_size=3)
+    assert len(pairings) == 4
+    paired = [c for pair in pairings for c in pair]
+    assert sorted(paired) == list(range(1, 9))
+    for competitor_one, competitor_two in pairings:
+        assert competitor_two not in opponents.get(competitor_one, set())
+
+
+def test_build_score_brackets():
+    standings = [(1, 2), (2, 1), (3, 1), (4, 0)]
+    assert build_score_brackets(standings) == [[1], [2, 3], [4]]
+
+
+def test_pair_dutch_top_half_plays_bottom_half():
+    standings = [(1, 1), (2, 1), (3, 1), (4, 1), (5, 0), (6, 0)]
+    assert pair_dutch(standings, {}, set()) == [(1, 3), (2, 4), (5, 6)]
+
+
+def test_pair_dutch_floats_odd_competitor_down():
+    standings = [(1, 2), (2, 1), (3, 1), (4, 0)]
+    assert pair_dutch(standings, {}, set()) == [(1, 2), (3, 4)]
+
+
+def test_pair_dutch_skips_rematches_and_gives_bye():
+    standings = [(1, 1), (2, 1), (3, 0), (4, 0), (5, 0)]
+    opponents = build_opponent_graph([(1, 2), (3, 4)])
+    byes = build_bye_set([(5, None)])
+    pairings = pair_dutch(standings, opponents, byes)
+    assert (1, 2) not in pairings
+    assert [pair for pair in pairings if pair[1] is None] == [(4, None)]
+    assert sorted(c for pair in pairings for c in pair if c) == [1, 2, 3, 4, 5]
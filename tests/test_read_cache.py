@@ -0,0 +1,99 @@
+"""Test the read-through cache."""
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import LRUCache, RedisCache
+import app.crud as crud
+import app.read_cache as read_cache
+from tests.test_cache import LocalRedis
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def backend(request, monkeypatch):
+    backend = LRUCache(maxsize=100) if request.param == 'memory' else RedisCache(client=LocalRedis())
+    monkeypatch.setattr(read_cache, 'backend', backend)
+    monkeypatch.setattr(read_cache, 'stats', {kind: read_cache.CacheStats() for kind in read_cache.KINDS})
+    return backend
+
+
+def read(scope, args=(), db=None):
+    loads = []
+
+    async def load():
+        loads.append(scope)
+        return [scope + args]
+
+    value = asyncio.run(read_cache.get_or_load(db or AsyncSession(), scope, args, load))
+    assert value == [scope + args]
+    return bool(loads)
+
+
+def test_reads_load_once(backend):
+    assert read(('competitors', 1), (100, None))
+    assert not read(('competitors', 1), (100, None))
+    assert read(('competitors', 1), (10, (1, 2)))
+    assert read(('competitors', 2), (100, None))
+    stats = read_cache.stats['competitors']
+    assert (stats.hits, stats.misses) == (1, 3)
+    assert 'swiss_read_cache_hits_total{kind="competitors"} 1' in read_cache.metrics()
+
+
+def test_none_is_not_cached(backend):
+    async def load():
+        return None
+
+    for _ in range(2):
+        assert asyncio.run(read_cache.get_or_load(AsyncSession(), ('tournament', 1), (), load)) is None
+    assert read_cache.stats['tournament'].misses == 2
+
+
+def test_replica_reads_are_not_cached(backend):
+    replica = AsyncSession(info={'replica': True})
+    assert read(('standings', 1), (100, None), db=replica)
+    assert read(('standings', 1), (100, None), db=replica)
+    # what the primary read is served to the replica too
+    assert read(('standings', 1), (100, None))
+    assert not read(('standings', 1), (100, None), db=replica)
+
+
+def test_invalidate_drops_every_page_of_a_scope(backend):
+    for limit in (10, 100):
+        read(('matches', 1, 2), (limit, None))
+    read(('matches', 1, 3), (100, None))
+    read_cache.invalidate([('matches', 1, 2)])
+    assert read(('matches', 1, 2), (10, None))
+    assert read(('matches', 1, 2), (100, None))
+    assert not read(('matches', 1, 3), (100, None))
+
+
+def test_result_invalidates_its_round_once_committed(backend, test_db, test_tournament):
+    scopes = [
+        ('tournament', test_tournament.id),
+        ('competitors', test_tournament.id),
+        ('standings', test_tournament.id),
+        ('matches', test_tournament.id, None),
+        ('matches', test_tournament.id, 1),
+        ('matches', test_tournament.id, 2),
+    ]
+    for scope in scopes:
+        read(scope)
+
+    read_cache.invalidate_on_commit(db=test_db, tournament_id=test_tournament.id, rounds=[2], competitors=True)
+    assert not any(read(scope) for scope in scopes)
+    test_db.commit()
+    assert [scope for scope in scopes if read(scope)] == [
+        scope for scope in scopes if scope != ('matches', test_tournament.id, 1)
+    ]
+
+
+def test_rolled_back_writes_invalidate_nothing(backend, test_db, test_tournament):
+    read(('competitors', test_tournament.id))
+    crud.create_competitor(db=test_db, name='Galahad', tournament_id=test_tournament.id)
+    assert read(('competitors', test_tournament.id))
+
+    read_cache.invalidate_on_commit(db=test_db, tournament_id=test_tournament.id, competitors=True)
+    test_db.rollback()
+    test_db.commit()
+    assert not read(('competitors', test_tournament.id))
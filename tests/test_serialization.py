@@ -0,0 +1,38 @@
+"""Test the fast list serialization matches the pydantic response schemas."""
+import json
+
+from fastapi.encoders import jsonable_encoder
+
+import app.async_crud as async_crud
+import app.schemas as schemas
+
+
+URL_PREFIX = '/api/v1/swiss-tournament'
+
+
+def as_schema_json(schema, objects) -> str:
+    # what FastAPI returns for objects validated through the response_model
+    return json.dumps(jsonable_encoder([schema.from_orm(obj) for obj in objects]))
+
+
+def test_list_responses_match_schemas(
+    client, test_db, user_token_headers, test_user, test_tournament, test_match, test_competitor_one, test_competitor_two
+):
+    query = f'tournament_id={test_tournament.id}'
+    cases = [
+        (f'/matches?{query}', schemas.Match, async_crud.matches_query(tournament_id=test_tournament.id, round=None)),
+        (
+            f'/competitors?{query}',
+            schemas.Competitor,
+            async_crud.tournament_competitors_query(tournament_id=test_tournament.id)
+        ),
+        ('/tournaments', schemas.Tournament, async_crud.tournaments_query(owner_id=test_user.id)),
+        (f'/standings?{query}', schemas.Standing, async_crud.standings_query(tournament_id=test_tournament.id)),
+    ]
+    for path, schema, statement in cases:
+        objects = test_db.execute(statement).all()
+        response = client.get(f'{URL_PREFIX}{path}', headers=user_token_headers)
+        assert response.status_code == 200, response.text
+        assert objects
+        # same fields in the same order with the same values
+        assert json.dumps(response.json()) == as_schema_json(schema, objects), path
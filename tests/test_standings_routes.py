@@ -0,0 +1,273 @@
+"""Test standings routes."""
+import random
+import threading
+import time
+
+from sqlalchemy import create_engine, delete, text
+from sqlalchemy.orm import sessionmaker
+
+from app.cache import LRUCache
+import app.crud as crud
+import app.models as models
+import app.read_cache as read_cache
+from tests.conftest import get_test_db_uri
+
+
+URL_PREFIX = '/api/v1/swiss-tournament'
+
+
+def test_get_tiebreaks(
+    client, user_token_headers, test_tournament, test_match, test_competitor_one, test_competitor_two
+):
+    client.put(
+        f'{URL_PREFIX}/matches',
+        headers=user_token_headers,
+        json={
+            'id': test_match.id,
+            'tournament_id': test_tournament.id,
+            'competitor_one': test_competitor_one.id,
+            'competitor_two': test_competitor_two.id,
+            'round': 0,
+            'winner_id': test_competitor_two.id,
+        }
+    )
+    response = client.get(
+        f'{URL_PREFIX}/standings/tiebreaks?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert [row['competitor_id'] for row in data] == [test_competitor_two.id, test_competitor_one.id]
+    assert data[0]['rank'] == 1
+    assert data[0]['wins'] == 1
+    assert data[0]['sonneborn_berger'] == 0
+    assert data[1]['buchholz'] == 1
+    assert data[1]['opponent_win_percentage'] == 1
+
+
+def test_get_tiebreaks_tournament_not_found(client, user_token_headers):
+    response = client.get(
+        f'{URL_PREFIX}/standings/tiebreaks?tournament_id=6000',
+        headers=user_token_headers
+    )
+    assert response.status_code == 404, response.text
+
+
+def test_get_standings(
+    client, user_token_headers, test_tournament, test_match, test_competitor_one, test_competitor_two
+):
+    client.put(
+        f'{URL_PREFIX}/matches',
+        headers=user_token_headers,
+        json={
+            'id': test_match.id,
+            'tournament_id': test_tournament.id,
+            'competitor_one': test_competitor_one.id,
+            'competitor_two': test_competitor_two.id,
+            'round': 0,
+            'winner_id': test_competitor_two.id,
+        }
+    )
+    response = client.get(
+        f'{URL_PREFIX}/standings?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    )
+    assert response.status_code == 200, response.text
+    assert response.json() == [
+        {
+            'rank': 1,
+            'competitor_id': test_competitor_two.id,
+            'name': test_competitor_two.name,
+            'wins': 1,
+            'losses': 0,
+            'buchholz': 0,
+            'sonneborn_berger': 0,
+        },
+        {
+            'rank': 2,
+            'competitor_id': test_competitor_one.id,
+            'name': test_competitor_one.name,
+            'wins': 0,
+            'losses': 1,
+            'buchholz': 1,
+            'sonneborn_berger': 0,
+        },
+    ]
+
+
+def test_get_standings_matches_tiebreaks(client, user_token_headers, test_db, test_tournament):
+    ids = [
+        crud.create_competitor(db=test_db, name=name, tournament_id=test_tournament.id).id
+        for name in ('Arthur', 'Gawain', 'Lancelot', 'Tristan', 'Kay', 'Bedivere')
+    ]
+    results = [(0, 1), (2, 3), (4, 5), (0, 2), (1, 4), (5, 3), (0, 4), (2, 1), (3, 5)]
+    for round, (winner, loser) in enumerate(results):
+        match = crud.create_match(
+            db=test_db,
+            tournament_id=test_tournament.id,
+            competitor_one=ids[loser],
+            competitor_two=ids[winner],
+            round=round // 3
+        )
+        crud.update_match(
+            db=test_db, tournament_id=test_tournament.id, match_id=match.id, winner_id=ids[winner]
+        )
+
+    standings = client.get(
+        f'{URL_PREFIX}/standings?tournament_id={test_tournament.id}',
+        headers=user_token_headers
+    ).json()
+    tiebreaks = {
+        row['competitor_id']: row
+        for row in client.get(
+            f'{URL_PREFIX}/standings/tiebreaks?tournament_id={test_tournament.id}',
+            headers=user_token_headers
+        ).json()
+    }
+    assert len(standings) == len(ids)
+    for row in standings:
+        assert row['wins'] == tiebreaks[row['competitor_id']]['wins']
+        assert row['buchholz'] == tiebreaks[row['competitor_id']]['buchholz']
+        assert row['sonneborn_berger'] == tiebreaks[row['competitor_id']]['sonneborn_berger']
+    assert [row['rank'] for row in standings] == sorted(row['rank'] for row in standings)
+    assert standings[0]['competitor_id'] == ids[0]
+
+
+def test_get_standings_tournament_not_found(client, user_token_headers):
+    response = client.get(
+        f'{URL_PREFIX}/standings?tournament_id=6000',
+        headers=user_token_headers
+    )
+    assert response.status_code == 404, response.text
+
+
+def test_standings_are_served_from_cache_until_a_result(
+    monkeypatch, client, user_token_headers, test_tournament, test_match, test_competitor_one, test_competitor_two
+):
+    # the cache is off unless READ_CACHE_BACKEND turns it on
+    monkeypatch.setattr(read_cache, 'backend', LRUCache(maxsize=100))
+    url = f'{URL_PREFIX}/standings?tournament_id={test_tournament.id}'
+    stats = read_cache.stats['standings']
+    client.get(url, headers=user_token_headers)
+    hits, misses = stats.hits, stats.misses
+    for _ in range(3):
+        assert client.get(url, headers=user_token_headers).status_code == 200
+    assert (stats.hits, stats.misses) == (hits + 3, misses)
+
+    client.put(
+        f'{URL_PREFIX}/matches',
+        headers=user_token_headers,
+        json={
+            'id': test_match.id,
+            'tournament_id': test_tournament.id,
+            'competitor_one': test_competitor_one.id,
+            'competitor_two': test_competitor_two.id,
+            'round': 0,
+            'winner_id': test_competitor_one.id,
+        }
+    )
+    data = client.get(url, headers=user_token_headers).json()
+    assert stats.misses == misses + 1
+    assert data[0]['competitor_id'] == test_competitor_one.id
+    assert data[0]['wins'] == 1
+
+
+def test_single_results_leave_standings_ranked(test_db, test_tournament):
+    random.seed(11)
+    ids = [
+        crud.create_competitor(db=test_db, name=f'Knight {i}', tournament_id=test_tournament.id).id
+        for i in range(10)
+    ]
+    for round in range(4):
+        random.shuffle(ids)
+        for one, two in zip(ids[::2], ids[1::2]):
+            match = crud.create_match(
+                db=test_db, tournament_id=test_tournament.id, competitor_one=one, competitor_two=two, round=round
+            )
+            crud.update_match(
+                db=test_db, tournament_id=test_tournament.id, match_id=match.id, winner_id=random.choice((one, two))
+            )
+            if random.random() < 0.3:
+                # correct the result to the other competitor
+                crud.update_match(
+                    db=test_db, tournament_id=test_tournament.id, match_id=match.id, winner_id=match.loser_id
+                )
+            if random.random() < 0.2:
+                crud.reverse_match_result(db=test_db, tournament_id=test_tournament.id, match_id=match.id)
+            # a full re-rank finds nothing left to move
+            assert crud.rank_standings(db=test_db, tournament_id=test_tournament.id) == 0
+            assert not crud.get_tournament_by_id(db=test_db, tournament_id=test_tournament.id).ranks_stale
+
+
+def waiting_on_locks(db) -> int:
+    waiting = db.execute(
+        text(
+            "SELECT count(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND wait_event_type = 'Lock'"
+        )
+    ).scalar()
+    db.commit()
+    return waiting
+
+
+def test_concurrent_results_share_a_rerank(monkeypatch):
+    # real sessions on committed data, the test_db session never commits for others to see
+    engine = create_engine(get_test_db_uri())
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    user = models.User(username='bedivere@email.com', hashed_password='supersecrethash', is_active=True)
+    db.add(user)
+    db.commit()
+    tournament = crud.create_own_tournament(db=db, owner_id=user.id, name='Melee', description=None)
+    ids = [crud.create_competitor(db=db, name=f'Knight {i}', tournament_id=tournament.id).id for i in range(16)]
+    matches = crud.create_round(db=db, tournament_id=tournament.id, round=0, pairings=list(zip(ids[::2], ids[1::2])))
+
+    reranks = []
+    rank_standings = crud.rank_standings
+
+    def counted_rank_standings(db, tournament_id):
+        reranks.append(tournament_id)
+        return rank_standings(db=db, tournament_id=tournament_id)
+
+    monkeypatch.setattr(crud, 'rank_standings', counted_rank_standings)
+
+    def report(match):
+        session = Session()
+        try:
+            crud.update_match(
+                db=session, tournament_id=tournament.id, match_id=match.id, winner_id=match.competitor_two
+            )
+        finally:
+            session.close()
+
+    try:
+        # every reporter queues up behind a held tournament lock, then they all go at once
+        blocker = Session()
+        crud.lock_tournament_results(db=blocker, tournament_id=tournament.id)
+        threads = [threading.Thread(target=report, args=(match,)) for match in matches]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 10
+        while waiting_on_locks(db) < len(matches) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        blocker.commit()
+        blocker.close()
+        for thread in threads:
+            thread.join()
+
+        # results were written without a re-rank each, yet the standings end fully ranked
+        assert len(reranks) < len(matches)
+        assert rank_standings(db=db, tournament_id=tournament.id) == 0
+        db.rollback()
+        tournament = crud.get_tournament_by_id(db=db, tournament_id=tournament.id)
+        assert not tournament.ranks_stale
+        assert tournament.matches_completed == len(matches)
+    finally:
+        db.rollback()
+        for model in (models.Standing, models.Match, models.Competitor):
+            db.execute(delete(model).where(model.tournament_id == tournament.id))
+        db.execute(delete(models.Tournament).where(models.Tournament.id == tournament.id))
+        db.execute(delete(models.User).where(models.User.id == user.id))
+        db.commit()
+        db.close()
+        engine.dispose()
@@ -0,0 +1,24 @@
+"""Test tiebreak computation."""
+import numpy as np
+
+from app.tiebreaks import compute_tiebreaks, rank_order
+
+
+def test_compute_tiebreaks():
+    competitor_ids = np.array([10, 11, 12, 13])
+    winner_ids = np.array([10, 10, 11, 13, 13, 12])
+    loser_ids = np.array([11, 12, 12, 10, 11, 13])
+    scores = np.array([2, 1, 1, 2])
+    computed = compute_tiebreaks(competitor_ids, scores, winner_ids, loser_ids)
+    assert computed['buchholz'].tolist() == [4, 5, 5, 4]
+    assert computed['median_buchholz'].tolist() == [1, 2, 2, 1]
+    assert computed['sonneborn_berger'].tolist() == [2, 1, 2, 3]
+    assert np.allclose(computed['opponent_win_percentage'], [4 / 9, 5 / 9, 5 / 9, 4 / 9])
+    # 13 and 10 are level on points and Buchholz, Sonneborn-Berger splits them
+    assert rank_order(computed, scores).tolist() == [3, 0, 2, 1]
+
+
+def test_compute_tiebreaks_without_matches():
+    computed = compute_tiebreaks(np.array([1, 2]), np.array([0, 0]), np.array([]), np.array([]))
+    assert computed['buchholz'].tolist() == [0, 0]
+    assert computed['opponent_win_percentage'].tolist() == [0, 0]
@@ -1,4 +1,7 @@
 """Test tournament routes."""
+from sqlalchemy import event
+
+import app.crud as crud
 
 URL_PREFIX = '/api/v1/swiss-tournament'
 
@@ -126,3 +129,65 @@ def test_update_tournament_success_with_null_value(client, user_token_headers):
     data = put_response_two.json()
     assert data['in_progress'] == None
     assert data['in_progress_round'] == None
+
+
+def test_update_tournament_keeps_pairing_method_when_left_out(client, user_token_headers):
+    tournament = client.post(
+        f'{URL_PREFIX}/tournaments',
+        headers=user_token_headers,
+        json={'name': 'weighted-update', 'pairing_method': 'weighted'},
+    ).json()
+    response = client.put(
+        f'{URL_PREFIX}/tournaments',
+        headers=user_token_headers,
+        json={'id': tournament['id'], 'name': 'renamed', 'complete': False},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()['name'] == 'renamed'
+    assert response.json()['pairing_method'] == 'weighted'
+
+    response = client.put(
+        f'{URL_PREFIX}/tournaments',
+        headers=user_token_headers,
+        json={'id': tournament['id'], 'name': 'renamed', 'pairing_method': 'dutch'},
+    )
+    assert response.json()['pairing_method'] == 'dutch'
+
+
+def test_own_tournament_is_loaded_once_per_session(test_db, test_tournament, test_user):
+    tournament_id, owner_id = test_tournament.id, test_user.id
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(test_db.get_bind(), 'before_cursor_execute', listener)
+    try:
+        test_db.expunge_all()
+        first = crud.get_own_tournament(db=test_db, tournament_id=tournament_id, owner_id=owner_id)
+        second = crud.get_own_tournament(db=test_db, tournament_id=tournament_id, owner_id=owner_id)
+        other_owner = crud.get_own_tournament(db=test_db, tournament_id=tournament_id, owner_id=6000)
+    finally:
+        event.remove(test_db.get_bind(), 'before_cursor_execute', listener)
+    assert first is second
+    assert other_owner is None
+    assert len([statement for statement in statements if 'FROM tournaments' in statement]) == 2
+
+
+def test_get_tournaments_not_modified(client, user_token_headers, test_tournament):
+    url = f'{URL_PREFIX}/tournaments'
+    etag = client.get(url, headers=user_token_headers).headers['ETag']
+    response = client.get(url, headers={**user_token_headers, 'If-None-Match': etag})
+    assert response.status_code == 304, response.text
+
+    # adding a competitor changes nothing in the tournament row but its version
+    client.post(
+        f'{URL_PREFIX}/competitors',
+        headers=user_token_headers,
+        json={'name': 'Lancelot', 'tournament_id': test_tournament.id},
+    )
+    response = client.get(url, headers={**user_token_headers, 'If-None-Match': etag})
+    assert response.status_code == 200, response.text
+    etag = response.headers['ETag']
+
+    client.post(f'{URL_PREFIX}/tournaments', headers=user_token_headers, json={'name': 'Camelot'})
+    response = client.get(url, headers={**user_token_headers, 'If-None-Match': etag})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 2
@@ -1,4 +1,12 @@
 """Test user routes."""
+import asyncio
+
+from app.cache import LRUCache, RedisCache
+from app.config import settings
+from app.dependencies import create_access_token
+import app.async_crud as async_crud
+import app.crud as crud
+from tests.test_cache import LocalRedis
 
 
 URL_PREFIX = '/api/v1/swiss-tournament'
@@ -49,3 +57,46 @@ def test_unauthenticated_user_invalid_credentials(client):
     assert response.status_code == 401, response.text
     data = response.json()
     assert data == {'detail': 'Invalid authentication credentials'}
+
+
+def test_principal_is_cached(client, test_user, user_token_headers):
+    client.get(f'{URL_PREFIX}/users/me', headers=user_token_headers)
+    assert crud.principals.get(test_user.username).id == test_user.id
+
+
+def test_deactivated_user_is_not_served_from_cache(client, test_db, test_user, user_token_headers):
+    response = client.get(f'{URL_PREFIX}/users/me', headers=user_token_headers)
+    assert response.status_code == 200, response.text
+    crud.set_user_active(db=test_db, user_id=test_user.id, is_active=False)
+    response = client.get(f'{URL_PREFIX}/users/me', headers=user_token_headers)
+    assert response.status_code == 400, response.text
+
+
+def test_deactivation_reaches_other_workers(client, monkeypatch, test_db, test_user, user_token_headers):
+    redis = LocalRedis()
+    monkeypatch.setattr(settings, 'READ_CACHE_BACKEND', 'redis')
+    monkeypatch.setattr(crud, 'RedisCache', lambda url, **kwargs: RedisCache(client=redis, **kwargs))
+    serving_worker, writing_worker = crud.create_principal_cache(), crud.create_principal_cache()
+    monkeypatch.setattr(crud, 'principals', serving_worker)
+    response = client.get(f'{URL_PREFIX}/users/me', headers=user_token_headers)
+    assert response.status_code == 200, response.text
+    monkeypatch.setattr(crud, 'principals', writing_worker)
+    crud.set_user_active(db=test_db, user_id=test_user.id, is_active=False)
+    monkeypatch.setattr(crud, 'principals', serving_worker)
+    response = client.get(f'{URL_PREFIX}/users/me', headers=user_token_headers)
+    assert response.status_code == 400, response.text
+
+
+def test_verified_tokens_expire(monkeypatch):
+    monkeypatch.setattr(crud, 'verified_tokens', LRUCache(ttl=0))
+    token = create_access_token({'sub': 'percival'})
+    crud.decode_access_token(token)
+    assert crud.verified_tokens.get(token) is None
+
+
+def test_stateless_auth_skips_user_lookup(client, test_user, user_token_headers, monkeypatch):
+    monkeypatch.setattr(settings, 'AUTH_STATELESS', True)
+    token = user_token_headers['Authorization'].split()[1]
+    principal = asyncio.run(async_crud.get_current_user(db=None, token=token))
+    assert principal.id == test_user.id
+    assert principal.is_active